@@ -0,0 +1,103 @@
+"""
+Fake Planner - Deterministic stand-in for AdaptivePlanner in benchmarks
+Same methods the executor calls, no OpenAI: plans are fixed per fixture app and
+verification never suggests a fix (every tier), so every run does exactly the same browser work.
+"""
+
+# Step lists per fixture app. {base} is replaced with the local fixture server URL.
+WORKFLOWS = {
+    "Linear": {
+        "task": "How do I create an issue in Linear?",
+        "steps": [
+            {"step_number": 1, "description": "Go to the issue list", "action": "navigate",
+             "url": "{base}/linear.html", "verification_selector": '[role="list"] div'},
+            {"step_number": 2, "description": "Open the issue composer from the sidebar", "action": "click",
+             "primary_selector": 'button[aria-label*="new issue"]', "verification_selector": '[role="dialog"]'},
+            {"step_number": 3, "description": "Type the issue title", "action": "type",
+             "primary_selector": '[aria-label="Issue title"]', "input_value": "Benchmark issue"},
+            # Stale primary selector on purpose: measures the fallback recovery path
+            {"step_number": 4, "description": "Submit the issue", "action": "click",
+             "primary_selector": '#submit-issue',
+             "fallback_selectors": ['button.submit', 'button:has-text("Create issue")'],
+             "verification_text": "Benchmark issue"},
+            {"step_number": 5, "description": "Go to Projects", "action": "click",
+             "primary_selector": 'a[href="#projects"]', "verification_text": "Projects"},
+        ],
+    },
+    "YouTube": {
+        "task": "How do I search for 'Python tutorials' on YouTube?",
+        "steps": [
+            {"step_number": 1, "description": "Go to the home page", "action": "navigate",
+             "url": "{base}/youtube.html", "verification_selector": "ytd-video-renderer"},
+            {"step_number": 2, "description": "Type the query into the search box", "action": "type",
+             "primary_selector": 'input#search', "input_value": "Python tutorials"},
+            {"step_number": 3, "description": "Pick the first suggestion", "action": "click",
+             "primary_selector": '.suggestions-dropdown div',
+             "verification_text": "Python tutorials suggestion 1 - video 1"},
+            {"step_number": 4, "description": "Play the first result", "action": "click",
+             "primary_selector": 'a#video-title'},
+            {"step_number": 5, "description": "Scroll through the results", "action": "scroll"},
+        ],
+    },
+    "ShadowDOM": {
+        "task": "How do I open row 40 with the settings panel showing?",
+        "steps": [
+            {"step_number": 1, "description": "Go to the workspace", "action": "navigate",
+             "url": "{base}/shadow_dom.html", "verification_selector": "app-row"},
+            {"step_number": 2, "description": "Open the settings panel", "action": "click",
+             "primary_selector": '#settings-toggle', "verification_selector": '#panel'},
+            {"step_number": 3, "description": "Scroll the row list", "action": "scroll"},
+            {"step_number": 4, "description": "Open row 40", "action": "click",
+             "primary_selector": 'app-row[data-row="40"] button',
+             "verification_selector": 'app-row[data-row="40"][aria-selected="true"]'},
+        ],
+    },
+}
+
+
+def _fill(value, base_url):
+    return value.replace("{base}", base_url) if isinstance(value, str) else value
+
+
+def workflow_steps(app_name, base_url):
+    """The fixture app's steps with {base} pointed at the fixture server"""
+    return [{key: _fill(value, base_url) for key, value in step.items()} for step in WORKFLOWS[app_name]["steps"]]
+
+
+class FakePlanner:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.conversation_history = []
+        self.calls = {"plan": 0, "verify": 0, "verify_text": 0, "verify_batch": 0}
+
+    def plan_initial_workflow(self, task_query, app_name, app_context=None):
+        self.calls["plan"] += 1
+        steps = workflow_steps(app_name, self.base_url)
+        return {"task": task_query or WORKFLOWS[app_name]["task"], "steps": steps}
+
+    def discover_selectors(self, screenshot_path, task_query, screenshot_bytes=None):
+        return {}
+
+    def verify_and_adapt(self, step, screenshot_path, success, error_message=None,
+                         screenshot_bytes=None, focus_box=None, scale=1):
+        self.calls["verify"] += 1
+        return {"success": success, "should_skip": True, "reasoning": "fake planner never suggests fixes"}
+
+    def verify_from_snapshot(self, step, snapshot, success, error_message=None, screenshot_bytes=None):
+        """Text tier: always settles the step, so the benchmark never escalates to vision"""
+        self.calls["verify_text"] += 1
+        return {"success": success, "should_skip": True, "reasoning": "fake planner never suggests fixes"}
+
+    def verify_batch(self, entries):
+        self.calls["verify_batch"] += 1
+        return [{"success": True, "observation": "fake planner accepts every step", "confidence": 100}
+                for _ in entries]
+
+    def record_verdict_result(self, verification, worked):
+        pass
+
+    def record_workflow_result(self, workflow, history):
+        pass
+
+    def suggest_next_steps(self, current_state, task_query, completed_steps):
+        return []
@@ -0,0 +1,107 @@
+"""
+Load Test - Hundreds of workflows through the real planner/executor/runner stack, no OpenAI
+Planning and verification go through planner_backends.LocalBackend (fixture plans, simulated
+latency and failures); the browser side runs the fixture apps from benchmarks/fixtures.
+What's left is the pipeline's own overhead: contexts, steps, screenshots, caches, reports.
+
+    python benchmarks/load_test.py --workflows 200 --concurrency 8
+    python benchmarks/load_test.py --workflows 200 --latency-ms 0      # pure non-LLM overhead
+    python benchmarks/load_test.py --failure-rate 0.05 --threads       # flaky API, sync runner
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from parallel_runner import ParallelWorkflowRunner, make_job
+from planner_backends import LocalBackend
+from plan_cache import PlanCache
+from verdict_cache import VerdictCache
+from selector_index import SelectorIndex
+from fake_planner import WORKFLOWS, workflow_steps
+from run_benchmarks import serve_fixtures, FIXTURE_PAGES
+
+
+def make_fixtures(base_url):
+    """LocalBackend fixtures: the benchmark workflows, pointed at the local fixture server"""
+    return {"plans": {app: {"steps": workflow_steps(app, base_url)} for app in WORKFLOWS}}
+
+
+def make_jobs(base_url, count, apps):
+    jobs = []
+    for n in range(count):
+        app = apps[n % len(apps)]
+        context = {"base_url": f"{base_url}/{FIXTURE_PAGES[app]}", "auth_required": False}
+        jobs.append(make_job(WORKFLOWS[app]["task"], app, context, f"load_{n:04d}"))
+    return jobs
+
+
+def report(results, wall_time):
+    durations = sorted(r["duration_s"] for r in results)
+    errors = [r for r in results if r["error"]]
+    complete = [r for r in results if not r["error"] and r["successful"] == r["total"]]
+    print("\n" + "=" * 60)
+    print("📈 LOAD TEST")
+    print("=" * 60)
+    print(f"Workflows:   {len(results)} ({len(complete)} fully successful, {len(errors)} errored)")
+    print(f"Throughput:  {len(results) / wall_time * 60:.1f} workflows/min over {wall_time:.1f}s")
+    print(f"Job time:    p50 {statistics.median(durations):.1f}s  "
+          f"p95 {durations[min(len(durations) - 1, int(len(durations) * 0.95))]:.1f}s  max {durations[-1]:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the workflow pipeline with a local planner backend")
+    parser.add_argument("--workflows", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--apps", nargs="*", default=list(FIXTURE_PAGES), help="fixture apps to cycle through")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=None,
+                        help="simulated model latency: one value or a min/max range (default: config)")
+    parser.add_argument("--failure-rate", type=float, default=None, help="fraction of model calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-caches", action="store_true", help="run without plan/verdict caches and selector index")
+    parser.add_argument("--threads", action="store_true", help="use the threaded runner instead of run_async")
+    parser.add_argument("--stream", action="store_true", help="stream plans and start steps as they arrive")
+    parser.add_argument("--pipelined-verify", action="store_true",
+                        help="vision-verify every successful step in the background")
+    parser.add_argument("--profile", default="ci", help="launch profile (see config.LAUNCH_PROFILES)")
+    args = parser.parse_args()
+
+    server, base_url = serve_fixtures()
+    backend_options = {"seed": args.seed}
+    if args.latency_ms is not None:
+        backend_options["latency_ms"] = tuple(args.latency_ms[:2]) if len(args.latency_ms) > 1 else args.latency_ms[0]
+    if args.failure_rate is not None:
+        backend_options["failure_rate"] = args.failure_rate
+    backend = LocalBackend(make_fixtures(base_url), **backend_options)
+
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            work_dir = Path(work_dir)
+            caches = {} if args.no_caches else {
+                "plan_cache": PlanCache(work_dir / "plan_cache"),
+                "verdict_cache": VerdictCache(work_dir / "verdict_cache"),
+                "selector_index": SelectorIndex(work_dir / "selector_index"),
+            }
+            runner = ParallelWorkflowRunner(api_key=None, concurrency=args.concurrency, output_root=work_dir / "dataset",
+                                            profile=args.profile, backend=backend,
+                                            streaming=args.stream, pipelined_verification=args.pipelined_verify,
+                                            **caches)
+            jobs = make_jobs(base_url, args.workflows, args.apps)
+
+            start = time.perf_counter()
+            results = runner.run(jobs) if args.threads else asyncio.run(runner.run_async(jobs))
+            report(results, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+
+    return 1 if any(r["error"] for r in results) and not args.failure_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Profile Load Benchmark - How much page-load time each launch profile's request blocking saves
+Loads the same page in a fresh context (cold cache) per sample under each profile and reports
+wall time to the load event, DOMContentLoaded / load from the page's own navigation timing,
+and what the profile blocked. The first profile is the one the others are compared against.
+
+    python benchmarks/profile_load.py                                   # ci vs throughput on youtube.com
+    python benchmarks/profile_load.py --url https://www.youtube.com/results?search_query=lofi --runs 10
+    python benchmarks/profile_load.py --profiles ci throughput --local  # the offline YouTube fixture
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from playwright.sync_api import sync_playwright
+from launch_profiles import resolve_profile, launch_options, context_options, apply_routing, format_route_stats
+from run_benchmarks import serve_fixtures, summarize, RESULTS_DIR, FIXTURE_PAGES
+
+DEFAULT_URL = "https://www.youtube.com/"
+
+NAVIGATION_TIMING_JS = """
+() => {
+    const [nav] = performance.getEntriesByType('navigation');
+    return nav ? {dom_content_loaded_ms: nav.domContentLoadedEventEnd, load_ms: nav.loadEventEnd,
+                  transferred_bytes: performance.getEntriesByType('resource')
+                      .reduce((sum, r) => sum + (r.transferSize || 0), nav.transferSize || 0)} : null;
+}
+"""
+
+
+def sample_load(browser, profile, url, timeout_ms):
+    """One cold load of `url` under `profile`: wall ms, navigation timing and blocked requests"""
+    context = browser.new_context(**context_options(profile))
+    try:
+        blocked = apply_routing(context, profile) or {}
+        page = context.new_page()
+        start = time.perf_counter()
+        page.goto(url, wait_until="load", timeout=timeout_ms)
+        wall_ms = (time.perf_counter() - start) * 1000
+        timing = page.evaluate(NAVIGATION_TIMING_JS) or {}
+        return dict(timing, wall_ms=wall_ms, blocked=blocked)
+    finally:
+        context.close()
+
+
+def bench_profile(playwright, name, url, runs, timeout_ms):
+    profile = resolve_profile(name)
+    browser = playwright.chromium.launch(**launch_options(profile))
+    try:
+        sample_load(browser, profile, url, timeout_ms)  # Warm-up: DNS, TLS session, browser startup
+        samples = [sample_load(browser, profile, url, timeout_ms) for _ in range(runs)]
+    finally:
+        browser.close()
+    blocked = {}
+    for sample in samples:
+        for reason, count in sample["blocked"].items():
+            blocked[reason] = blocked.get(reason, 0) + count
+    return {
+        "wall": summarize([s["wall_ms"] for s in samples]),
+        "dom_content_loaded": summarize([s["dom_content_loaded_ms"] for s in samples if "dom_content_loaded_ms" in s]),
+        "load": summarize([s["load_ms"] for s in samples if "load_ms" in s]),
+        "transferred_kb": round(statistics.median(s.get("transferred_bytes", 0) for s in samples) / 1000),
+        "blocked": blocked,
+    }
+
+
+def print_report(results):
+    baseline = None
+    print(f"\n{'profile':<14}{'wall p50':>10}{'DCL p50':>10}{'load p50':>10}{'KB':>8}{'vs first':>10}")
+    for name, data in results["profiles"].items():
+        wall = data["wall"]["p50_ms"]
+        baseline = baseline or wall
+        print(f"{name:<14}{wall:>8.0f}ms{data['dom_content_loaded']['p50_ms']:>8.0f}ms"
+              f"{data['load']['p50_ms']:>8.0f}ms{data['transferred_kb']:>8}{wall / baseline - 1:>+10.0%}")
+        if data["blocked"]:
+            print(f"   {format_route_stats(data['blocked'])} over {results['runs']} loads")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-load time per launch profile")
+    parser.add_argument("--profiles", nargs="+", default=["ci", "throughput"],
+                        help="launch profiles to compare, first one is the reference")
+    parser.add_argument("--url", default=DEFAULT_URL, help="page to load")
+    parser.add_argument("--local", action="store_true", help="load the local YouTube fixture instead of --url")
+    parser.add_argument("--runs", type=int, default=5, help="cold loads per profile")
+    parser.add_argument("--timeout-ms", type=int, default=30000, help="per-load timeout")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.local:
+        server, base_url = serve_fixtures()
+        url = f"{base_url}/{FIXTURE_PAGES['YouTube']}"
+    print(f"\n🏁 Loading {url} {args.runs}x per profile: {', '.join(args.profiles)}")
+
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "url": url, "runs": args.runs, "profiles": {}}
+    try:
+        with sync_playwright() as playwright:
+            for name in args.profiles:
+                results["profiles"][name] = bench_profile(playwright, name, url, args.runs, args.timeout_ms)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print_report(results)
+    RESULTS_DIR.mkdir(exist_ok=True)
+    result_path = RESULTS_DIR / f"profile_load_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    result_path.write_text(json.dumps(results, indent=2))
+    print(f"\n📁 Results saved to {result_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Offline Benchmarks - Executor and perception hot paths against local stand-in apps
+No live sites, no OpenAI key, no prompts: the fixture apps in benchmarks/fixtures are served
+from a local HTTP server and plans come from the deterministic FakePlanner.
+
+Reports per-step latency (action / screenshot / Set-of-Marks), total wall time per workflow,
+and micro-benchmarks of page.screenshot, get_page_hash and inject_visual_marks on each fixture.
+Results are saved to benchmarks/results/ and compared against baseline.json.
+
+    python benchmarks/run_benchmarks.py                  # run + compare to baseline
+    python benchmarks/run_benchmarks.py --save-baseline  # ...and make this run the new baseline
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from playwright.sync_api import sync_playwright
+from adaptive_executor import AdaptiveExecutor
+from perception import get_page_hash, inject_visual_marks, draw_visual_marks
+from launch_profiles import resolve_profile, launch_options, context_options
+from fake_planner import FakePlanner, WORKFLOWS
+
+BENCH_DIR = Path(__file__).parent
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+
+FIXTURE_PAGES = {"Linear": "linear.html", "YouTube": "youtube.html", "ShadowDOM": "shadow_dom.html"}
+
+# A metric only counts as a regression if it's this much slower than baseline (relative and absolute)
+REGRESSION_RATIO = 0.20
+REGRESSION_MIN_MS = 5
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures():
+    """Serves benchmarks/fixtures on a free localhost port. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(FIXTURES_DIR)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+class InstrumentedExecutor(AdaptiveExecutor):
+    """AdaptiveExecutor that also records per-step wall, screenshot and Set-of-Marks time"""
+
+    def _capture_debug_snapshot(self, step_number, output_path, clean_bytes):
+        start = time.perf_counter()
+        path = super()._capture_debug_snapshot(step_number, output_path, clean_bytes)
+        self._marks_ms = (time.perf_counter() - start) * 1000
+        return path
+
+    def _capture_step_screenshots(self, step, output_path):
+        self._marks_ms = 0
+        start = time.perf_counter()
+        paths = super()._capture_step_screenshots(step, output_path)
+        self._capture_ms = (time.perf_counter() - start) * 1000
+        return paths
+
+    def _run_step(self, step, output_path, planner=None):
+        start = time.perf_counter()
+        entry = super()._run_step(step, output_path, planner)
+        timing = entry.setdefault("timing", {})
+        timing["step_ms"] = round((time.perf_counter() - start) * 1000)
+        timing["screenshot_ms"] = round(self._capture_ms - self._marks_ms, 1)
+        timing["marks_ms"] = round(self._marks_ms, 1)
+        return entry
+
+
+def bench_workflow(browser, profile, app, base_url, runs):
+    """Runs one fixture workflow `runs` times in fresh contexts"""
+    wall, steps, successes = [], {}, []
+    for run in range(runs):
+        context = browser.new_context(**context_options(profile))
+        executor = InstrumentedExecutor(context=context)
+        planner = FakePlanner(base_url)
+        try:
+            plan = planner.plan_initial_workflow(WORKFLOWS[app]["task"], app)
+            with tempfile.TemporaryDirectory() as output_dir:
+                start = time.perf_counter()
+                history = executor.run_adaptive_workflow(plan, output_dir, planner, app)
+                wall.append((time.perf_counter() - start) * 1000)
+                executor.screenshot_writer.flush()
+        finally:
+            executor.close()
+            context.close()
+
+        successes.append(sum(1 for h in history if h.get('success', False)))
+        for entry in history:
+            per_step = steps.setdefault(entry['step']['step_number'], {
+                "description": entry['step']['description'], "step_ms": [], "action_ms": [],
+                "screenshot_ms": [], "marks_ms": []
+            })
+            for key in ("step_ms", "action_ms", "screenshot_ms", "marks_ms"):
+                per_step[key].append(entry['timing'].get(key, 0))
+
+    return {
+        "wall": summarize(wall),
+        "successful": min(successes),
+        "total": len(WORKFLOWS[app]["steps"]),
+        "steps": {
+            str(number): dict(
+                {"description": data["description"]},
+                **{key: summarize(data[key]) for key in ("step_ms", "action_ms", "screenshot_ms", "marks_ms")}
+            )
+            for number, data in sorted(steps.items())
+        },
+    }
+
+
+def bench_perception(browser, profile, app, base_url, iterations):
+    """Hot-path costs on a loaded fixture page, independent of any workflow"""
+    context = browser.new_context(**context_options(profile))
+    page = context.new_page()
+    try:
+        page.goto(f"{base_url}/{FIXTURE_PAGES[app]}", wait_until="load")
+        png = page.screenshot()
+        som_data = inject_visual_marks(page, draw=False, incremental=False)
+        inject_visual_marks(page, draw=False, incremental=True)  # Register the observer once
+
+        return {
+            "marks": len(som_data.get("marks", [])),
+            "screenshot_bytes": len(png),
+            "screenshot": summarize(time_calls(page.screenshot, iterations)),
+            "page_hash": summarize(time_calls(lambda: get_page_hash(page), iterations)),
+            "marks_full": summarize(time_calls(lambda: inject_visual_marks(page, draw=False, incremental=False), iterations)),
+            "marks_incremental": summarize(time_calls(lambda: inject_visual_marks(page, draw=False, incremental=True), iterations)),
+            "draw_marks": summarize(time_calls(lambda: draw_visual_marks(png, som_data), iterations)),
+        }
+    finally:
+        context.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _flatten(results):
+    """metric name -> milliseconds, for the numbers worth comparing between runs"""
+    flat = {}
+    for app, data in results.get("workflows", {}).items():
+        flat[f"{app}.wall"] = data["wall"]["p50_ms"]
+        for number, step in data["steps"].items():
+            flat[f"{app}.step{number}"] = step["step_ms"]["p50_ms"]
+    for app, data in results.get("perception", {}).items():
+        for metric, value in data.items():
+            if isinstance(value, dict):
+                flat[f"{app}.{metric}"] = value["p50_ms"]
+    return flat
+
+
+def compare(results, baseline):
+    """Prints current vs baseline p50s and returns the metrics that regressed"""
+    current, previous = _flatten(results), _flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<32}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for name, value in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]
+        delta = (value - before) / before if before else 0.0
+        regressed = delta > REGRESSION_RATIO and value - before > REGRESSION_MIN_MS
+        flag = "  ⚠️" if regressed else ""
+        print(f"{name:<32}{before:>10.1f}ms{value:>10.1f}ms{delta:>+9.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def print_report(results):
+    for app, data in results["workflows"].items():
+        print(f"\n🧪 {app}: {data['successful']}/{data['total']} steps, wall p50 {data['wall']['p50_ms']:.0f}ms")
+        for number, step in data["steps"].items():
+            print(f"   {number}. {step['description']:<42} step {step['step_ms']['p50_ms']:>7.0f}ms  "
+                  f"action {step['action_ms']['p50_ms']:>6.0f}ms  screenshot {step['screenshot_ms']['p50_ms']:>5.0f}ms  "
+                  f"marks {step['marks_ms']['p50_ms']:>5.0f}ms")
+    print()
+    for app, data in results["perception"].items():
+        print(f"🔬 {app} ({data['marks']} marks, {data['screenshot_bytes'] / 1000:.0f}KB PNG): " + ", ".join(
+            f"{metric} {value['p50_ms']:.1f}ms" for metric, value in data.items() if isinstance(value, dict)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline executor/perception benchmarks")
+    parser.add_argument("--runs", type=int, default=3, help="runs per workflow")
+    parser.add_argument("--iterations", type=int, default=20, help="samples per perception micro-benchmark")
+    parser.add_argument("--profile", default="ci", help="launch profile (see config.LAUNCH_PROFILES)")
+    parser.add_argument("--apps", nargs="*", default=list(FIXTURE_PAGES), help="fixture apps to run")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    profile = resolve_profile(args.profile)
+    server, base_url = serve_fixtures()
+    print(f"\n🏁 Benchmarking {', '.join(args.apps)} on {base_url} ({profile['name']} launch)\n")
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "profile": profile["name"],
+        "runs": args.runs,
+        "iterations": args.iterations,
+        "workflows": {},
+        "perception": {},
+    }
+
+    total_start = time.perf_counter()
+    try:
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch(**launch_options(profile))
+            try:
+                for app in args.apps:
+                    results["workflows"][app] = bench_workflow(browser, profile, app, base_url, args.runs)
+                    results["perception"][app] = bench_perception(browser, profile, app, base_url, args.iterations)
+            finally:
+                browser.close()
+    finally:
+        server.shutdown()
+    results["total_wall_s"] = round(time.perf_counter() - total_start, 1)
+
+    print_report(results)
+    print(f"\n⏱️  Total wall time {results['total_wall_s']}s")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    result_path = RESULTS_DIR / f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    result_path.write_text(json.dumps(results, indent=2))
+    print(f"📁 Results saved to {result_path}")
+
+    regressions = []
+    if BASELINE_PATH.exists():
+        regressions = compare(results, json.loads(BASELINE_PATH.read_text()))
+        print(f"\n{'⚠️  Regressions: ' + ', '.join(regressions) if regressions else '✅ No regressions vs baseline'}")
+    if args.save_baseline or not BASELINE_PATH.exists():
+        BASELINE_PATH.write_text(json.dumps(results, indent=2))
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,64 +2,163 @@
 Adaptive Executor - Self-healing browser automation
 This is Agent B 2.0 - it tries multiple strategies and doesn't give up easily
 """
+import contextvars
+import json
+import threading
 import time
 from pathlib import Path
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-from perception import get_page_hash, inject_visual_marks
+from perception import get_page_hash, inject_visual_marks, draw_visual_marks
+from settle import wait_for_settle
+from locator_race import resolve_first_locator
+from tracing import span, trace_run
+from launch_profiles import resolve_profile, persistent_options, apply_routing
+from pipelined_verifier import PipelinedVerifier, PipelineState
+from tiered_verify import check_in_page, dialog_open, accessibility_snapshot, expects_dialog
+from executor_core import ExecutorCore
+from config import LOCATOR_RACE_TIMEOUT_MS, SPECULATIVE_PREFETCH, TEXT_VERIFICATION
 
-class AdaptiveExecutor:
-    def __init__(self, user_data_dir=None):
-        if user_data_dir is None:
-            project_root = Path(__file__).parent.parent
-            user_data_dir = str(project_root / "data" / "user_data")
-        
-        print(f"🔐 Using browser profile: {user_data_dir}")
-        
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch_persistent_context(
-            user_data_dir=user_data_dir,
-            headless=False,
-            viewport={'width': 1280, 'height': 800},
-            slow_mo=100,  
-            ignore_https_errors=True
-        )
-        self.page = self.browser.pages[0]
-        self.last_hash = ""
-        self.retry_count = 0
-        self.max_retries = 3
-        self.current_app = None  
+class AdaptiveExecutor(ExecutorCore):
+    def __init__(self, user_data_dir=None, context=None, selector_index=None, pool=None, profile=None, network=None,
+                 app=None):
+        """
+        By default launches its own persistent Chromium on data/user_data.
+        Pass an existing browser `context` to run inside it instead (e.g. from the parallel runner);
+        the executor then leaves the context's lifecycle to whoever created it.
+        `profile` picks the launch profile for a self-launched browser (see launch_profiles; without one,
+        `app` picks it from config.APP_LAUNCH_PROFILES), and
+        `network` puts a network_cache.NetworkLayer in front of it (pools and the runner take their own).
+        Pass a SessionPool to borrow a warm context from it; close() hands it back.
+        Pass a SelectorIndex to learn which selectors work across runs.
+        """
+        self._pool = pool
+        if pool is not None:
+            context = pool.checkout()
+        self._owns_browser = context is None
+        self._route_stats = None
+        self.network = None
+        
+        if context is not None:
+            self.playwright = None
+            self.browser = context
+        else:
+            if user_data_dir is None:
+                project_root = Path(__file__).parent.parent
+                user_data_dir = str(project_root / "data" / "user_data")
+            
+            launch_profile = resolve_profile(profile, app)
+            print(f"🔐 Using browser profile: {user_data_dir} ({launch_profile['name']} launch)")
+            
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch_persistent_context(
+                user_data_dir=user_data_dir,
+                **persistent_options(launch_profile)
+            )
+            if network is not None:
+                self.network = network
+                network.attach(self.browser)  # Before blocking, so blocked requests never reach the cache
+            self._route_stats = apply_routing(self.browser, launch_profile)
+        self.page = self.browser.pages[0] if self.browser.pages else self.browser.new_page()
+        self._init_state(selector_index)
     
     def _wait_for_stable_page(self, timeout=2000):
         """
         Smart Wait: Waits for the network to settle (no active requests for 500ms).
         If the network is 'chatty' (e.g., live websockets), it timeouts gracefully.
         """
-        try:
-            self.page.wait_for_load_state("networkidle", timeout=timeout)
-        except PlaywrightTimeout:
-            pass 
+        with span("network_idle"):
+            try:
+                self.page.wait_for_load_state("networkidle", timeout=timeout)
+            except PlaywrightTimeout:
+                pass 
 
-    def _capture_debug_snapshot(self, step_number, output_path):
+    def _settle(self, step, network_idle=False):
+        """
+        Event-driven replacement for the old fixed sleeps.
+        Records how long we actually waited vs. what the fixed sleep would have cost.
+        """
+        with span("settle", action=step['action']):
+            waited = wait_for_settle(
+                self.page,
+                expected_selector=step.get('verification_selector'),
+                network_idle=network_idle
+            )
+        self._record_settle(step, waited)
+
+    def _capture_debug_snapshot(self, step_number, output_path, clean_bytes):
         """
         Saves a screenshot with the AI's 'Set-of-Marks' (Red Boxes) visible.
         This tells you exactly what elements the AI detected.
+        The boxes are read from the page as data and drawn onto the clean capture
+        by the writer pool - one capture per step and the page is never mutated.
+        The box metadata is saved next to the image as step_XX_debug.json.
         """
-        try:
-            element_count = inject_visual_marks(self.page)
-        except Exception:
-            element_count = 0
+        with span("set_of_marks"):
+            som_data = inject_visual_marks(self.page, draw=False)
         
         filename = f"step_{step_number:02d}_debug.png"
         full_path = output_path / filename
-        self.page.screenshot(path=full_path)
-        
-        self.page.evaluate("""
-            document.querySelectorAll('.ai-mark').forEach(el => el.remove());
-            document.querySelectorAll('[data-ai-id]').forEach(el => el.removeAttribute('data-ai-id'));
-        """)
+        self.screenshot_writer.submit(full_path, clean_bytes, transform=lambda png: draw_visual_marks(png, som_data))
+        self.screenshot_writer.submit(full_path.with_suffix('.json'), json.dumps(som_data, indent=2).encode())
         
         return str(full_path)
 
+    def prefetch(self, url):
+        """
+        Speculatively opens `url` (the app's base_url) while the plan is still being generated.
+        Most plans start by navigating there: if step 1 does, it reuses this load,
+        any other first step discards it (see _claim_prefetch).
+        """
+        prefetch = self._start_prefetch(url)
+        if prefetch is None:
+            return
+        with span("prefetch", url=url):
+            try:
+                self.page.goto(url, wait_until='domcontentloaded', timeout=10000)
+            except Exception as e:
+                prefetch["error"] = e
+    
+    def plan_while_prefetching(self, planner, task_query, app_name, app_context):
+        """
+        planner.plan_initial_workflow() on a helper thread while this thread - the one that owns
+        the Playwright page - prefetches app_context's base_url.
+        """
+        url = (app_context or {}).get("base_url")
+        if not SPECULATIVE_PREFETCH or not url:
+            return planner.plan_initial_workflow(task_query, app_name, app_context)
+        
+        outcome = {}
+        def plan():
+            try:
+                outcome["plan"] = planner.plan_initial_workflow(task_query, app_name, app_context)
+            except Exception as e:
+                outcome["error"] = e
+        
+        # copy_context so the planner's spans land in this run's trace
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(plan,), daemon=True)
+        thread.start()
+        self.prefetch(url)
+        thread.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["plan"]
+    
+    def _claim_prefetch(self, step):
+        """
+        First step after prefetch(): True if it navigates to the prefetched URL and the load worked.
+        A first step that doesn't navigate gets the speculative load discarded, so it starts
+        from the same blank page it would have had without prefetching.
+        """
+        prefetch, outcome = self._take_prefetch(step)
+        if prefetch is None:
+            return False
+        if outcome == "discard":
+            with span("prefetch_discard"):
+                self.page.goto("about:blank")
+        hit = outcome == "reuse" and prefetch['error'] is None
+        print(f"   ⚡ Speculative prefetch of {prefetch['url']}: {'reused' if hit else 'discarded'}")
+        return hit
+    
     def run_adaptive_workflow(self, workflow, output_dir, planner=None, app=None):
         """
         Runs workflow with adaptive capabilities:
@@ -67,115 +166,332 @@ class AdaptiveExecutor:
         - Captures Clean AND Debug screenshots
         - Uses AI vision to verify and self-correct
         """
-        output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True, parents=True)
-        
-        self.current_app = app
+        output_path = self._begin_workflow(output_dir, app)
         
         history = []
         print("\n🎬 Starting workflow...\n")
 
-        for step in workflow['steps']:
-            print(f"👉 Step {step['step_number']}: {step['description']}")
+        with trace_run(output_path), span("workflow", "workflow", steps=len(workflow['steps'])):
+            if planner and self.pipelined_verification:
+                history = self._run_pipelined(workflow['steps'], output_path, planner)
+            else:
+                for step in workflow['steps']:
+                    history.append(self._run_step(step, output_path, planner))
+        
+            if planner:
+                planner.record_workflow_result(workflow, history)
+        
+            if self.selector_index:
+                self.selector_index.save()
+            self.screenshot_writer.flush()
+            self._print_summary(history, output_path)
+        return history
+    
+    def run_streaming_workflow(self, plan_stream, output_dir, planner=None, app=None):
+        """
+        run_adaptive_workflow fed by planner.stream_initial_workflow(): each step runs as soon as
+        it has been parsed, so step 1 is already loading while the model writes the rest of the plan.
+        """
+        output_path = self._begin_workflow(output_dir, app)
+        
+        history = []
+        print("\n🎬 Starting workflow (plan streaming in)...\n")
+
+        with trace_run(output_path), span("workflow", "workflow", streamed=True):
+            if planner and self.pipelined_verification:
+                history = self._run_pipelined(plan_stream, output_path, planner)
+            else:
+                for step in plan_stream:
+                    history.append(self._run_step(step, output_path, planner))
+            
+            if planner:
+                planner.record_workflow_result(plan_stream.plan, history)
+            
+            if self.selector_index:
+                self.selector_index.save()
+            self.screenshot_writer.flush()
+            self._print_summary(history, output_path)
+        return history
+    
+    def _run_pipelined(self, steps, output_path, planner):
+        """
+        Pipelined verification: each successful step goes to a background vision check and the
+        next step starts right away. A late "it actually failed" verdict rolls the page back to
+        the URL checkpointed before that step and re-executes from the first step that started on
+        that URL (see PipelineState.apply), the verdict's alternative selector first for the failed
+        step. Each step is rolled back at most once; a second failing verdict is recorded.
+        """
+        verifier = PipelinedVerifier(planner)
+        state = PipelineState(verifier)
+        steps = iter(steps)
+        try:
+            while True:
+                rollback = state.apply(verifier.completed(wait_for_one=state.waiting()))
+                if rollback:
+                    self._rollback(*rollback)
+                
+                move = state.next_move()
+                if move == "redo":
+                    step = state.redo.pop(0)
+                elif move == "next":
+                    step = next(steps, None)
+                    if step is None:
+                        state.exhausted = True
+                        continue
+                elif move == "wait":
+                    continue
+                else:
+                    break
+                
+                url = self.page.url
+                entry = self._run_step(step, output_path, planner)
+                if state.record(url, entry):
+                    snapshot = accessibility_snapshot(self.page) if TEXT_VERIFICATION else None
+                    verifier.submit(len(state.history) - 1, step, entry['screenshot'], self._last_screenshot, snapshot)
+        finally:
+            verifier.close()
+        print(verifier.summary())
+        return state.history
+    
+    def _rollback(self, url, step, observation):
+        """
+        Back to the page a step started from, after a late verdict said it didn't work.
+        Only the URL is checkpointed, so the steps since the last navigation are re-run from
+        there - including ones with side effects (a submitted form is submitted again).
+        """
+        print(f"   ⏪ Step {step['step_number']} didn't take effect ({observation}) - rolling back to {url}")
+        with span("rollback", step=step['step_number'], url=url):
+            try:
+                self.page.goto(url, wait_until='domcontentloaded', timeout=10000)
+            except PlaywrightTimeout:
+                pass
+            self._wait_for_stable_page()
+        self.last_hash = ""
+    
+    def run_resolved_workflow(self, resolved_plan, output_dir, planner=None, app=None):
+        """
+        Replay mode: runs a resolved plan (see replay.compile_resolved_plan) exactly as recorded.
+        - No app-specific guesses, no fallback cascade, no vision calls
+        - Each replayed step still gets the in-page checks (tiered_verify tier 1): a recorded
+          strategy can "apply" on a page that has since changed without doing what it used to
+        - On the first divergence, the rest of the workflow drops back to adaptive mode
+        """
+        output_path = self._begin_workflow(output_dir, app or resolved_plan.get('app'))
+        
+        history = []
+        diverged = False
+        print("\n⏩ Replaying resolved workflow...\n")
+        
+        with trace_run(output_path), span("workflow", "workflow", steps=len(resolved_plan['steps']), replay=True):
+            for entry in resolved_plan['steps']:
+                step = entry['step']
+                resolution = entry.get('resolution')
             
+                if diverged:
+                    history.append(self._run_step(step, output_path, planner))
+                    continue
+            
+                print(f"⏩ Step {step['step_number']}: {step['description']}")
+                step_start = self._begin_step()
+            
+                dialog_before = dialog_open(self.page) if expects_dialog(step) else True
+                replayed = False
+                error_msg = "No recorded resolution for this step"
+                if resolution:
+                    try:
+                        with span("replay_step", step=step['step_number'], strategy=resolution['strategy']):
+                            replayed = self._apply_resolution(step, resolution)
+                        error_msg = f"Recorded {resolution['strategy']} strategy did not apply"
+                    except Exception as e:
+                        error_msg = str(e)
+            
+                if not replayed:
+                    print(f"   ↪️  Replay diverged ({error_msg}) - switching to adaptive mode")
+                    diverged = True
+                    history.append(self._run_step(step, output_path, planner))
+                    continue
+            
+                timing = self._finish_step_timing(step_start)
+                with span("verify_dom"):
+                    passed, problem = check_in_page(self.page, step, dialog_before)
+                clean_path, debug_path = self._capture_step_screenshots(step, output_path)
+                verified_by = None if passed is None else "dom"
+            
+                if passed is False:
+                    # The action already ran - diagnose the page it left rather than repeating it
+                    print(f"   ↪️  Replay diverged ({problem}) - switching to adaptive mode")
+                    diverged = True
+                    entry = self._step_entry(step, clean_path, debug_path, False, timing,
+                                             error=problem, verified_by=verified_by, replayed=True)
+                    if planner:
+                        self._recover_with_ai(step, entry, clean_path, planner)
+                    history.append(entry)
+                    continue
+            
+                self.last_hash = get_page_hash(self.page)
+                history.append(self._step_entry(step, clean_path, debug_path, True, timing, resolution=resolution,
+                                                verified_by=verified_by, replayed=True))
+        
+            if self.selector_index:
+                self.selector_index.save()
+            self.screenshot_writer.flush()
+            self._print_summary(history, output_path)
+        return history
+    
+    def _capture_step_screenshots(self, step, output_path):
+        """Clean screenshot + Set-of-Marks debug screenshot for one step"""
+        clean_filename = f"step_{step['step_number']:02d}.png"
+        clean_path = output_path / clean_filename
+        with span("screenshot"):
+            clean_bytes = self.page.screenshot()
+        self._last_screenshot = clean_bytes
+        self.screenshot_writer.submit(clean_path, clean_bytes)
+        
+        debug_path = self._capture_debug_snapshot(
+            step['step_number'], 
+            output_path,
+            clean_bytes
+        )
+        return clean_path, debug_path
+    
+    def _run_step(self, step, output_path, planner=None):
+        """
+        Executes one step with the full adaptive cascade and returns its history entry.
+        The entry's 'resolution' records exactly what worked, so the run can be replayed.
+        """
+        with span("step", step=step['step_number'], action=step['action']):
+            print(f"👉 Step {step['step_number']}: {step['description']}")
+        
             success = False
             error_msg = None
-            
+            self._prefetch_hit = self._claim_prefetch(step)
+            step_start = self._begin_step()
+            # Only a dialog this step opens can confirm it
+            dialog_before = dialog_open(self.page) if expects_dialog(step) else True
+        
             for attempt in range(self.max_retries):
-                try:
-                    if attempt == 0:
-                        if self._use_app_specific_handler(step):
-                            success = True
-                            break
-                        self._perform_action(step)
-                        success = True
-                        break
-                    else:
-                        if self._try_fallback_strategy(step, attempt):
+                with span("attempt", attempt=attempt):
+                    try:
+                        if attempt == 0:
+                            with span("app_handler"):
+                                handled = self._use_app_specific_handler(step)
+                            if handled:
+                                success = True
+                                break
+                            dead = self._primary_is_dead(step)
+                            if dead:
+                                error_msg = dead
+                                continue
+                            primary = self._primary_candidate(step)
+                            started = time.perf_counter()
+                            try:
+                                with span("action"):
+                                    self._perform_action(step)
+                            except Exception:
+                                self._record_candidate(step, primary, False, started)
+                                raise
+                            self._record_candidate(step, primary, True, started)
+                            self._resolution = {"strategy": "primary"}
                             success = True
                             break
-                
-                except Exception as e:
-                    error_msg = str(e)
-                    self.page.wait_for_timeout(1000)
+                        else:
+                            if self._try_fallback_strategy(step, attempt):
+                                success = True
+                                break
             
+                    except Exception as e:
+                        error_msg = str(e)
+                        with span("retry_backoff"):
+                            self.page.wait_for_timeout(1000)
+        
+            resolution = dict(self._resolution or {}, attempt=attempt) if success else None
+            timing = self._finish_step_timing(step_start)
+        
             # VERIFICATION: Check if action actually worked
-            if success and step.get('verification_text'):
-                try:
-                    expected_text = step['verification_text']
-                    page_text = self.page.locator('body').inner_text()
-                    if expected_text.lower() not in page_text.lower():
-                        success = False
-                        error_msg = f"Expected text '{expected_text}' not found"
-                except Exception:
-                    pass
-            
-            if success and step.get('verification_selector'):
-                try:
-                    verify_element = step['verification_selector']
-                    if self.page.locator(verify_element).count() == 0:
+            # Tier 1: targeted in-page checks (see tiered_verify)
+            verified_by = None
+            with span("verify_dom"):
+                if success:
+                    passed, problem = check_in_page(self.page, step, dialog_before)
+                    if passed is False:
                         success = False
-                        error_msg = f"Expected element '{verify_element}' not found"
-                except Exception:
-                    pass
-      
-            clean_filename = f"step_{step['step_number']:02d}.png"
-            clean_path = output_path / clean_filename
-            self.page.screenshot(path=clean_path)
-            
-            debug_path = self._capture_debug_snapshot(
-                step['step_number'], 
-                output_path
-            )
-            
-            current_hash = get_page_hash(self.page)
-            
+                        error_msg = problem
+                    if passed is not None:
+                        verified_by = "dom"
+  
+            clean_path, debug_path = self._capture_step_screenshots(step, output_path)
+        
+            with span("page_hash"):
+                current_hash = get_page_hash(self.page)
+        
             if success:
-               
-                
-                history.append({
-                    "step": step,
-                    "screenshot": str(clean_path),
-                    "debug_screenshot": str(debug_path),
-                    "success": True
-                })
-                
                 self.last_hash = current_hash
+                return self._step_entry(step, clean_path, debug_path, True, timing,
+                                        resolution=resolution, verified_by=verified_by)
+        
+            entry = self._step_entry(step, clean_path, debug_path, False, timing,
+                                     error=error_msg, verified_by=verified_by)
+            if planner:
+                self._recover_with_ai(step, entry, clean_path, planner)
+            return entry
+    
+    def _recover_with_ai(self, step, entry, clean_path, planner):
+        """Diagnoses a failed step's entry and tries the AI's suggestion; updates the entry in place"""
+        verification = self._diagnose_failure(step, clean_path, entry['error'], planner)
+        entry['verified_by'] = verification['tier']
+        
+        if not verification.get('should_skip', False):
+            print(f"   🤖 AI suggests: {verification.get('reasoning', 'trying alternative')}")
+            
+            with span("ai_suggestion"):
+                worked = self._try_ai_suggestion(step, verification)
+            planner.record_verdict_result(verification, worked)
+            if worked:
+                entry['success'] = True
+                entry['resolution'] = self._ai_resolution(verification)
+                print(f"   ✅ AI suggestion worked!")
                 
-            else:
-               
-                
-                history.append({
-                    "step": step,
-                    "screenshot": str(clean_path),
-                    "debug_screenshot": str(debug_path),
-                    "success": False,
-                    "error": error_msg
-                })
-        
-                if planner:
-                   
-                    verification = planner.verify_and_adapt(
-                        step, clean_path, success=False, error_message=error_msg
+                # Overwrite the original screenshot with the fixed state
+                self._last_screenshot = self.page.screenshot()
+                self.screenshot_writer.submit(clean_path, self._last_screenshot)
+    
+    def _diagnose_failure(self, step, clean_path, error_msg, planner):
+        """
+        Tiers 2 and 3 for a failed step: the accessibility tree first, the screenshot only if
+        the model can't tell from text. The verdict records its tier.
+        """
+        if TEXT_VERIFICATION:
+            snapshot = accessibility_snapshot(self.page)
+            if snapshot:
+                with span("verify_text", "planner"):
+                    verification = planner.verify_from_snapshot(
+                        step, snapshot, success=False, error_message=error_msg, screenshot_bytes=self._last_screenshot
                     )
-                    
-                    if not verification.get('should_skip', False):
-                        print(f"   🤖 AI suggests: {verification.get('reasoning', 'trying alternative')}")
-                        
-                        if self._try_ai_suggestion(step, verification):
-                            history[-1]['success'] = True
-                            print(f"   ✅ AI suggestion worked!")
-                            
-                            # Overwrite the original screenshot with the fixed state
-                            self.page.screenshot(path=output_path / f"step_{step['step_number']:02d}.png")
-        
-        # Final summary
-        successful = sum(1 for h in history if h.get('success', False))
-        print(f"\n✅ Workflow completed: {successful}/{len(history)} steps successful")
-        print(f"📁 Results saved to: {output_path}/")
-        print(f"📖 View guide: {output_path}/README.md\n")
+                if verification is not None:
+                    return dict(verification, tier="text")
         
-        return history
+        focus_box, scale = self._failure_focus_box(step)
+        with span("verify_and_adapt", "planner"):
+            verification = planner.verify_and_adapt(
+                step, clean_path, success=False, error_message=error_msg,
+                screenshot_bytes=self._last_screenshot, focus_box=focus_box, scale=scale
+            )
+        return dict(verification, tier="vision")
+    
+    def _failure_focus_box(self, step):
+        """
+        Region worth showing the vision model for a failed step: an open modal if there is one,
+        otherwise the failed selector if it exists on the page. (None, 1) = send the full frame.
+        """
+        for candidate in self._focus_candidates(step):
+            try:
+                box = self.page.locator(candidate).first.bounding_box(timeout=500)
+            except Exception:
+                box = None
+            if box and box['width'] > 0 and box['height'] > 0:
+                scale = self.page.evaluate("window.devicePixelRatio || 1")
+                return box, scale
+        return None, 1
     
     def _use_app_specific_handler(self, step):
         if step['action'] == 'type' and 'search' in step['description'].lower():
@@ -185,6 +501,7 @@ class AdaptiveExecutor:
                     self.page.wait_for_timeout(500)
                     if self.page.locator('input:focus, textarea:focus').count() > 0:
                         self.page.keyboard.type(step['input_value'], delay=50)
+                        self._resolution = {"strategy": "app_handler", "keyboard_shortcut": shortcut}
                         return True
                 except:
                     continue
@@ -193,6 +510,7 @@ class AdaptiveExecutor:
             try:
                 self.page.keyboard.press('Meta+N')
                 self._wait_for_stable_page()
+                self._resolution = {"strategy": "app_handler", "keyboard_shortcut": 'Meta+N'}
                 return True
             except:
                 pass
@@ -205,12 +523,14 @@ class AdaptiveExecutor:
         timeout = 10000
 
         if action == 'navigate':
-            try:
-                self.page.goto(step['url'], wait_until='domcontentloaded', timeout=timeout)
-                self.page.wait_for_timeout(1500)  # Extra time for page to fully render
-            except PlaywrightTimeout:
-                self.page.goto(step['url'], wait_until='load', timeout=timeout)
-                self.page.wait_for_timeout(1500)
+            if self._prefetch_hit:
+                self._prefetch_hit = False  # Only the first attempt; retries navigate for real
+            else:
+                try:
+                    self.page.goto(step['url'], wait_until='domcontentloaded', timeout=timeout)
+                except PlaywrightTimeout:
+                    self.page.goto(step['url'], wait_until='load', timeout=timeout)
+            self._settle(step, network_idle=True)  # Until the page has actually rendered
             
         elif action == 'click':
             if step.get('text_match'):
@@ -220,8 +540,8 @@ class AdaptiveExecutor:
                 # Use direct click (simpler, more reliable)
                 self.page.click(selector, timeout=timeout)
             
-            # Give time for dynamic content (dropdowns, modals) to appear
-            self.page.wait_for_timeout(1500)  # 1.5 seconds - dropdowns need this!
+            # Wait for dynamic content (dropdowns, modals) to finish appearing
+            self._settle(step)
         
         elif action == 'type':
             loc = self.page.locator(selector)
@@ -236,7 +556,7 @@ class AdaptiveExecutor:
                 
             loc.fill("") 
             loc.type(step['input_value'], delay=30) 
-            self.page.wait_for_timeout(500) # Wait for autosuggest
+            self._settle(step)  # Wait for autosuggest
         
         elif action == 'press_enter':
             if selector:
@@ -252,62 +572,158 @@ class AdaptiveExecutor:
         
         elif action == 'scroll':
             self.page.evaluate("window.scrollBy({top: 500, behavior: 'smooth'})")
-            self.page.wait_for_timeout(500)
+            self._settle(step)
         
         elif action == 'wait':
-            self.page.wait_for_timeout(2000)
+            self._settle(step, network_idle=True)
     
     def _try_fallback_strategy(self, step, attempt_num):
-        # Strategy 1: Fallback selectors
-        if attempt_num == 1 and step.get('fallback_selectors'):
-            for fallback in step['fallback_selectors']:
-                try:
-                    if step['action'] == 'click':
-                        self.page.click(fallback, timeout=5000)
-                        self._wait_for_stable_page()
-                    elif step['action'] == 'type':
-                        self.page.fill(fallback, step['input_value'], timeout=5000)
-                    return True
-                except:
-                    continue
+        # Strategy 1: Race the primary, fallback, learned and text_match selectors together
+        if attempt_num == 1 and step['action'] in ('click', 'type'):
+            with span("fallback:race"):
+                raced = self._race_fallback_selectors(step)
+            if raced:
+                return True
         
-        # Strategy 2: Visible input strategy
+        # Strategy 2: Visible input strategy, then typing directly
         if attempt_num == 2 and step['action'] == 'type':
-            try:
-                visible_input = self.page.locator('input:visible, textarea:visible').first
-                visible_input.click(timeout=3000)
-                visible_input.fill(step['input_value'], timeout=5000)
-                return True
-            except:
-                # Try typing directly
-                try:
-                    self.page.keyboard.type(step['input_value'], delay=50)
-                    return True
-                except:
-                    pass
+            for strategy in self._ranked_candidates(step, ['strategy:visible_input', 'strategy:keyboard_type']):
+                with span(f"fallback:{strategy.split(':', 1)[1]}"):
+                    started = time.perf_counter()
+                    try:
+                        if strategy == 'strategy:visible_input':
+                            visible_input = self.page.locator('input:visible, textarea:visible').first
+                            visible_input.click(timeout=3000)
+                            visible_input.fill(step['input_value'], timeout=5000)
+                        else:
+                            self.page.keyboard.type(step['input_value'], delay=50)
+                        self._record_candidate(step, strategy, True, started)
+                        self._resolution = {"strategy": strategy.split(':', 1)[1]}
+                        return True
+                    except:
+                        self._record_candidate(step, strategy, False, started)
+                        continue
         
         # Strategy 3: Text-based clicking
         if attempt_num == 2 and step['action'] == 'click':
-            words = step['description'].lower().split()
-            action_words = ['search', 'create', 'new', 'submit', 'save', 'add', 'open']
-            for word in action_words:
-                if word in words:
+            for candidate, word in self._text_click_candidates(step):
+                with span("fallback:text_click", selector=candidate):
+                    started = time.perf_counter()
                     try:
-                        self.page.click(f'text=/{word}/i', timeout=5000)
+                        self.page.click(candidate, timeout=5000)
                         self._wait_for_stable_page()
+                        self._record_candidate(step, candidate, True, started)
+                        self._resolution = {"strategy": "text_click", "text": word}
                         return True
                     except:
+                        self._record_candidate(step, candidate, False, started)
                         continue
         return False
     
+    def _race_fallback_selectors(self, step):
+        """
+        Probes every candidate selector at once and acts on the first visible, enabled match.
+        If acting on it fails, the race continues with the rest - all within one
+        LOCATOR_RACE_TIMEOUT_MS budget instead of a 5s timeout per selector.
+        """
+        remaining = self._race_candidates(step)
+        
+        started = time.perf_counter()
+        deadline = started + LOCATOR_RACE_TIMEOUT_MS / 1000
+        seen = set()
+        while remaining:
+            budget_ms = (deadline - time.perf_counter()) * 1000
+            if budget_ms <= 0:
+                break
+            selector, element = resolve_first_locator(self.page, remaining, timeout_ms=budget_ms, seen=seen)
+            if selector is None:
+                break
+            
+            action_timeout = max(1000, (deadline - time.perf_counter()) * 1000)
+            try:
+                if step['action'] == 'click':
+                    element.click(timeout=action_timeout)
+                    self._wait_for_stable_page()
+                else:
+                    element.fill(step['input_value'], timeout=action_timeout)
+            except Exception:
+                self._record_candidate(step, selector, False, started)
+                remaining.remove(selector)
+                continue
+            
+            self._record_candidate(step, selector, True, started)
+            self._resolution = {"strategy": "fallback_selector", "selector": selector}
+            print(f"   🏁 Resolved via '{selector}' in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return True
+        
+        # Nothing usable: only blame the selectors that never matched anything
+        for selector in remaining:
+            if selector not in seen:
+                self._record_candidate(step, selector, False, started)
+        return False
+    
+    def _apply_resolution(self, step, resolution):
+        """
+        Re-runs exactly the strategy recorded in a resolved plan - no cascade, no guessing.
+        Returns False (or raises) when the recorded strategy no longer applies.
+        """
+        strategy = resolution['strategy']
+        
+        if strategy == 'primary':
+            self._perform_action(step)
+            return True
+        
+        if strategy == 'app_handler':
+            self.page.keyboard.press(resolution['keyboard_shortcut'])
+            if step['action'] == 'type':
+                self.page.wait_for_timeout(500)
+                if self.page.locator('input:focus, textarea:focus').count() == 0:
+                    return False
+                self.page.keyboard.type(step['input_value'], delay=50)
+            else:
+                self._wait_for_stable_page()
+            return True
+        
+        if strategy == 'fallback_selector':
+            if step['action'] == 'click':
+                self.page.click(resolution['selector'], timeout=5000)
+                self._wait_for_stable_page()
+            elif step['action'] == 'type':
+                self.page.fill(resolution['selector'], step['input_value'], timeout=5000)
+            return True
+        
+        if strategy == 'visible_input':
+            visible_input = self.page.locator('input:visible, textarea:visible').first
+            visible_input.click(timeout=3000)
+            visible_input.fill(step['input_value'], timeout=5000)
+            return True
+        
+        if strategy == 'keyboard_type':
+            self.page.keyboard.type(step['input_value'], delay=50)
+            return True
+        
+        if strategy == 'text_click':
+            self.page.click(f"text=/{resolution['text']}/i", timeout=5000)
+            self._wait_for_stable_page()
+            return True
+        
+        if strategy == 'ai_suggestion':
+            return self._try_ai_suggestion(step, resolution['verification'])
+        
+        return False
+    
     def _try_ai_suggestion(self, step, verification):
+        candidate = None
+        started = time.perf_counter()
         try:
             approach = verification.get('alternative_approach', '')
             
             if approach == 'click_text' and verification.get('text_to_click'):
                 text = verification['text_to_click']
-                self.page.click(f'text="{text}"', timeout=5000)
+                candidate = f'text="{text}"'
+                self.page.click(candidate, timeout=5000)
                 self._wait_for_stable_page()
+                self._record_candidate(step, candidate, True, started)
                 return True
             
             elif approach == 'keyboard_shortcut' and verification.get('keyboard_shortcut'):
@@ -316,18 +732,32 @@ class AdaptiveExecutor:
                 return True
             
             elif approach == 'different_selector' and verification.get('alternative_selector'):
-                selector = verification['alternative_selector']
+                candidate = verification['alternative_selector']
                 if step['action'] == 'click':
-                    self.page.click(selector, timeout=5000)
+                    self.page.click(candidate, timeout=5000)
                 elif step['action'] == 'type':
-                    self.page.fill(selector, step['input_value'], timeout=5000)
+                    self.page.fill(candidate, step['input_value'], timeout=5000)
                 self._wait_for_stable_page()
+                self._record_candidate(step, candidate, True, started)
                 return True
         except Exception as e:
             print(f"      AI suggestion failed: {e}")
+            self._record_candidate(step, candidate, False, started)
             return False
         return False
     
     def close(self):
-        self.browser.close()
-        self.playwright.stop()
\ No newline at end of file
+        self.screenshot_writer.close()  # Flush pending screenshots even for borrowed contexts
+        if self.selector_index:
+            self.selector_index.save()
+        if self._pool is not None:
+            self._pool.checkin(self.browser)
+            return
+        if not self._owns_browser:
+            return
+        self.browser.close()  # Also writes a recorded HAR
+        self.playwright.stop()
+        if self.network is not None:
+            self.network.save()
+            if self.network.summary():
+                print(self.network.summary())
@@ -2,235 +2,671 @@
 Adaptive Planner - A self-correcting AI that can see and replan
 This is Agent A 2.0 - it can look at screenshots and adjust the plan
 """
+import contextvars
 import json
-import base64
-from openai import OpenAI
-from config import MODEL_NAME
+import threading
+import time
+from collections import deque
+from config import CONVERSATION_HISTORY_MAX, VERIFY_BATCH_MAX_WIDTH, VERIFY_BATCH_DETAIL, TEXT_VERIFY_MIN_CONFIDENCE
+from planner_backends import make_backend
+from tracing import span
+from usage_meter import UsageMeter, format_usage
 from pathlib import Path
+from plan_cache import make_plan_key
+from plan_stream import StepStreamParser, PlanStream
+from image_prep import prepare_image, to_data_url, perceptual_hash
+from verdict_cache import failure_signature
 
-class AdaptivePlanner:
-    def __init__(self, api_key):
-        self.client = OpenAI(api_key=api_key)
-        self.conversation_history = []
+
+# Prompts are shared by AdaptivePlanner and AsyncAdaptivePlanner so both plan the same way
+
+def build_plan_prompt(task_query, app_name, app_context):
+    return f"""
+    You are an advanced AI Workflow Planner with self-correction abilities.
     
-    def plan_initial_workflow(self, task_query, app_name, app_context):
-        """Creates the initial plan"""
-        print(f"🧠 Adaptive Brain: Planning steps for '{task_query}'...")
-        
+    Task: "{task_query}"
+    App: {app_name}
+    Context: {json.dumps(app_context, separators=(",", ":"))}
+
+    Create a flexible, robust plan. Return JSON with this structure:
+    {{
+        "steps": [
+            {{
+                "step_number": 1,
+                "action": "navigate|click|type|press_enter|wait|scroll|keyboard_shortcut",
+                "description": "Clear explanation of what this does",
+                "primary_selector": "Preferred selector",
+                "fallback_selectors": ["Alternative selector 1", "Alternative selector 2"],
+                "text_match": "Text to find (for text-based clicking)",
+                "url": "For navigate action",
+                "input_value": "For type action",
+                "keyboard_shortcut": "For keyboard actions (e.g. 'Meta+K')",
+                "verification_text": "Specific text that should appear after this step",
+                "verification_selector": "Element that should exist after this step",
+                "requires_screenshot": true
+            }}
+        ]
+    }}
+    
+    CRITICAL REQUIREMENTS:
+    1. ASSUME USER IS ALREADY LOGGED IN - Do NOT include login steps
+       - Start directly with the task actions
+       - Skip any authentication or sign-in steps
+    
+    2. For each step, specify BOTH:
+       - verification_text: Exact text that confirms success (e.g., "Create a new repository")
+       - verification_selector: An element selector that should exist (e.g., 'input#repository-name')
+    
+    3. Prefer TEXT-BASED selectors: button:has-text("Create") over [data-testid="..."]
+    
+    4. Break complex tasks into small, verifiable steps
+    
+    5. Add explicit 'wait' steps after actions that trigger page loads or modals
+    """
+
+
+def build_discovery_prompt(task_query):
+    return f"""
+    Task: "{task_query}"
+    
+    Look at this screenshot and identify the UI elements needed for this task.
+    
+    For example, if the task is "create a repository":
+    - Find the button/link to start creating (e.g., "New", "Create", "+")
+    - Find form fields (repository name, description, etc.)
+    - Find the submit button
+    
+    Respond with JSON containing suggested selectors:
+    {{
+        "discovered_selectors": {{
+            "primary_action_button": "selector for main action (e.g., 'New' button)",
+            "form_fields": ["selector1", "selector2"],
+            "submit_button": "selector for final submit"
+        }},
+        "workflow_hints": "Brief description of the workflow you see",
+        "confidence": 0-100
+    }}
+    
+    Use robust selectors like:
+    - Text-based: button:has-text("Create"), a:has-text("New")
+    - Aria-labels: [aria-label="Create something new"]
+    - IDs: input#repository_name
+    - Placeholders: [placeholder="Repository name"]
+    """
+
+
+def describe_expectation(step):
+    """What the plan said should be true after a step: its verification_text and/or verification_selector"""
+    expected = []
+    if step.get('verification_text'):
+        expected.append(f"text \"{step['verification_text']}\" visible")
+    if step.get('verification_selector'):
+        expected.append(f"element {step['verification_selector']} present")
+    return "; ".join(expected) or "State change"
+
+
+def build_verification_prompt(step, success, error_message=None):
+    if success:
         prompt = f"""
-        You are an advanced AI Workflow Planner with self-correction abilities.
+        Step {step['step_number']} completed: "{step['description']}"
+        Action: {step['action']} on {step.get('primary_selector', 'N/A')}
         
-        Task: "{task_query}"
-        App: {app_name}
-        Context: {json.dumps(app_context)}
-
-        Create a flexible, robust plan. Return JSON with this structure:
+        Look at the screenshot. Did this action succeed?
+        Expected: {describe_expectation(step)}
+        
+        Respond with JSON:
         {{
-            "steps": [
-                {{
-                    "step_number": 1,
-                    "action": "navigate|click|type|press_enter|wait|scroll|keyboard_shortcut",
-                    "description": "Clear explanation of what this does",
-                    "primary_selector": "Preferred selector",
-                    "fallback_selectors": ["Alternative selector 1", "Alternative selector 2"],
-                    "text_match": "Text to find (for text-based clicking)",
-                    "url": "For navigate action",
-                    "input_value": "For type action",
-                    "keyboard_shortcut": "For keyboard actions (e.g. 'Meta+K')",
-                    "verification_text": "Specific text that should appear after this step",
-                    "verification_selector": "Element that should exist after this step",
-                    "requires_screenshot": true
-                }}
-            ]
+            "success": true/false,
+            "observation": "What you see in the screenshot",
+            "next_action": "continue" or "retry_with_alternative" or "skip",
+            "alternative_selector": "If retry needed, suggest a better selector",
+            "confidence": 0-100
         }}
+        """
+    else:
+        prompt = f"""
+        Step {step['step_number']} FAILED: "{step['description']}"
+        Error: {error_message}
+        Tried selector: {step.get('primary_selector', 'N/A')}
         
-        CRITICAL REQUIREMENTS:
-        1. ASSUME USER IS ALREADY LOGGED IN - Do NOT include login steps
-           - Start directly with the task actions
-           - Skip any authentication or sign-in steps
-        
-        2. For each step, specify BOTH:
-           - verification_text: Exact text that confirms success (e.g., "Create a new repository")
-           - verification_selector: An element selector that should exist (e.g., 'input#repository-name')
-        
-        3. Prefer TEXT-BASED selectors: button:has-text("Create") over [data-testid="..."]
-        
-        4. Break complex tasks into small, verifiable steps
+        Look at the screenshot. What went wrong?
         
-        5. Add explicit 'wait' steps after actions that trigger page loads or modals
+        Suggest a fix. Respond with JSON:
+        {{
+            "success": false,
+            "problem": "Why it failed",
+            "alternative_approach": "click_text|keyboard_shortcut|different_selector|skip",
+            "alternative_selector": "Better selector to try",
+            "text_to_click": "If using text-based approach",
+            "keyboard_shortcut": "If using keyboard",
+            "should_skip": false,
+            "reasoning": "Why this approach is better"
+        }}
         """
+    return prompt
 
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        
-        plan = json.loads(response.choices[0].message.content)
+
+def build_text_verification_prompt(step, snapshot, success, error_message=None):
+    """The verification prompt, judged from the accessibility tree instead of a screenshot"""
+    prompt = build_verification_prompt(step, success, error_message).replace(
+        "Look at the screenshot.", "Look at the page's accessibility tree below."
+    )
+    return prompt + f"""
+    Also include "can_tell": true/false - false if the accessibility tree alone isn't enough to judge
+    (the answer depends on layout, images or canvas content).
+    
+    Accessibility tree:
+    {snapshot}
+    """
+
+
+def build_batch_verification_prompt(steps):
+    described = "\n".join(
+        f"    Screenshot {n}: step {step['step_number']} \"{step['description']}\" "
+        f"({step['action']} on {step.get('primary_selector', 'N/A')}), expected: {describe_expectation(step)}"
+        for n, step in enumerate(steps, 1)
+    )
+    return f"""
+    These {len(steps)} consecutive steps completed. The screenshots below were taken after each one, in order.
+{described}
+    
+    For each screenshot, did its step succeed?
+    Respond with JSON:
+    {{
+        "verdicts": [
+            {{
+                "screenshot": 1,
+                "success": true/false,
+                "observation": "What you see in that screenshot",
+                "next_action": "continue" or "retry_with_alternative" or "skip",
+                "alternative_selector": "If retry needed, suggest a better selector",
+                "confidence": 0-100
+            }}
+        ]
+    }}
+    """
+
+
+def build_batch_verification_messages(entries, detail):
+    """
+    One user message: the batch prompt, then every step's screenshot downscaled to
+    VERIFY_BATCH_MAX_WIDTH. Returns (messages, prepared size of the first image).
+    """
+    content = [{"type": "text", "text": build_batch_verification_prompt([e["step"] for e in entries])}]
+    image_size = None
+    for entry in entries:
+        image_url, info = load_vision_image(entry["screenshot_path"], entry.get("screenshot_bytes"),
+                                            max_width=VERIFY_BATCH_MAX_WIDTH)
+        image_size = image_size or info["prepared_size"]
+        content.append({"type": "image_url", "image_url": {"url": image_url, "detail": detail}})
+    return [{"role": "user", "content": content}], image_size
+
+
+def split_batch_verdicts(result, count):
+    """
+    The model's {"verdicts": [...]} as one verdict per screenshot, in order.
+    Screenshot numbers are read with int() ("2" and 2.0 both mean screenshot 2); a screenshot
+    the model skipped or numbered out of range gets None - unknown, not a pass.
+    """
+    by_screenshot = {}
+    for position, verdict in enumerate(result.get("verdicts") or [], 1):
+        if not isinstance(verdict, dict):
+            continue
+        verdict = dict(verdict)
+        try:
+            number = int(verdict.pop("screenshot", position))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= number <= count:
+            by_screenshot.setdefault(number, verdict)
+    return [by_screenshot.get(n) for n in range(1, count + 1)]
+
+
+def load_vision_image(screenshot_path, screenshot_bytes=None, focus_box=None, scale=1, max_width=None):
+    """
+    Screenshot -> downscaled/re-encoded (and optionally cropped) data URL for a vision call.
+    Uses the in-memory bytes when the executor has them instead of re-reading the file.
+    """
+    if screenshot_bytes is None:
+        with open(screenshot_path, "rb") as img_file:
+            screenshot_bytes = img_file.read()
+    options = {"max_width": max_width} if max_width else {}
+    prepared, mime_type, info = prepare_image(screenshot_bytes, focus_box=focus_box, scale=scale, **options)
+    return to_data_url(prepared, mime_type), info
+
+
+def log_vision_call(vision_log, call_name, info, latency):
+    """Per-call payload size + model latency, so the downscale/quality tradeoff can be tuned"""
+    entry = dict(info, call=call_name, latency_s=round(latency, 2))
+    vision_log.append(entry)
+    crop = ", cropped" if info["cropped"] else ""
+    print(f"   📦 {call_name}: {info['original_bytes'] / 1024:.0f}KB → {info['prepared_bytes'] / 1024:.0f}KB "
+          f"{info['format']} {info['prepared_size'][0]}x{info['prepared_size'][1]}{crop}, {latency:.1f}s")
+
+
+def build_next_steps_prompt(task_query, completed_steps):
+    return f"""
+    Original Task: {task_query}
+    Completed Steps: {len(completed_steps)}
+    
+    Steps completed so far:
+    {json.dumps([s['description'] for s in completed_steps], indent=2)}
+    
+    What should we do next to complete the task?
+    Return 1-3 more steps in the same JSON format as before.
+    """
+
+
+class PlannerCore:
+    """
+    Everything AdaptivePlanner and AsyncAdaptivePlanner share except talking to the model:
+    plan and verdict caching, token budgets, message building and reading the model's answers.
+    The two planners only differ in how _complete() reaches the backend (blocking vs awaited).
+    """
+
+    def __init__(self, api_key=None, plan_cache=None, verdict_cache=None, backend=None):
+        # planner_backends: OpenAI by default, LocalBackend for load tests
+        self.backend = backend or make_backend(api_key=api_key)
+        self.conversation_history = deque(maxlen=CONVERSATION_HISTORY_MAX)
+        self.usage = UsageMeter()
+        self.plan_cache = plan_cache
+        self.verdict_cache = verdict_cache
+        self.vision_log = []
+    
+    def _record_usage(self, attrs, call, response, started, messages, image_size=None, step=None):
+        """Meters a finished model call and puts its token counts on the call's span"""
+        entry = self.usage.record(call, response, time.perf_counter() - started, messages, image_size, step)
+        attrs.update(response["usage"], image_tokens=entry["image_tokens"], cost_usd=entry["cost_usd"])
+    
+    def _cached_plan(self, task_query, app_name, app_context):
+        """(cache_key, cached plan or None) - the key is None without a plan cache"""
+        if self.plan_cache is None:
+            return None, None
+        cache_key = make_plan_key(task_query, app_name, app_context, self.backend.model)
+        cached = self.plan_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ Plan cache hit for '{task_query}' - skipping LLM planning")
+            cached['cache_key'] = cache_key
+        return cache_key, cached
+    
+    def _store_plan(self, plan, cache_key, task_query, app_name):
         self.conversation_history.append({
             "role": "assistant",
             "content": f"Initial plan created with {len(plan['steps'])} steps"
         })
         
+        if cache_key is not None:
+            self.plan_cache.put(cache_key, plan, task_query, app_name)
+            plan['cache_key'] = cache_key
+        
         return plan
     
-    def discover_selectors(self, screenshot_path, task_query):
+    def _plan_step_parser(self, stream):
+        """on_delta callback for a streamed plan: each step goes into `stream` as soon as it parses"""
+        parser = StepStreamParser()
+        
+        def on_delta(text):
+            for step in parser.feed(text):
+                print(f"   📨 Step {step['step_number']} planned: {step.get('description', '')}")
+                stream.put_step(step)
+        return on_delta
+    
+    def record_workflow_result(self, workflow, history):
         """
-        NEW FEATURE: Analyze a screenshot and discover selectors for a task
-        This lets AI figure out the UI without any context!
+        Feedback from run_adaptive_workflow: a cached plan that failed
+        gets evicted so the next run replans from scratch.
         """
-        print(f"🔍 AI is analyzing the page to discover selectors...")
+        usage = format_usage(self.usage.end_workflow(workflow.get('task')))
+        if usage:
+            print(usage)
         
-        with open(screenshot_path, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
+        if self.verdict_cache is not None:
+            stats = self.verdict_cache.session_stats
+            if stats["hits"] or stats["misses"]:
+                print(f"♻️  Verdict cache: {stats['hits']} hits / {stats['misses']} misses this run "
+                      f"({self.verdict_cache.hit_rate():.0%} all-time)")
+            self.verdict_cache.save()
         
-        prompt = f"""
-        Task: "{task_query}"
+        if self.plan_cache is None:
+            return
+        if self.plan_cache.invalidate_if_failed(workflow.get('cache_key'), history):
+            print("🗑️  Cached plan failed - invalidated, next run will replan")
+        self.plan_cache.save()  # Lookups only update hit counts / LRU times in memory
+    
+    def _discovery_messages(self, screenshot_path, task_query, screenshot_bytes=None):
+        """(messages, image info) for discover_selectors"""
+        image_url, image_info = load_vision_image(screenshot_path, screenshot_bytes)
         
-        Look at this screenshot and identify the UI elements needed for this task.
+        prompt = build_discovery_prompt(task_query)
+        
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url, "detail": self.usage.image_detail()}}
+                ]
+            }
+        ]
+        return messages, image_info
+    
+    def _read_discovery(self, response):
+        discovery = json.loads(response["content"])
+        print(f"   ✅ Discovered {len(discovery.get('discovered_selectors', {}))} selector categories")
+        print(f"   💡 Workflow: {discovery.get('workflow_hints', 'N/A')}")
+        return discovery
+    
+    def _cached_verdict(self, step, success, error_message, screenshot_bytes):
+        """
+        (cache_ref, cached verdict or None) for this failure on a near-identical page.
+        The ref is None without a verdict cache or screenshot; a returned verdict already carries it.
+        Every tier shares the entry, so a text verdict saves the next vision call and vice versa.
+        """
+        if self.verdict_cache is None or screenshot_bytes is None:
+            return None, None
+        cache_ref = {
+            "signature": failure_signature(step, success, error_message),
+            "phash": perceptual_hash(screenshot_bytes)
+        }
+        cached = self.verdict_cache.get(**cache_ref)
+        if cached is not None:
+            print(f"   ♻️  Reusing cached verdict: {cached.get('observation', cached.get('problem', ''))}")
+            cached['cache_ref'] = cache_ref
+        return cache_ref, cached
+    
+    def _store_verdict(self, verdict, cache_ref):
+        if cache_ref is not None:
+            self.verdict_cache.put(cache_ref["signature"], cache_ref["phash"], verdict)
+            verdict['cache_ref'] = cache_ref
+        return verdict
+    
+    def _budget_skip(self, success, what="vision verification"):
+        """The verdict to return instead of a model call once the workflow's token budget is spent, else None"""
+        if self.usage.allow_verification():
+            return None
+        print(f"   💸 Workflow token budget spent - skipping {what}")
+        return {"success": success, "should_skip": True, "budget_skipped": True,
+                "reasoning": "Token budget exhausted"}
+    
+    def _verification_messages(self, step, screenshot_path, success, error_message,
+                               screenshot_bytes, focus_box, scale):
+        """(messages, image info) for verify_and_adapt"""
+        # Downscaled / cropped copy of the screenshot for vision
+        image_url, image_info = load_vision_image(screenshot_path, screenshot_bytes, focus_box, scale)
         
-        For example, if the task is "create a repository":
-        - Find the button/link to start creating (e.g., "New", "Create", "+")
-        - Find form fields (repository name, description, etc.)
-        - Find the submit button
+        prompt = build_verification_prompt(step, success, error_message)
         
-        Respond with JSON containing suggested selectors:
-        {{
-            "discovered_selectors": {{
-                "primary_action_button": "selector for main action (e.g., 'New' button)",
-                "form_fields": ["selector1", "selector2"],
-                "submit_button": "selector for final submit"
-            }},
-            "workflow_hints": "Brief description of the workflow you see",
-            "confidence": 0-100
-        }}
+        messages = [
+            {"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url,
+                        "detail": self.usage.image_detail()
+                    }
+                }
+            ]}
+        ]
+        return messages, image_info
+    
+    def _read_verdict(self, response):
+        result = json.loads(response["content"])
+        print(f"   AI says: {result.get('observation', result.get('problem', 'Analyzing...'))}")
+        return result
+    
+    def _read_text_verdict(self, response, success):
+        """The text tier's verdict, or None when it should escalate to vision"""
+        result = json.loads(response["content"])
+        if not result.pop("can_tell", True):
+            print("   ↗️  Can't tell from the accessibility tree - escalating to vision")
+            return None
+        if success and result.get("success") and result.get("confidence", 100) < TEXT_VERIFY_MIN_CONFIDENCE:
+            print(f"   ↗️  Only {result['confidence']}% sure from text - escalating to vision")
+            return None
+        print(f"   AI says: {result.get('observation', result.get('problem', 'Analyzing...'))}")
+        return result
+    
+    def _cached_batch(self, entries):
+        """(verdicts, cache_refs) for verify_batch - verdicts[i] is None where the model still has to look"""
+        print(f"🔍 Verifying steps {', '.join(str(e['step']['step_number']) for e in entries)} in one call...")
+        verdicts = [None] * len(entries)
+        cache_refs = [None] * len(entries)
+        if self.verdict_cache is None:
+            return verdicts, cache_refs
+        for i, entry in enumerate(entries):
+            screenshot_bytes = entry.get("screenshot_bytes") or Path(entry["screenshot_path"]).read_bytes()
+            cache_refs[i], verdicts[i] = self._cached_verdict(entry["step"], True, None, screenshot_bytes)
+        return verdicts, cache_refs
+    
+    def _merge_batch(self, entries, verdicts, cache_refs, missing, response, latency):
+        """
+        Fills the `missing` verdicts from the model's batch answer, caching each one.
+        Steps the answer has no verdict for stay None (and uncached) for verify_batch to check singly.
+        """
+        print(f"   📦 verify_batch: {len(missing)} screenshots at {VERIFY_BATCH_MAX_WIDTH}px, {latency:.1f}s")
+        for i, verdict in zip(missing, split_batch_verdicts(json.loads(response["content"]), len(missing))):
+            verdicts[i] = None if verdict is None else self._store_verdict(verdict, cache_refs[i])
+        answered = [i for i in missing if verdicts[i] is not None]
+        failed = [entries[i]["step"]["step_number"] for i in answered if verdicts[i].get("success") is False]
+        if failed:
+            print(f"   AI says: {len(failed)} of {len(answered)} steps did not work (step {', '.join(map(str, failed))})")
+        elif answered:
+            print(f"   AI says: all {len(answered)} steps look complete")
+        unknown = [entries[i]["step"]["step_number"] for i in missing if verdicts[i] is None]
+        if unknown:
+            print(f"   ❔ No verdict for step {', '.join(map(str, unknown))} - verifying on its own")
+        return verdicts
+    
+    def record_verdict_result(self, verification, worked):
+        """
+        Feedback from the executor: a cached verdict whose suggestion didn't work
+        is dropped so the next occurrence asks the model again.
+        """
+        cache_ref = verification.get('cache_ref')
+        if worked or self.verdict_cache is None or cache_ref is None:
+            return
+        if self.verdict_cache.invalidate(cache_ref["signature"], cache_ref["phash"]):
+            print("   🗑️  Cached verdict didn't work - invalidated")
+
+
+class AdaptivePlanner(PlannerCore):
+    def _complete(self, call, messages, image_size=None, **context):
+        """One model call through the backend, traced and metered with its token counts"""
+        step = context["step"].get("step_number") if context.get("step") else None
+        with span(f"llm:{call}", "llm", model=self.backend.model, step=step) as attrs:
+            started = time.perf_counter()
+            response = self.backend.complete(call, messages, **context)
+            self._record_usage(attrs, call, response, started, messages, image_size, step)
+        return response
+    
+    def _complete_streaming(self, call, messages, on_delta, **context):
+        """_complete, but each chunk of text goes to on_delta as it arrives"""
+        with span(f"llm:{call}", "llm", model=self.backend.model, streamed=True) as attrs:
+            started = time.perf_counter()
+            response = None
+            for event in self.backend.stream(call, messages, **context):
+                if "delta" not in event:
+                    response = event
+                    continue
+                attrs.setdefault("first_chunk_s", round(time.perf_counter() - started, 3))
+                on_delta(event["delta"])
+            self._record_usage(attrs, call, response, started, messages)
+        return response
+    
+    def plan_initial_workflow(self, task_query, app_name, app_context):
+        """Creates the initial plan (served from the plan cache when warm)"""
+        cache_key, cached = self._cached_plan(task_query, app_name, app_context)
+        if cached is not None:
+            return cached
         
-        Use robust selectors like:
-        - Text-based: button:has-text("Create"), a:has-text("New")
-        - Aria-labels: [aria-label="Create something new"]
-        - IDs: input#repository_name
-        - Placeholders: [placeholder="Repository name"]
+        print(f"🧠 Adaptive Brain: Planning steps for '{task_query}'...")
+        
+        prompt = build_plan_prompt(task_query, app_name, app_context)
+        
+        response = self._complete(
+            "plan", [{"role": "user", "content": prompt}],
+            task=task_query, app=app_name, app_context=app_context
+        )
+        
+        return self._store_plan(json.loads(response["content"]), cache_key, task_query, app_name)
+    
+    def stream_initial_workflow(self, task_query, app_name, app_context):
         """
+        Streaming plan_initial_workflow: returns a PlanStream right away and fills it from a
+        background thread, one step at a time as the model writes them - for run_streaming_workflow().
+        """
+        stream = PlanStream()
+        cache_key, cached = self._cached_plan(task_query, app_name, app_context)
+        if cached is not None:
+            for step in cached['steps']:
+                stream.put_step(step)
+            stream.finish(cached)
+            return stream
         
+        print(f"🧠 Adaptive Brain: Streaming steps for '{task_query}'...")
+        # copy_context so the model call from the worker thread lands in the caller's trace
+        threading.Thread(
+            target=contextvars.copy_context().run, daemon=True,
+            args=(self._stream_plan, stream, cache_key, task_query, app_name, app_context)
+        ).start()
+        return stream
+    
+    def _stream_plan(self, stream, cache_key, task_query, app_name, app_context):
         try:
-            response = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_base64}"}}
-                        ]
-                    }
-                ],
-                response_format={"type": "json_object"}
+            response = self._complete_streaming(
+                "plan", [{"role": "user", "content": build_plan_prompt(task_query, app_name, app_context)}],
+                self._plan_step_parser(stream), task=task_query, app=app_name, app_context=app_context
+            )
+            plan = json.loads(response["content"])
+            stream.finish(self._store_plan(plan, cache_key, task_query, app_name))
+        except Exception as e:
+            print(f"   ⚠️  Plan stream failed: {e}")
+            stream.finish(error=e)
+    
+    def discover_selectors(self, screenshot_path, task_query, screenshot_bytes=None):
+        """
+        NEW FEATURE: Analyze a screenshot and discover selectors for a task
+        This lets AI figure out the UI without any context!
+        """
+        print(f"🔍 AI is analyzing the page to discover selectors...")
+        
+        messages, image_info = self._discovery_messages(screenshot_path, task_query, screenshot_bytes)
+        
+        try:
+            started = time.perf_counter()
+            response = self._complete(
+                "discover", messages, image_size=image_info["prepared_size"], task=task_query
             )
             
-            discovery = json.loads(response.choices[0].message.content)
-            print(f"   ✅ Discovered {len(discovery.get('discovered_selectors', {}))} selector categories")
-            print(f"   💡 Workflow: {discovery.get('workflow_hints', 'N/A')}")
-            return discovery
+            log_vision_call(self.vision_log, "discover_selectors", image_info, time.perf_counter() - started)
+            
+            return self._read_discovery(response)
             
         except Exception as e:
             print(f"   ⚠️  Discovery failed: {e}")
             return {"discovered_selectors": {}, "confidence": 0}
     
-    def verify_and_adapt(self, step, screenshot_path, success, error_message=None):
+    def verify_and_adapt(self, step, screenshot_path, success, error_message=None,
+                         screenshot_bytes=None, focus_box=None, scale=1):
         """
         Look at what happened and decide next action
         This is the KEY feature - the AI can SEE the result and adapt!
         """
         print(f"🔍 Verifying Step {step['step_number']}...")
         
-        # Encode screenshot for vision
-        with open(screenshot_path, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
+        if screenshot_bytes is None:
+            with open(screenshot_path, "rb") as img_file:
+                screenshot_bytes = img_file.read()
         
-        if success:
-            prompt = f"""
-            Step {step['step_number']} completed: "{step['description']}"
-            Action: {step['action']} on {step.get('primary_selector', 'N/A')}
-            
-            Look at the screenshot. Did this action succeed?
-            Expected: {step.get('verification', 'State change')}
-            
-            Respond with JSON:
-            {{
-                "success": true/false,
-                "observation": "What you see in the screenshot",
-                "next_action": "continue" or "retry_with_alternative" or "skip",
-                "alternative_selector": "If retry needed, suggest a better selector",
-                "confidence": 0-100
-            }}
-            """
-        else:
-            prompt = f"""
-            Step {step['step_number']} FAILED: "{step['description']}"
-            Error: {error_message}
-            Tried selector: {step.get('primary_selector', 'N/A')}
-            
-            Look at the screenshot. What went wrong?
-            
-            Suggest a fix. Respond with JSON:
-            {{
-                "success": false,
-                "problem": "Why it failed",
-                "alternative_approach": "click_text|keyboard_shortcut|different_selector|skip",
-                "alternative_selector": "Better selector to try",
-                "text_to_click": "If using text-based approach",
-                "keyboard_shortcut": "If using keyboard",
-                "should_skip": false,
-                "reasoning": "Why this approach is better"
-            }}
-            """
+        # Same failure on a near-identical page? Reuse the earlier verdict instead of a vision call
+        cache_ref, cached = self._cached_verdict(step, success, error_message, screenshot_bytes)
+        if cached is not None:
+            return cached
         
-        messages = [
-            {"role": "user", "content": [
-                {"type": "text", "text": prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{img_base64}",
-                        "detail": "high"
-                    }
-                }
-            ]}
-        ]
+        skipped = self._budget_skip(success)
+        if skipped is not None:
+            return skipped
         
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            response_format={"type": "json_object"}
+        messages, image_info = self._verification_messages(
+            step, screenshot_path, success, error_message, screenshot_bytes, focus_box, scale
         )
         
-        result = json.loads(response.choices[0].message.content)
-        print(f"   AI says: {result.get('observation', result.get('problem', 'Analyzing...'))}")
+        started = time.perf_counter()
+        response = self._complete(
+            "verify", messages, image_size=image_info["prepared_size"],
+            step=step, success=success, error_message=error_message
+        )
+        log_vision_call(self.vision_log, f"verify step {step['step_number']}", image_info, time.perf_counter() - started)
         
-        return result
+        return self._store_verdict(self._read_verdict(response), cache_ref)
     
-    def suggest_next_steps(self, current_state, task_query, completed_steps):
+    def verify_from_snapshot(self, step, snapshot, success, error_message=None, screenshot_bytes=None):
         """
-        Dynamic replanning - ask AI what to do next based on current state
+        Text-only verification over an accessibility snapshot - no image tokens.
+        Returns None when the model can't tell from text, so the caller escalates to vision.
+        Pass the step's `screenshot_bytes` to share verify_and_adapt's verdict cache.
         """
-        print("🔄 Asking AI for next steps based on current progress...")
+        print(f"📝 Verifying Step {step['step_number']} from the accessibility tree...")
+        cache_ref, cached = self._cached_verdict(step, success, error_message, screenshot_bytes)
+        if cached is not None:
+            return cached
         
-        prompt = f"""
-        Original Task: {task_query}
-        Completed Steps: {len(completed_steps)}
+        skipped = self._budget_skip(success, "verification")
+        if skipped is not None:
+            return skipped
         
-        Steps completed so far:
-        {json.dumps([s['description'] for s in completed_steps], indent=2)}
+        prompt = build_text_verification_prompt(step, snapshot, success, error_message)
+        response = self._complete(
+            "verify_text", [{"role": "user", "content": prompt}],
+            step=step, success=success, error_message=error_message
+        )
+        verdict = self._read_text_verdict(response, success)
+        return None if verdict is None else self._store_verdict(verdict, cache_ref)
+    
+    def verify_batch(self, entries):
+        """
+        Verifies several successful steps in one vision call. `entries` are dicts with
+        step, screenshot_path and screenshot_bytes; returns one verdict per entry, in order.
+        Cached verdicts are reused per step, only the rest go to the model; a step the
+        model's answer leaves out is verified on its own with verify_and_adapt().
+        """
+        verdicts, cache_refs = self._cached_batch(entries)
+        missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        if not missing:
+            print("   ♻️  All verdicts cached")
+            return verdicts
+        skipped = self._budget_skip(True)
+        if skipped is not None:
+            return [verdict or dict(skipped) for verdict in verdicts]
         
-        What should we do next to complete the task?
-        Return 1-3 more steps in the same JSON format as before.
+        batch = [entries[i] for i in missing]
+        messages, image_size = build_batch_verification_messages(batch, VERIFY_BATCH_DETAIL)
+        started = time.perf_counter()
+        response = self._complete(
+            "verify_batch", messages, image_size=image_size, steps=[e["step"] for e in batch]
+        )
+        verdicts = self._merge_batch(entries, verdicts, cache_refs, missing, response, time.perf_counter() - started)
+        for i, verdict in enumerate(verdicts):
+            if verdict is None:
+                entry = entries[i]
+                verdicts[i] = self.verify_and_adapt(
+                    entry["step"], entry["screenshot_path"], success=True, screenshot_bytes=entry.get("screenshot_bytes")
+                )
+        return verdicts
+    
+    def suggest_next_steps(self, current_state, task_query, completed_steps):
+        """
+        Dynamic replanning - ask AI what to do next based on current state
         """
+        print("🔄 Asking AI for next steps based on current progress...")
+        
+        prompt = build_next_steps_prompt(task_query, completed_steps)
         
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
+        response = self._complete(
+            "next_steps", [{"role": "user", "content": prompt}],
+            task=task_query, completed_steps=completed_steps
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(response["content"])
 
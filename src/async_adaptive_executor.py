@@ -0,0 +1,777 @@
+"""
+Async Adaptive Executor - AdaptiveExecutor on playwright.async_api
+Same step semantics as the sync executor (cascade, resolutions, settle detection),
+but every browser and planner call is awaited, so one event loop can drive many workflows.
+Pair it with AsyncAdaptivePlanner.
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+from perception import async_get_page_hash, async_inject_visual_marks, draw_visual_marks
+from settle import async_wait_for_settle
+from locator_race import async_resolve_first_locator
+from tracing import span, trace_run
+from launch_profiles import resolve_profile, persistent_options, async_apply_routing
+from pipelined_verifier import AsyncPipelinedVerifier, PipelineState
+from tiered_verify import async_check_in_page, async_dialog_open, async_accessibility_snapshot, expects_dialog
+from executor_core import ExecutorCore
+from config import LOCATOR_RACE_TIMEOUT_MS, TEXT_VERIFICATION
+
+
+async def _steps_of(steps):
+    """A plan's step list as an async iterator, so _run_pipelined can also take a plan stream"""
+    for step in steps:
+        yield step
+
+
+class AsyncAdaptiveExecutor(ExecutorCore):
+    def __init__(self, context, page, playwright=None, owns_browser=False, selector_index=None, pool=None):
+        """
+        Wraps an already-open async browser context.
+        Use `await AsyncAdaptiveExecutor.launch()` for a self-contained persistent browser,
+        or `await AsyncAdaptiveExecutor.from_context(ctx)` to run inside a shared one,
+        or `await AsyncAdaptiveExecutor.from_pool(pool)` to borrow a warm context from an AsyncSessionPool.
+        Pass a SelectorIndex to learn which selectors work across runs.
+        """
+        self.playwright = playwright
+        self.browser = context
+        self.page = page
+        self._owns_browser = owns_browser
+        self._pool = pool
+        self._route_stats = None
+        self.network = None
+        self._init_state(selector_index)
+    
+    @classmethod
+    async def launch(cls, user_data_dir=None, selector_index=None, profile=None, network=None, app=None):
+        """Launches its own persistent Chromium on data/user_data (like AdaptiveExecutor(); `app` picks the default profile)"""
+        if user_data_dir is None:
+            project_root = Path(__file__).parent.parent
+            user_data_dir = str(project_root / "data" / "user_data")
+        
+        launch_profile = resolve_profile(profile, app)
+        print(f"🔐 Using browser profile: {user_data_dir} ({launch_profile['name']} launch)")
+        
+        playwright = await async_playwright().start()
+        context = await playwright.chromium.launch_persistent_context(
+            user_data_dir=user_data_dir,
+            **persistent_options(launch_profile)
+        )
+        if network is not None:
+            await network.async_attach(context)  # Before blocking, so blocked requests never reach the cache
+        page = context.pages[0] if context.pages else await context.new_page()
+        executor = cls(context, page, playwright=playwright, owns_browser=True, selector_index=selector_index)
+        executor.network = network
+        executor._route_stats = await async_apply_routing(context, launch_profile)
+        return executor
+    
+    @classmethod
+    async def from_context(cls, context, selector_index=None):
+        """Runs inside a caller-owned context - close() leaves it open"""
+        page = context.pages[0] if context.pages else await context.new_page()
+        return cls(context, page, selector_index=selector_index)
+    
+    @classmethod
+    async def from_pool(cls, pool, selector_index=None):
+        """Borrows a context from an AsyncSessionPool - close() checks it back in"""
+        context = await pool.checkout()
+        page = context.pages[0] if context.pages else await context.new_page()
+        return cls(context, page, selector_index=selector_index, pool=pool)
+    
+    async def _wait_for_stable_page(self, timeout=2000):
+        """
+        Smart Wait: Waits for the network to settle (no active requests for 500ms).
+        If the network is 'chatty' (e.g., live websockets), it timeouts gracefully.
+        """
+        with span("network_idle"):
+            try:
+                await self.page.wait_for_load_state("networkidle", timeout=timeout)
+            except PlaywrightTimeout:
+                pass 
+
+    async def _settle(self, step, network_idle=False):
+        """
+        Event-driven replacement for the old fixed sleeps.
+        Records how long we actually waited vs. what the fixed sleep would have cost.
+        """
+        with span("settle", action=step['action']):
+            waited = await async_wait_for_settle(
+                self.page,
+                expected_selector=step.get('verification_selector'),
+                network_idle=network_idle
+            )
+        self._record_settle(step, waited)
+
+    async def _capture_debug_snapshot(self, step_number, output_path, clean_bytes):
+        """
+        Saves a screenshot with the AI's 'Set-of-Marks' (Red Boxes) visible.
+        This tells you exactly what elements the AI detected.
+        The boxes are read from the page as data and drawn onto the clean capture
+        by the writer pool - one capture per step and the page is never mutated.
+        The box metadata is saved next to the image as step_XX_debug.json.
+        """
+        with span("set_of_marks"):
+            som_data = await async_inject_visual_marks(self.page, draw=False)
+        
+        filename = f"step_{step_number:02d}_debug.png"
+        full_path = output_path / filename
+        await asyncio.to_thread(
+            self.screenshot_writer.submit, full_path, clean_bytes, lambda png: draw_visual_marks(png, som_data)
+        )
+        await asyncio.to_thread(
+            self.screenshot_writer.submit, full_path.with_suffix('.json'), json.dumps(som_data, indent=2).encode()
+        )
+        
+        return str(full_path)
+
+    def prefetch(self, url):
+        """
+        Speculatively opens `url` (the app's base_url) while the plan is still being generated.
+        Returns right away - the load runs as a task. Most plans start by navigating there:
+        if step 1 does, it reuses this load, any other first step discards it (see _claim_prefetch).
+        """
+        prefetch = self._start_prefetch(url)
+        if prefetch is not None:
+            prefetch["task"] = asyncio.create_task(self._speculative_load(prefetch))
+    
+    async def _speculative_load(self, prefetch):
+        with span("prefetch", url=prefetch['url']):
+            try:
+                await self.page.goto(prefetch['url'], wait_until='domcontentloaded', timeout=10000)
+            except Exception as e:
+                prefetch["error"] = e
+    
+    async def plan_while_prefetching(self, planner, task_query, app_name, app_context):
+        """planner.plan_initial_workflow() while app_context's base_url prefetches in the background"""
+        self.prefetch((app_context or {}).get("base_url"))
+        return await planner.plan_initial_workflow(task_query, app_name, app_context)
+    
+    async def _claim_prefetch(self, step):
+        """
+        First step after prefetch(): True if it navigates to the prefetched URL and the load worked.
+        A first step that doesn't navigate gets the speculative load discarded, so it starts
+        from the same blank page it would have had without prefetching.
+        """
+        prefetch, outcome = self._take_prefetch(step)
+        if prefetch is None:
+            return False
+        if outcome == "reuse":
+            with span("prefetch_wait"):
+                await prefetch['task']
+        else:
+            prefetch['task'].cancel()
+            try:
+                await prefetch['task']
+            except asyncio.CancelledError:
+                pass
+            if outcome == "discard":
+                with span("prefetch_discard"):
+                    await self.page.goto("about:blank")
+        hit = outcome == "reuse" and prefetch['error'] is None
+        print(f"   ⚡ Speculative prefetch of {prefetch['url']}: {'reused' if hit else 'discarded'}")
+        return hit
+    
+    async def run_adaptive_workflow(self, workflow, output_dir, planner=None, app=None):
+        """
+        Runs workflow with adaptive capabilities:
+        - Tries multiple selectors
+        - Captures Clean AND Debug screenshots
+        - Uses AI vision to verify and self-correct
+        """
+        output_path = self._begin_workflow(output_dir, app)
+        
+        history = []
+        print("\n🎬 Starting workflow...\n")
+
+        with trace_run(output_path), span("workflow", "workflow", steps=len(workflow['steps'])):
+            if planner and self.pipelined_verification:
+                history = await self._run_pipelined(_steps_of(workflow['steps']), output_path, planner)
+            else:
+                for step in workflow['steps']:
+                    history.append(await self._run_step(step, output_path, planner))
+        
+            if planner:
+                planner.record_workflow_result(workflow, history)
+        
+            if self.selector_index:
+                await asyncio.to_thread(self.selector_index.save)
+            await asyncio.to_thread(self.screenshot_writer.flush)
+            self._print_summary(history, output_path)
+        return history
+    
+    async def run_streaming_workflow(self, plan_stream, output_dir, planner=None, app=None):
+        """
+        run_adaptive_workflow fed by planner.stream_initial_workflow(): each step runs as soon as
+        it has been parsed, so step 1 is already loading while the model writes the rest of the plan.
+        """
+        output_path = self._begin_workflow(output_dir, app)
+        
+        history = []
+        print("\n🎬 Starting workflow (plan streaming in)...\n")
+
+        with trace_run(output_path), span("workflow", "workflow", streamed=True):
+            if planner and self.pipelined_verification:
+                history = await self._run_pipelined(plan_stream, output_path, planner)
+            else:
+                async for step in plan_stream:
+                    history.append(await self._run_step(step, output_path, planner))
+            
+            if planner:
+                planner.record_workflow_result(plan_stream.plan, history)
+            
+            if self.selector_index:
+                await asyncio.to_thread(self.selector_index.save)
+            await asyncio.to_thread(self.screenshot_writer.flush)
+            self._print_summary(history, output_path)
+        return history
+    
+    async def _run_pipelined(self, steps, output_path, planner):
+        """
+        Pipelined verification: each successful step goes to a background vision check and the
+        next step starts right away. A late "it actually failed" verdict rolls the page back to
+        the URL checkpointed before that step and re-executes from the first step that started on
+        that URL (see PipelineState.apply), the verdict's alternative selector first for the failed
+        step. Each step is rolled back at most once; a second failing verdict is recorded.
+        """
+        verifier = AsyncPipelinedVerifier(planner)
+        state = PipelineState(verifier)
+        steps = aiter(steps)
+        try:
+            while True:
+                rollback = state.apply(await verifier.completed(wait_for_one=state.waiting()))
+                if rollback:
+                    await self._rollback(*rollback)
+                
+                move = state.next_move()
+                if move == "redo":
+                    step = state.redo.pop(0)
+                elif move == "next":
+                    step = await anext(steps, None)
+                    if step is None:
+                        state.exhausted = True
+                        continue
+                elif move == "wait":
+                    continue
+                else:
+                    break
+                
+                url = self.page.url
+                entry = await self._run_step(step, output_path, planner)
+                if state.record(url, entry):
+                    snapshot = await async_accessibility_snapshot(self.page) if TEXT_VERIFICATION else None
+                    verifier.submit(len(state.history) - 1, step, entry['screenshot'], self._last_screenshot, snapshot)
+        finally:
+            verifier.close()
+        print(verifier.summary())
+        return state.history
+    
+    async def _rollback(self, url, step, observation):
+        """
+        Back to the page a step started from, after a late verdict said it didn't work.
+        Only the URL is checkpointed, so the steps since the last navigation are re-run from
+        there - including ones with side effects (a submitted form is submitted again).
+        """
+        print(f"   ⏪ Step {step['step_number']} didn't take effect ({observation}) - rolling back to {url}")
+        with span("rollback", step=step['step_number'], url=url):
+            try:
+                await self.page.goto(url, wait_until='domcontentloaded', timeout=10000)
+            except PlaywrightTimeout:
+                pass
+            await self._wait_for_stable_page()
+        self.last_hash = ""
+    
+    async def run_resolved_workflow(self, resolved_plan, output_dir, planner=None, app=None):
+        """
+        Replay mode: runs a resolved plan (see replay.compile_resolved_plan) exactly as recorded.
+        - No app-specific guesses, no fallback cascade, no vision calls
+        - Each replayed step still gets the in-page checks (tiered_verify tier 1): a recorded
+          strategy can "apply" on a page that has since changed without doing what it used to
+        - On the first divergence, the rest of the workflow drops back to adaptive mode
+        """
+        output_path = self._begin_workflow(output_dir, app or resolved_plan.get('app'))
+        
+        history = []
+        diverged = False
+        print("\n⏩ Replaying resolved workflow...\n")
+        
+        with trace_run(output_path), span("workflow", "workflow", steps=len(resolved_plan['steps']), replay=True):
+            for entry in resolved_plan['steps']:
+                step = entry['step']
+                resolution = entry.get('resolution')
+            
+                if diverged:
+                    history.append(await self._run_step(step, output_path, planner))
+                    continue
+            
+                print(f"⏩ Step {step['step_number']}: {step['description']}")
+                step_start = self._begin_step()
+            
+                dialog_before = await async_dialog_open(self.page) if expects_dialog(step) else True
+                replayed = False
+                error_msg = "No recorded resolution for this step"
+                if resolution:
+                    try:
+                        with span("replay_step", step=step['step_number'], strategy=resolution['strategy']):
+                            replayed = await self._apply_resolution(step, resolution)
+                        error_msg = f"Recorded {resolution['strategy']} strategy did not apply"
+                    except Exception as e:
+                        error_msg = str(e)
+            
+                if not replayed:
+                    print(f"   ↪️  Replay diverged ({error_msg}) - switching to adaptive mode")
+                    diverged = True
+                    history.append(await self._run_step(step, output_path, planner))
+                    continue
+            
+                timing = self._finish_step_timing(step_start)
+                with span("verify_dom"):
+                    passed, problem = await async_check_in_page(self.page, step, dialog_before)
+                clean_path, debug_path = await self._capture_step_screenshots(step, output_path)
+                verified_by = None if passed is None else "dom"
+            
+                if passed is False:
+                    # The action already ran - diagnose the page it left rather than repeating it
+                    print(f"   ↪️  Replay diverged ({problem}) - switching to adaptive mode")
+                    diverged = True
+                    entry = self._step_entry(step, clean_path, debug_path, False, timing,
+                                             error=problem, verified_by=verified_by, replayed=True)
+                    if planner:
+                        await self._recover_with_ai(step, entry, clean_path, planner)
+                    history.append(entry)
+                    continue
+            
+                self.last_hash = await async_get_page_hash(self.page)
+                history.append(self._step_entry(step, clean_path, debug_path, True, timing, resolution=resolution,
+                                                verified_by=verified_by, replayed=True))
+        
+            if self.selector_index:
+                await asyncio.to_thread(self.selector_index.save)
+            await asyncio.to_thread(self.screenshot_writer.flush)
+            self._print_summary(history, output_path)
+        return history
+    
+    async def _capture_step_screenshots(self, step, output_path):
+        """Clean screenshot + Set-of-Marks debug screenshot for one step"""
+        clean_filename = f"step_{step['step_number']:02d}.png"
+        clean_path = output_path / clean_filename
+        with span("screenshot"):
+            clean_bytes = await self.page.screenshot()
+        self._last_screenshot = clean_bytes
+        await asyncio.to_thread(self.screenshot_writer.submit, clean_path, clean_bytes)
+        
+        debug_path = await self._capture_debug_snapshot(
+            step['step_number'], 
+            output_path,
+            clean_bytes
+        )
+        return clean_path, debug_path
+    
+    async def _run_step(self, step, output_path, planner=None):
+        """
+        Executes one step with the full adaptive cascade and returns its history entry.
+        The entry's 'resolution' records exactly what worked, so the run can be replayed.
+        """
+        with span("step", step=step['step_number'], action=step['action']):
+            print(f"👉 Step {step['step_number']}: {step['description']}")
+        
+            success = False
+            error_msg = None
+            self._prefetch_hit = await self._claim_prefetch(step)
+            step_start = self._begin_step()
+            # Only a dialog this step opens can confirm it
+            dialog_before = await async_dialog_open(self.page) if expects_dialog(step) else True
+        
+            for attempt in range(self.max_retries):
+                with span("attempt", attempt=attempt):
+                    try:
+                        if attempt == 0:
+                            with span("app_handler"):
+                                handled = await self._use_app_specific_handler(step)
+                            if handled:
+                                success = True
+                                break
+                            dead = self._primary_is_dead(step)
+                            if dead:
+                                error_msg = dead
+                                continue
+                            primary = self._primary_candidate(step)
+                            started = time.perf_counter()
+                            try:
+                                with span("action"):
+                                    await self._perform_action(step)
+                            except Exception:
+                                self._record_candidate(step, primary, False, started)
+                                raise
+                            self._record_candidate(step, primary, True, started)
+                            self._resolution = {"strategy": "primary"}
+                            success = True
+                            break
+                        else:
+                            if await self._try_fallback_strategy(step, attempt):
+                                success = True
+                                break
+            
+                    except Exception as e:
+                        error_msg = str(e)
+                        with span("retry_backoff"):
+                            await self.page.wait_for_timeout(1000)
+        
+            resolution = dict(self._resolution or {}, attempt=attempt) if success else None
+            timing = self._finish_step_timing(step_start)
+        
+            # VERIFICATION: Check if action actually worked
+            # Tier 1: targeted in-page checks (see tiered_verify)
+            verified_by = None
+            with span("verify_dom"):
+                if success:
+                    passed, problem = await async_check_in_page(self.page, step, dialog_before)
+                    if passed is False:
+                        success = False
+                        error_msg = problem
+                    if passed is not None:
+                        verified_by = "dom"
+  
+            clean_path, debug_path = await self._capture_step_screenshots(step, output_path)
+        
+            with span("page_hash"):
+                current_hash = await async_get_page_hash(self.page)
+        
+            if success:
+                self.last_hash = current_hash
+                return self._step_entry(step, clean_path, debug_path, True, timing,
+                                        resolution=resolution, verified_by=verified_by)
+        
+            entry = self._step_entry(step, clean_path, debug_path, False, timing,
+                                     error=error_msg, verified_by=verified_by)
+            if planner:
+                await self._recover_with_ai(step, entry, clean_path, planner)
+            return entry
+    
+    async def _recover_with_ai(self, step, entry, clean_path, planner):
+        """Diagnoses a failed step's entry and tries the AI's suggestion; updates the entry in place"""
+        verification = await self._diagnose_failure(step, clean_path, entry['error'], planner)
+        entry['verified_by'] = verification['tier']
+        
+        if not verification.get('should_skip', False):
+            print(f"   🤖 AI suggests: {verification.get('reasoning', 'trying alternative')}")
+            
+            with span("ai_suggestion"):
+                worked = await self._try_ai_suggestion(step, verification)
+            planner.record_verdict_result(verification, worked)
+            if worked:
+                entry['success'] = True
+                entry['resolution'] = self._ai_resolution(verification)
+                print(f"   ✅ AI suggestion worked!")
+                
+                # Overwrite the original screenshot with the fixed state
+                self._last_screenshot = await self.page.screenshot()
+                await asyncio.to_thread(self.screenshot_writer.submit, clean_path, self._last_screenshot)
+    
+    async def _diagnose_failure(self, step, clean_path, error_msg, planner):
+        """
+        Tiers 2 and 3 for a failed step: the accessibility tree first, the screenshot only if
+        the model can't tell from text. The verdict records its tier.
+        """
+        if TEXT_VERIFICATION:
+            snapshot = await async_accessibility_snapshot(self.page)
+            if snapshot:
+                with span("verify_text", "planner"):
+                    verification = await planner.verify_from_snapshot(
+                        step, snapshot, success=False, error_message=error_msg, screenshot_bytes=self._last_screenshot
+                    )
+                if verification is not None:
+                    return dict(verification, tier="text")
+        
+        focus_box, scale = await self._failure_focus_box(step)
+        with span("verify_and_adapt", "planner"):
+            verification = await planner.verify_and_adapt(
+                step, clean_path, success=False, error_message=error_msg,
+                screenshot_bytes=self._last_screenshot, focus_box=focus_box, scale=scale
+            )
+        return dict(verification, tier="vision")
+    
+    async def _failure_focus_box(self, step):
+        """
+        Region worth showing the vision model for a failed step: an open modal if there is one,
+        otherwise the failed selector if it exists on the page. (None, 1) = send the full frame.
+        """
+        for candidate in self._focus_candidates(step):
+            try:
+                box = await self.page.locator(candidate).first.bounding_box(timeout=500)
+            except Exception:
+                box = None
+            if box and box['width'] > 0 and box['height'] > 0:
+                scale = await self.page.evaluate("window.devicePixelRatio || 1")
+                return box, scale
+        return None, 1
+    
+    async def _use_app_specific_handler(self, step):
+        if step['action'] == 'type' and 'search' in step['description'].lower():
+            for shortcut in ['/', 'Meta+K', 'Control+K']:
+                try:
+                    await self.page.keyboard.press(shortcut)
+                    await self.page.wait_for_timeout(500)
+                    if await self.page.locator('input:focus, textarea:focus').count() > 0:
+                        await self.page.keyboard.type(step['input_value'], delay=50)
+                        self._resolution = {"strategy": "app_handler", "keyboard_shortcut": shortcut}
+                        return True
+                except:
+                    continue
+        
+        if step['action'] == 'click' and 'new' in step['description'].lower():
+            try:
+                await self.page.keyboard.press('Meta+N')
+                await self._wait_for_stable_page()
+                self._resolution = {"strategy": "app_handler", "keyboard_shortcut": 'Meta+N'}
+                return True
+            except:
+                pass
+        return False
+    
+    async def _perform_action(self, step):
+        """Execute action with event-driven waiting"""
+        action = step['action']
+        selector = step.get('primary_selector') or step.get('selector')
+        timeout = 10000
+
+        if action == 'navigate':
+            if self._prefetch_hit:
+                self._prefetch_hit = False  # Only the first attempt; retries navigate for real
+            else:
+                try:
+                    await self.page.goto(step['url'], wait_until='domcontentloaded', timeout=timeout)
+                except PlaywrightTimeout:
+                    await self.page.goto(step['url'], wait_until='load', timeout=timeout)
+            await self._settle(step, network_idle=True)  # Until the page has actually rendered
+            
+        elif action == 'click':
+            if step.get('text_match'):
+                # Use direct click for text matching
+                await self.page.click(f'text=/{step["text_match"]}/i', timeout=timeout)
+            else:
+                # Use direct click (simpler, more reliable)
+                await self.page.click(selector, timeout=timeout)
+            
+            # Wait for dynamic content (dropdowns, modals) to finish appearing
+            await self._settle(step)
+        
+        elif action == 'type':
+            loc = self.page.locator(selector)
+            await loc.wait_for(state="visible", timeout=timeout)
+            await loc.scroll_into_view_if_needed()
+            
+           
+            try:
+                await loc.click(delay=50)
+            except:
+                pass
+                
+            await loc.fill("") 
+            await loc.type(step['input_value'], delay=30) 
+            await self._settle(step)  # Wait for autosuggest
+        
+        elif action == 'press_enter':
+            if selector:
+                await self.page.press(selector, "Enter", timeout=timeout)
+            else:
+                await self.page.keyboard.press("Enter")
+            await self._wait_for_stable_page()
+        
+        elif action == 'keyboard_shortcut':
+            shortcut = step.get('keyboard_shortcut', 'Enter')
+            await self.page.keyboard.press(shortcut)
+            await self._wait_for_stable_page()
+        
+        elif action == 'scroll':
+            await self.page.evaluate("window.scrollBy({top: 500, behavior: 'smooth'})")
+            await self._settle(step)
+        
+        elif action == 'wait':
+            await self._settle(step, network_idle=True)
+    
+    async def _try_fallback_strategy(self, step, attempt_num):
+        # Strategy 1: Race the primary, fallback, learned and text_match selectors together
+        if attempt_num == 1 and step['action'] in ('click', 'type'):
+            with span("fallback:race"):
+                raced = await self._race_fallback_selectors(step)
+            if raced:
+                return True
+        
+        # Strategy 2: Visible input strategy, then typing directly
+        if attempt_num == 2 and step['action'] == 'type':
+            for strategy in self._ranked_candidates(step, ['strategy:visible_input', 'strategy:keyboard_type']):
+                with span(f"fallback:{strategy.split(':', 1)[1]}"):
+                    started = time.perf_counter()
+                    try:
+                        if strategy == 'strategy:visible_input':
+                            visible_input = self.page.locator('input:visible, textarea:visible').first
+                            await visible_input.click(timeout=3000)
+                            await visible_input.fill(step['input_value'], timeout=5000)
+                        else:
+                            await self.page.keyboard.type(step['input_value'], delay=50)
+                        self._record_candidate(step, strategy, True, started)
+                        self._resolution = {"strategy": strategy.split(':', 1)[1]}
+                        return True
+                    except:
+                        self._record_candidate(step, strategy, False, started)
+                        continue
+        
+        # Strategy 3: Text-based clicking
+        if attempt_num == 2 and step['action'] == 'click':
+            for candidate, word in self._text_click_candidates(step):
+                with span("fallback:text_click", selector=candidate):
+                    started = time.perf_counter()
+                    try:
+                        await self.page.click(candidate, timeout=5000)
+                        await self._wait_for_stable_page()
+                        self._record_candidate(step, candidate, True, started)
+                        self._resolution = {"strategy": "text_click", "text": word}
+                        return True
+                    except:
+                        self._record_candidate(step, candidate, False, started)
+                        continue
+        return False
+    
+    async def _race_fallback_selectors(self, step):
+        """
+        Probes every candidate selector at once and acts on the first visible, enabled match.
+        If acting on it fails, the race continues with the rest - all within one
+        LOCATOR_RACE_TIMEOUT_MS budget instead of a 5s timeout per selector.
+        """
+        remaining = self._race_candidates(step)
+        
+        started = time.perf_counter()
+        deadline = started + LOCATOR_RACE_TIMEOUT_MS / 1000
+        seen = set()
+        while remaining:
+            budget_ms = (deadline - time.perf_counter()) * 1000
+            if budget_ms <= 0:
+                break
+            selector, element = await async_resolve_first_locator(self.page, remaining, timeout_ms=budget_ms, seen=seen)
+            if selector is None:
+                break
+            
+            action_timeout = max(1000, (deadline - time.perf_counter()) * 1000)
+            try:
+                if step['action'] == 'click':
+                    await element.click(timeout=action_timeout)
+                    await self._wait_for_stable_page()
+                else:
+                    await element.fill(step['input_value'], timeout=action_timeout)
+            except Exception:
+                self._record_candidate(step, selector, False, started)
+                remaining.remove(selector)
+                continue
+            
+            self._record_candidate(step, selector, True, started)
+            self._resolution = {"strategy": "fallback_selector", "selector": selector}
+            print(f"   🏁 Resolved via '{selector}' in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return True
+        
+        # Nothing usable: only blame the selectors that never matched anything
+        for selector in remaining:
+            if selector not in seen:
+                self._record_candidate(step, selector, False, started)
+        return False
+    
+    async def _apply_resolution(self, step, resolution):
+        """
+        Re-runs exactly the strategy recorded in a resolved plan - no cascade, no guessing.
+        Returns False (or raises) when the recorded strategy no longer applies.
+        """
+        strategy = resolution['strategy']
+        
+        if strategy == 'primary':
+            await self._perform_action(step)
+            return True
+        
+        if strategy == 'app_handler':
+            await self.page.keyboard.press(resolution['keyboard_shortcut'])
+            if step['action'] == 'type':
+                await self.page.wait_for_timeout(500)
+                if await self.page.locator('input:focus, textarea:focus').count() == 0:
+                    return False
+                await self.page.keyboard.type(step['input_value'], delay=50)
+            else:
+                await self._wait_for_stable_page()
+            return True
+        
+        if strategy == 'fallback_selector':
+            if step['action'] == 'click':
+                await self.page.click(resolution['selector'], timeout=5000)
+                await self._wait_for_stable_page()
+            elif step['action'] == 'type':
+                await self.page.fill(resolution['selector'], step['input_value'], timeout=5000)
+            return True
+        
+        if strategy == 'visible_input':
+            visible_input = self.page.locator('input:visible, textarea:visible').first
+            await visible_input.click(timeout=3000)
+            await visible_input.fill(step['input_value'], timeout=5000)
+            return True
+        
+        if strategy == 'keyboard_type':
+            await self.page.keyboard.type(step['input_value'], delay=50)
+            return True
+        
+        if strategy == 'text_click':
+            await self.page.click(f"text=/{resolution['text']}/i", timeout=5000)
+            await self._wait_for_stable_page()
+            return True
+        
+        if strategy == 'ai_suggestion':
+            return await self._try_ai_suggestion(step, resolution['verification'])
+        
+        return False
+    
+    async def _try_ai_suggestion(self, step, verification):
+        candidate = None
+        started = time.perf_counter()
+        try:
+            approach = verification.get('alternative_approach', '')
+            
+            if approach == 'click_text' and verification.get('text_to_click'):
+                text = verification['text_to_click']
+                candidate = f'text="{text}"'
+                await self.page.click(candidate, timeout=5000)
+                await self._wait_for_stable_page()
+                self._record_candidate(step, candidate, True, started)
+                return True
+            
+            elif approach == 'keyboard_shortcut' and verification.get('keyboard_shortcut'):
+                await self.page.keyboard.press(verification['keyboard_shortcut'])
+                await self._wait_for_stable_page()
+                return True
+            
+            elif approach == 'different_selector' and verification.get('alternative_selector'):
+                candidate = verification['alternative_selector']
+                if step['action'] == 'click':
+                    await self.page.click(candidate, timeout=5000)
+                elif step['action'] == 'type':
+                    await self.page.fill(candidate, step['input_value'], timeout=5000)
+                await self._wait_for_stable_page()
+                self._record_candidate(step, candidate, True, started)
+                return True
+        except Exception as e:
+            print(f"      AI suggestion failed: {e}")
+            self._record_candidate(step, candidate, False, started)
+            return False
+        return False
+    
+    async def close(self):
+        await asyncio.to_thread(self.screenshot_writer.close)
+        if self.selector_index:
+            await asyncio.to_thread(self.selector_index.save)
+        if self._pool is not None:
+            await self._pool.checkin(self.browser)
+            return
+        if not self._owns_browser:
+            return
+        await self.browser.close()  # Also writes a recorded HAR
+        await self.playwright.stop()
+        if self.network is not None:
+            await asyncio.to_thread(self.network.save)
+            if self.network.summary():
+                print(self.network.summary())
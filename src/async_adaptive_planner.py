@@ -0,0 +1,210 @@
+"""
+Async Adaptive Planner - AdaptivePlanner on the backend's async API (AsyncOpenAI by default)
+Same prompts, same plan cache, same results - but awaiting the model
+lets one event loop keep other workflows moving during LLM latency.
+Everything but the model calls comes from adaptive_planner.PlannerCore.
+"""
+import asyncio
+import json
+import time
+from config import VERIFY_BATCH_DETAIL
+from tracing import span
+from plan_stream import AsyncPlanStream
+from adaptive_planner import (
+    PlannerCore,
+    build_plan_prompt,
+    build_text_verification_prompt,
+    build_batch_verification_messages,
+    build_next_steps_prompt,
+    log_vision_call,
+)
+
+class AsyncAdaptivePlanner(PlannerCore):
+    async def _complete(self, call, messages, image_size=None, **context):
+        """One model call through the backend, traced and metered with its token counts"""
+        step = context["step"].get("step_number") if context.get("step") else None
+        with span(f"llm:{call}", "llm", model=self.backend.model, step=step) as attrs:
+            started = time.perf_counter()
+            response = await self.backend.acomplete(call, messages, **context)
+            self._record_usage(attrs, call, response, started, messages, image_size, step)
+        return response
+    
+    async def _complete_streaming(self, call, messages, on_delta, **context):
+        """_complete, but each chunk of text goes to on_delta as it arrives"""
+        with span(f"llm:{call}", "llm", model=self.backend.model, streamed=True) as attrs:
+            started = time.perf_counter()
+            response = None
+            async for event in self.backend.astream(call, messages, **context):
+                if "delta" not in event:
+                    response = event
+                    continue
+                attrs.setdefault("first_chunk_s", round(time.perf_counter() - started, 3))
+                on_delta(event["delta"])
+            self._record_usage(attrs, call, response, started, messages)
+        return response
+    
+    async def plan_initial_workflow(self, task_query, app_name, app_context):
+        """Creates the initial plan (served from the plan cache when warm)"""
+        cache_key, cached = self._cached_plan(task_query, app_name, app_context)
+        if cached is not None:
+            return cached
+        
+        print(f"🧠 Adaptive Brain: Planning steps for '{task_query}'...")
+        
+        prompt = build_plan_prompt(task_query, app_name, app_context)
+        
+        response = await self._complete(
+            "plan", [{"role": "user", "content": prompt}],
+            task=task_query, app=app_name, app_context=app_context
+        )
+        
+        return self._store_plan(json.loads(response["content"]), cache_key, task_query, app_name)
+    
+    def stream_initial_workflow(self, task_query, app_name, app_context):
+        """
+        Streaming plan_initial_workflow: returns an AsyncPlanStream right away and fills it from
+        a task, one step at a time as the model writes them - for run_streaming_workflow().
+        """
+        stream = AsyncPlanStream()
+        cache_key, cached = self._cached_plan(task_query, app_name, app_context)
+        if cached is not None:
+            for step in cached['steps']:
+                stream.put_step(step)
+            stream.finish(cached)
+            return stream
+        
+        print(f"🧠 Adaptive Brain: Streaming steps for '{task_query}'...")
+        stream.task = asyncio.create_task(
+            self._stream_plan(stream, cache_key, task_query, app_name, app_context)
+        )
+        return stream
+    
+    async def _stream_plan(self, stream, cache_key, task_query, app_name, app_context):
+        try:
+            response = await self._complete_streaming(
+                "plan", [{"role": "user", "content": build_plan_prompt(task_query, app_name, app_context)}],
+                self._plan_step_parser(stream), task=task_query, app=app_name, app_context=app_context
+            )
+            plan = json.loads(response["content"])
+            stream.finish(self._store_plan(plan, cache_key, task_query, app_name))
+        except Exception as e:
+            print(f"   ⚠️  Plan stream failed: {e}")
+            stream.finish(error=e)
+    
+    async def discover_selectors(self, screenshot_path, task_query, screenshot_bytes=None):
+        """Analyze a screenshot and discover selectors for a task"""
+        print(f"🔍 AI is analyzing the page to discover selectors...")
+        
+        messages, image_info = self._discovery_messages(screenshot_path, task_query, screenshot_bytes)
+        
+        try:
+            started = time.perf_counter()
+            response = await self._complete(
+                "discover", messages, image_size=image_info["prepared_size"], task=task_query
+            )
+            
+            log_vision_call(self.vision_log, "discover_selectors", image_info, time.perf_counter() - started)
+            
+            return self._read_discovery(response)
+            
+        except Exception as e:
+            print(f"   ⚠️  Discovery failed: {e}")
+            return {"discovered_selectors": {}, "confidence": 0}
+    
+    async def verify_and_adapt(self, step, screenshot_path, success, error_message=None,
+                               screenshot_bytes=None, focus_box=None, scale=1):
+        """Look at the screenshot of what happened and decide the next action"""
+        print(f"🔍 Verifying Step {step['step_number']}...")
+        
+        if screenshot_bytes is None:
+            with open(screenshot_path, "rb") as img_file:
+                screenshot_bytes = img_file.read()
+        
+        # Same failure on a near-identical page? Reuse the earlier verdict instead of a vision call
+        cache_ref, cached = self._cached_verdict(step, success, error_message, screenshot_bytes)
+        if cached is not None:
+            return cached
+        
+        skipped = self._budget_skip(success)
+        if skipped is not None:
+            return skipped
+        
+        messages, image_info = self._verification_messages(
+            step, screenshot_path, success, error_message, screenshot_bytes, focus_box, scale
+        )
+        
+        started = time.perf_counter()
+        response = await self._complete(
+            "verify", messages, image_size=image_info["prepared_size"],
+            step=step, success=success, error_message=error_message
+        )
+        log_vision_call(self.vision_log, f"verify step {step['step_number']}", image_info, time.perf_counter() - started)
+        
+        return self._store_verdict(self._read_verdict(response), cache_ref)
+    
+    async def verify_from_snapshot(self, step, snapshot, success, error_message=None, screenshot_bytes=None):
+        """
+        Text-only verification over an accessibility snapshot - no image tokens.
+        Returns None when the model can't tell from text, so the caller escalates to vision.
+        Pass the step's `screenshot_bytes` to share verify_and_adapt's verdict cache.
+        """
+        print(f"📝 Verifying Step {step['step_number']} from the accessibility tree...")
+        cache_ref, cached = self._cached_verdict(step, success, error_message, screenshot_bytes)
+        if cached is not None:
+            return cached
+        
+        skipped = self._budget_skip(success, "verification")
+        if skipped is not None:
+            return skipped
+        
+        prompt = build_text_verification_prompt(step, snapshot, success, error_message)
+        response = await self._complete(
+            "verify_text", [{"role": "user", "content": prompt}],
+            step=step, success=success, error_message=error_message
+        )
+        verdict = self._read_text_verdict(response, success)
+        return None if verdict is None else self._store_verdict(verdict, cache_ref)
+    
+    async def verify_batch(self, entries):
+        """
+        Verifies several successful steps in one vision call. `entries` are dicts with
+        step, screenshot_path and screenshot_bytes; returns one verdict per entry, in order.
+        Cached verdicts are reused per step, only the rest go to the model; a step the
+        model's answer leaves out is verified on its own with verify_and_adapt().
+        """
+        verdicts, cache_refs = self._cached_batch(entries)
+        missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        if not missing:
+            print("   ♻️  All verdicts cached")
+            return verdicts
+        skipped = self._budget_skip(True)
+        if skipped is not None:
+            return [verdict or dict(skipped) for verdict in verdicts]
+        
+        batch = [entries[i] for i in missing]
+        messages, image_size = build_batch_verification_messages(batch, VERIFY_BATCH_DETAIL)
+        started = time.perf_counter()
+        response = await self._complete(
+            "verify_batch", messages, image_size=image_size, steps=[e["step"] for e in batch]
+        )
+        verdicts = self._merge_batch(entries, verdicts, cache_refs, missing, response, time.perf_counter() - started)
+        for i, verdict in enumerate(verdicts):
+            if verdict is None:
+                entry = entries[i]
+                verdicts[i] = await self.verify_and_adapt(
+                    entry["step"], entry["screenshot_path"], success=True, screenshot_bytes=entry.get("screenshot_bytes")
+                )
+        return verdicts
+    
+    async def suggest_next_steps(self, current_state, task_query, completed_steps):
+        """Dynamic replanning - ask AI what to do next based on current state"""
+        print("🔄 Asking AI for next steps based on current progress...")
+        
+        prompt = build_next_steps_prompt(task_query, completed_steps)
+        
+        response = await self._complete(
+            "next_steps", [{"role": "user", "content": prompt}],
+            task=task_query, completed_steps=completed_steps
+        )
+        
+        return json.loads(response["content"])
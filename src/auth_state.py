@@ -0,0 +1,46 @@
+"""
+Auth State - Share the login saved in data/user_data with fresh browser contexts
+A persistent profile can only be opened by one Chromium at a time, so batch runs
+snapshot its cookies/localStorage once and clone that into every isolated context.
+"""
+from pathlib import Path
+from config import PROJECT_ROOT, AUTH_STATE_PATH
+
+
+def export_auth_state(playwright, user_data_dir=None, state_path=AUTH_STATE_PATH):
+    """
+    Opens the persistent profile headless, dumps its storage state to JSON and closes it.
+    Returns the path to pass as `storage_state` to browser.new_context().
+    """
+    if user_data_dir is None:
+        user_data_dir = str(PROJECT_ROOT / "data" / "user_data")
+
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔐 Exporting login state from {user_data_dir}")
+    profile = playwright.chromium.launch_persistent_context(user_data_dir=user_data_dir, headless=True)
+    try:
+        profile.storage_state(path=str(state_path))
+    finally:
+        profile.close()
+
+    return str(state_path)
+
+
+async def async_export_auth_state(playwright, user_data_dir=None, state_path=AUTH_STATE_PATH):
+    """export_auth_state for an async_playwright instance"""
+    if user_data_dir is None:
+        user_data_dir = str(PROJECT_ROOT / "data" / "user_data")
+
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔐 Exporting login state from {user_data_dir}")
+    profile = await playwright.chromium.launch_persistent_context(user_data_dir=user_data_dir, headless=True)
+    try:
+        await profile.storage_state(path=str(state_path))
+    finally:
+        await profile.close()
+
+    return str(state_path)
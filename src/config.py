@@ -9,6 +9,161 @@ MODEL_NAME = "gpt-5.1"
 PROJECT_ROOT = Path(__file__).parent.parent
 OUTPUT_DIR = str(PROJECT_ROOT / "dataset")
 
+# ---------------- PLAN CACHE ----------------
+# Plans are cached per (task, app, context, model) so repeat runs skip the LLM
+PLAN_CACHE_DIR = str(PROJECT_ROOT / "data" / "plan_cache")
+PLAN_CACHE_TTL_SECONDS = 7 * 24 * 3600
+PLAN_CACHE_MAX_ENTRIES = 200
+
+# ---------------- SETTLE DETECTION ----------------
+# A step is done once the DOM has been quiet this long, never waiting past the max bound
+SETTLE_QUIET_MS = 300
+SETTLE_MAX_MS = 3000
+
+# ---------------- PARALLEL RUNS ----------------
+# Batch runs share one login snapshot exported from data/user_data
+AUTH_STATE_PATH = str(PROJECT_ROOT / "data" / "auth_state.json")
+PARALLEL_CONCURRENCY = 4
+
+# ---------------- SCREENSHOT WRITER ----------------
+# Screenshots are written by a background pool; submit() blocks past MAX_PENDING queued writes
+SCREENSHOT_WRITER_WORKERS = 2
+SCREENSHOT_WRITER_MAX_PENDING = 8
+
+# ---------------- PERCEPTION ----------------
+# "incremental": Set-of-Marks answered from a per-page MutationObserver registry (stable ids)
+# "full": re-walk the whole DOM every step
+PERCEPTION_MODE = "incremental"
+
+# ---------------- VISION IMAGES ----------------
+# Screenshots are shrunk before vision calls: downscale, re-encode, and crop to the
+# failed element / open modal. Lower = cheaper + faster, higher = more detail for the model.
+VISION_MAX_WIDTH = 1024
+VISION_IMAGE_FORMAT = "JPEG"      # JPEG | WEBP | PNG
+VISION_IMAGE_QUALITY = 80
+VISION_IMAGE_DETAIL = "high"      # OpenAI image detail: high | low | auto
+VISION_CROP_TO_FOCUS = True
+VISION_CROP_MARGIN = 160          # CSS px of context kept around the focus region
+VISION_CROP_MIN_SIZE = (640, 400)
+
+# ---------------- VERDICT CACHE ----------------
+# Vision verdicts reused for the same failure on a near-identical screenshot
+VERDICT_CACHE_DIR = str(PROJECT_ROOT / "data" / "verdict_cache")
+VERDICT_CACHE_MAX_ENTRIES = 500
+VERDICT_CACHE_MAX_DISTANCE = 6    # max differing bits (of 64) in the perceptual hash
+
+# ---------------- SELECTOR INDEX ----------------
+SELECTOR_INDEX_DIR = str(PROJECT_ROOT / "data" / "selector_index")
+SELECTOR_DEAD_AFTER_FAILURES = 3   # never-successful selectors are skipped after this many timeouts
+SELECTOR_INDEX_MAX_INTENTS = 500   # per origin
+
+# ---------------- LOCATOR RACE ----------------
+LOCATOR_RACE_TIMEOUT_MS = 5000    # total budget for all fallback candidates together
+LOCATOR_RACE_POLL_MS = 100
+
+# ---------------- SESSION POOL ----------------
+SESSION_POOL_SIZE = 2             # warm contexts kept ready
+SESSION_POOL_MAX_USES = 20        # workflows per context before it's recycled
+
+# ---------------- LAUNCH PROFILES ----------------
+# Pick one per run with the LAUNCH_PROFILE env var (or a `profile=` argument),
+# or per app with APP_LAUNCH_PROFILES. An explicit choice wins over the per-app one.
+LAUNCH_PROFILES = {
+    "interactive": {    # Watchable local runs
+        "headless": False,
+        "slow_mo": 100,
+        "viewport": {'width': 1280, 'height': 800},
+        "device_scale_factor": 1,
+        "blocked_resource_types": [],
+        "block_analytics": False,
+    },
+    "ci": {             # Batch nodes without a display
+        "headless": True,
+        "slow_mo": 0,
+        "viewport": {'width': 1280, 'height': 800},
+        "device_scale_factor": 1,
+        "blocked_resource_types": [],
+        "block_analytics": False,
+    },
+    "throughput": {     # Full speed: no fonts, audio/video or trackers (screenshots keep images)
+        "headless": True,
+        "slow_mo": 0,
+        "viewport": {'width': 1280, 'height': 800},
+        "device_scale_factor": 1,
+        "blocked_resource_types": ["font", "media"],
+        "block_analytics": True,
+    },
+}
+DEFAULT_LAUNCH_PROFILE = "interactive"
+LAUNCH_PROFILE = os.getenv("LAUNCH_PROFILE")
+APP_LAUNCH_PROFILES = {   # Opt-in, e.g. "YouTube": "throughput" (headless, no fonts/media)
+}
+ANALYTICS_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "segment.io", "segment.com", "sentry.io", "intercom.io", "hotjar.com", "amplitude.com", "mixpanel.com",
+]
+
+# ---------------- NETWORK CACHE ----------------
+NETWORK_CACHE_DIR = str(PROJECT_ROOT / "data" / "network_cache")
+NETWORK_CACHE_MAX_BYTES = 500 * 1024 * 1024
+NETWORK_CACHEABLE_TYPES = ["script", "stylesheet", "font", "image"]   # never xhr/fetch/document
+HAR_DIR = str(PROJECT_ROOT / "data" / "har")
+
+# ---------------- PLANNER BACKEND ----------------
+# "openai": real model calls. "local": deterministic stand-in (planner_backends.LocalBackend)
+# with rule-generated plans/verdicts, simulated latency and failures - for load tests, no API spend
+PLANNER_BACKEND = os.getenv("PLANNER_BACKEND", "openai")
+LOCAL_BACKEND_LATENCY_MS = (400, 1200)   # Uniform per call, roughly a real planning/vision round trip
+LOCAL_BACKEND_FAILURE_RATE = 0.0         # Fraction of calls that raise like a 5xx/timeout would
+LOCAL_BACKEND_SEED = 0
+
+# ---------------- STREAMING PLANS ----------------
+# Stream the plan and start executing each step as soon as it's parsed (step 1 loads while the
+# model is still writing the rest). Default for ParallelWorkflowRunner(streaming=...).
+PLAN_STREAMING = False
+
+# ---------------- SPECULATIVE PREFETCH ----------------
+# Load the app's base_url in the executor's page while the plan is being generated.
+# A first step that navigates there reuses the load; any other first step discards it.
+SPECULATIVE_PREFETCH = True
+
+# ---------------- PIPELINED VERIFICATION ----------------
+# Vision-verify every successful step in the background while the next one runs; a late
+# "it actually failed" verdict rolls back to the URL before that step and re-executes from there.
+PIPELINED_VERIFICATION = False
+PIPELINED_VERIFY_WORKERS = 2    # Concurrent background verifications per workflow
+
+# ---------------- BATCH VERIFICATION ----------------
+# Pipelined verification sends this many consecutive steps per vision call (1 = one call per step).
+# Batched screenshots are downscaled further and sent at low detail; each step still gets its own verdict.
+VERIFY_BATCH_WINDOW = 3
+VERIFY_BATCH_MAX_WIDTH = 640
+VERIFY_BATCH_DETAIL = "low"
+
+# ---------------- TIERED VERIFICATION ----------------
+# Before a screenshot goes to the vision model, ask a text-only model about the page's
+# accessibility tree; vision is only used when that can't tell (see tiered_verify).
+TEXT_VERIFICATION = True
+A11Y_SNAPSHOT_MAX_CHARS = 6000
+TEXT_VERIFY_MIN_CONFIDENCE = 70   # Less sure "it worked" verdicts go on to vision
+
+# ---------------- TRACING ----------------
+# Per-run spans (phases, retry attempts, fallback strategies, model calls) saved as
+# trace.jsonl + trace.chrome.json in the run's output folder
+TRACE_ENABLED = True
+TRACE_TOP_SINKS = 10
+
+# ---------------- TOKEN BUDGETS ----------------
+# USD per 1M tokens for the per-run cost report - keep in line with current OpenAI pricing
+MODEL_PRICING_PER_1M = {
+    "gpt-5.1": {"input": 1.25, "output": 10.00},
+    "local": {"input": 0.0, "output": 0.0},
+}
+WORKFLOW_TOKEN_BUDGET = 100_000   # Model tokens per workflow (None = unlimited)
+BUDGET_LOW_DETAIL_AT = 0.5        # Past this share of the budget, vision calls use detail="low"
+BUDGET_SKIP_VERIFY_AT = 1.0       # Past this share, failed steps skip vision verification
+CONVERSATION_HISTORY_MAX = 20
+
 
 LINEAR_CONTEXT = {
     "base_url": "https://linear.app",
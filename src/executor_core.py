@@ -0,0 +1,187 @@
+"""
+Executor Core - Everything AdaptiveExecutor and AsyncAdaptiveExecutor share except the page I/O
+Step state, candidate ranking against the SelectorIndex, timing, prefetch claims,
+history entries and the run summary live here once; the two executors only differ
+in how they talk to the browser (sync_api calls vs awaited async_api calls).
+"""
+import time
+from pathlib import Path
+from settle import FIXED_WAIT_MS
+from screenshot_writer import ScreenshotWriter
+from selector_index import origin_key
+from launch_profiles import format_route_stats
+from tiered_verify import VERIFY_TIERS
+from utils import same_page
+from config import VISION_CROP_TO_FOCUS, SPECULATIVE_PREFETCH, PIPELINED_VERIFICATION
+
+# Words in a click step's description worth trying as text=/word/i when its selectors fail
+TEXT_CLICK_WORDS = ['search', 'create', 'new', 'submit', 'save', 'add', 'open']
+
+# What the vision model should see first when a step fails: an open modal
+FOCUS_DIALOG_SELECTOR = 'dialog[open], [role="dialog"], [aria-modal="true"]'
+
+
+class ExecutorCore:
+    def _init_state(self, selector_index=None):
+        self.last_hash = ""
+        self.retry_count = 0
+        self.max_retries = 3
+        self.current_app = None
+        self._resolution = None
+        self._step_timing = None
+        self._last_screenshot = None
+        self.screenshot_writer = ScreenshotWriter()
+        self.selector_index = selector_index
+        self._origin = None
+        self._prefetch = None
+        self._prefetch_hit = False
+        self.pipelined_verification = PIPELINED_VERIFICATION
+
+    def _begin_workflow(self, output_dir, app):
+        output_path = Path(output_dir)
+        output_path.mkdir(exist_ok=True, parents=True)
+        self.current_app = app
+        return output_path
+
+    def _begin_step(self):
+        """Resets the per-step state; returns the step's start time"""
+        self._resolution = None
+        self._step_timing = None
+        self._origin = origin_key(self.page.url, self.current_app)
+        return time.perf_counter()
+
+    def _record_settle(self, step, waited):
+        """How long settle detection actually waited vs. what the fixed sleep would have cost"""
+        budget = FIXED_WAIT_MS.get(step['action'], 0)
+        self._step_timing = {
+            "fixed_wait_ms": budget,
+            "settle_ms": round(waited),
+            "saved_ms": round(budget - waited)
+        }
+
+    def _finish_step_timing(self, step_start):
+        """Per-step timing: total action time plus how much settle detection saved over fixed sleeps"""
+        timing = dict(self._step_timing or {})
+        timing["action_ms"] = round((time.perf_counter() - step_start) * 1000)
+        if 'saved_ms' in timing:
+            print(f"   ⏱️  {timing['action_ms']}ms total, settled in {timing['settle_ms']}ms "
+                  f"(saved {timing['saved_ms']}ms vs fixed {timing['fixed_wait_ms']}ms sleep)")
+        return timing
+
+    def _start_prefetch(self, url):
+        """The prefetch record for prefetch(url), or None when prefetching is off / there's no URL"""
+        if not SPECULATIVE_PREFETCH or not url:
+            return None
+        self._prefetch = {"url": url, "error": None}
+        return self._prefetch
+
+    def _take_prefetch(self, step):
+        """
+        (prefetch, outcome) for the first step after prefetch(). outcome is "reuse" when the step
+        navigates to the prefetched page, "replace" when it navigates elsewhere, and "discard" when
+        it doesn't navigate at all - the load must go, so the step starts from the same blank page
+        it would have had without prefetching. prefetch is None if nothing was prefetched.
+        """
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return None, None
+        if step['action'] != 'navigate':
+            return prefetch, "discard"
+        return prefetch, "reuse" if same_page(step.get('url'), prefetch['url']) else "replace"
+
+    def _primary_candidate(self, step):
+        """The selector _perform_action will use, as a SelectorIndex candidate (None for non-element actions)"""
+        if step['action'] == 'click' and step.get('text_match'):
+            return f'text=/{step["text_match"]}/i'
+        if step['action'] in ('click', 'type'):
+            return step.get('primary_selector') or step.get('selector')
+        return None
+
+    def _primary_is_dead(self, step):
+        """Error message when the primary selector keeps failing on this origin, else None"""
+        primary = self._primary_candidate(step)
+        if self.selector_index and primary and self.selector_index.is_dead(self._origin, step, primary):
+            print("   ⏭️  Primary selector keeps failing here, going straight to fallbacks")
+            return f"Selector '{primary}' is known to fail on this page"
+        return None
+
+    def _ranked_candidates(self, step, candidates, learn=False):
+        """
+        Orders candidates by their track record on this origin and drops known-dead ones.
+        With `learn`, selectors that worked for this step intent on earlier runs are appended.
+        """
+        candidates = list(candidates)
+        if not self.selector_index:
+            return candidates
+        if learn:
+            primary = self._primary_candidate(step)
+            candidates += [c for c in self.selector_index.learned(self._origin, step)
+                           if c not in candidates and c != primary]
+        ranked = self.selector_index.rank(self._origin, step, candidates)
+        if len(ranked) < len(candidates):
+            print(f"   ⏭️  Skipping {len(candidates) - len(ranked)} known-dead candidate(s)")
+        return ranked
+
+    def _race_candidates(self, step):
+        """Primary, fallback, text_match and learned selectors for the locator race, best first"""
+        candidates = [step.get('primary_selector') or step.get('selector')] + list(step.get('fallback_selectors') or [])
+        if step.get('text_match'):
+            candidates.append(f'text=/{step["text_match"]}/i')
+        candidates = [c for i, c in enumerate(candidates) if c and c not in candidates[:i]]
+        return self._ranked_candidates(step, candidates, learn=True)
+
+    def _text_click_candidates(self, step):
+        """(selector, word) pairs for the text-click fallback, best first"""
+        words = step['description'].lower().split()
+        candidates = {f'text=/{word}/i': word for word in TEXT_CLICK_WORDS if word in words}
+        return [(candidate, candidates[candidate]) for candidate in self._ranked_candidates(step, candidates)]
+
+    def _record_candidate(self, step, candidate, success, started):
+        if self.selector_index and candidate:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.selector_index.record(self._origin, step, candidate, success, elapsed_ms)
+
+    def _focus_candidates(self, step):
+        """
+        Selectors whose box is worth showing the vision model for a failed step: an open modal,
+        then the failed selector. Empty when VISION_CROP_TO_FOCUS is off (send the full frame).
+        """
+        if not VISION_CROP_TO_FOCUS:
+            return []
+        selector = step.get('primary_selector') or step.get('selector')
+        return [FOCUS_DIALOG_SELECTOR] + ([selector] if selector else [])
+
+    def _step_entry(self, step, clean_path, debug_path, success, timing, **fields):
+        """One history entry; `fields` adds resolution / error / verified_by / replayed"""
+        return dict({
+            "step": step,
+            "screenshot": str(clean_path),
+            "debug_screenshot": str(debug_path),
+            "success": success,
+        }, **fields, timing=timing)
+
+    def _ai_resolution(self, verification):
+        """The replayable resolution for a step that an AI suggestion fixed"""
+        return {
+            "strategy": "ai_suggestion",
+            "attempt": self.max_retries,
+            "verification": {
+                k: verification.get(k)
+                for k in ('alternative_approach', 'alternative_selector', 'text_to_click', 'keyboard_shortcut')
+            }
+        }
+
+    def _print_summary(self, history, output_path):
+        successful = sum(1 for h in history if h.get('success', False))
+        saved = sum(h.get('timing', {}).get('saved_ms', 0) for h in history)
+        print(f"\n✅ Workflow completed: {successful}/{len(history)} steps successful")
+        if saved:
+            print(f"⏱️  Settle detection saved {saved / 1000:.1f}s of fixed waiting")
+        tiers = [h.get('verified_by') for h in history if h.get('verified_by')]
+        if tiers:
+            counts = ", ".join(f"{tier} {tiers.count(tier)}" for tier in VERIFY_TIERS if tier in tiers)
+            print(f"🪜 Verified by: {counts} ({len(tiers) - tiers.count('vision')} without a vision call)")
+        if self._route_stats:
+            print(format_route_stats(self._route_stats))
+        print(f"📁 Results saved to: {output_path}/")
+        print(f"📖 View guide: {output_path}/README.md\n")
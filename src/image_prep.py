@@ -0,0 +1,111 @@
+"""
+Image Prep - Shrink screenshots before they go to a vision model
+Downscale, re-encode (JPEG/WebP) and optionally crop to the region that matters
+(the failed element or the open modal). Smaller uploads = faster vision calls.
+"""
+import base64
+import io
+from PIL import Image
+from config import (
+    VISION_MAX_WIDTH,
+    VISION_IMAGE_FORMAT,
+    VISION_IMAGE_QUALITY,
+    VISION_CROP_MARGIN,
+    VISION_CROP_MIN_SIZE,
+)
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def _crop_region(size, focus_box, scale, margin, min_size):
+    """Focus box (CSS px) grown by `margin` and to at least `min_size`, clamped to the image"""
+    width, height = size
+    left = (focus_box["x"] - margin) * scale
+    top = (focus_box["y"] - margin) * scale
+    right = (focus_box["x"] + focus_box["width"] + margin) * scale
+    bottom = (focus_box["y"] + focus_box["height"] + margin) * scale
+
+    min_w, min_h = min_size[0] * scale, min_size[1] * scale
+    if right - left < min_w:
+        grow = (min_w - (right - left)) / 2
+        left, right = left - grow, right + grow
+    if bottom - top < min_h:
+        grow = (min_h - (bottom - top)) / 2
+        top, bottom = top - grow, bottom + grow
+
+    # Shift back inside the image rather than just clipping, so we keep the requested size
+    if left < 0:
+        right, left = right - left, 0
+    if top < 0:
+        bottom, top = bottom - top, 0
+    if right > width:
+        left, right = max(0, left - (right - width)), width
+    if bottom > height:
+        top, bottom = max(0, top - (bottom - height)), height
+
+    return int(left), int(top), int(right), int(bottom)
+
+
+def prepare_image(image_bytes, max_width=VISION_MAX_WIDTH, image_format=VISION_IMAGE_FORMAT,
+                  quality=VISION_IMAGE_QUALITY, focus_box=None, scale=1,
+                  margin=VISION_CROP_MARGIN, min_size=VISION_CROP_MIN_SIZE):
+    """
+    Returns (prepared_bytes, mime_type, info).
+    `focus_box` is {"x", "y", "width", "height"} in CSS pixels; `scale` is the devicePixelRatio
+    of the screenshot. `info` carries the byte counts and sizes for logging.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    original_size = image.size
+
+    if focus_box:
+        image = image.crop(_crop_region(image.size, focus_box, scale, margin, min_size))
+
+    if max_width and image.width > max_width:
+        ratio = max_width / image.width
+        image = image.resize((max_width, max(1, round(image.height * ratio))), Image.LANCZOS)
+
+    image_format = image_format.upper()
+    if image_format == "JPEG":
+        image = image.convert("RGB")
+
+    out = io.BytesIO()
+    if image_format == "PNG":
+        image.save(out, format="PNG", optimize=True)
+    else:
+        image.save(out, format=image_format, quality=quality)
+    prepared = out.getvalue()
+
+    info = {
+        "original_bytes": len(image_bytes),
+        "prepared_bytes": len(prepared),
+        "original_size": original_size,
+        "prepared_size": image.size,
+        "format": image_format,
+        "cropped": bool(focus_box),
+    }
+    return prepared, MIME_TYPES.get(image_format, "image/png"), info
+
+
+def to_data_url(image_bytes, mime_type):
+    return f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+
+
+def perceptual_hash(image_bytes, hash_size=8):
+    """
+    64-bit difference hash (dHash) as a hex string. Visually identical screenshots hash the
+    same and near-identical ones (a blinking cursor, a changed timestamp) differ by a few bits.
+    """
+    image = Image.open(io.BytesIO(image_bytes)).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(hash_a, hash_b):
+    """Number of differing bits between two perceptual hashes"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
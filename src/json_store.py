@@ -0,0 +1,23 @@
+"""
+JSON Store - Small helpers for the on-disk caches/indexes under data/
+"""
+import json
+from pathlib import Path
+
+
+def load_json(path, default):
+    """Parsed file contents, or `default` if the file is missing or corrupt"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json_atomic(path, data):
+    # Write-then-rename so a crash mid-write never leaves a corrupt file
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    tmp_path.replace(path)
@@ -0,0 +1,112 @@
+"""
+Launch Profiles - How Chromium is started for a run: headless or not, slow_mo, viewport,
+device scale factor, and which requests get blocked before they hit the network.
+The profiles themselves live in config.LAUNCH_PROFILES.
+"""
+from urllib.parse import urlparse
+from config import (
+    LAUNCH_PROFILES,
+    DEFAULT_LAUNCH_PROFILE,
+    LAUNCH_PROFILE,
+    APP_LAUNCH_PROFILES,
+    ANALYTICS_HOSTS,
+)
+
+
+def resolve_profile(profile=None, app=None, default=DEFAULT_LAUNCH_PROFILE):
+    """
+    Explicit `profile` (name or dict) > LAUNCH_PROFILE env var > APP_LAUNCH_PROFILES[app] > default.
+    Returns the profile dict with its "name" filled in. A dict only needs the keys it changes:
+    the rest come from `default`, and it's named "custom" unless it says otherwise.
+    """
+    if isinstance(profile, dict):
+        return {**LAUNCH_PROFILES[default], "name": "custom", **profile}
+    name = profile or LAUNCH_PROFILE or APP_LAUNCH_PROFILES.get(app) or default
+    if name not in LAUNCH_PROFILES:
+        raise ValueError(f"Unknown launch profile '{name}' (available: {', '.join(LAUNCH_PROFILES)})")
+    return dict(LAUNCH_PROFILES[name], name=name)
+
+
+def launch_options(profile):
+    """kwargs for chromium.launch()"""
+    return {"headless": profile["headless"], "slow_mo": profile["slow_mo"]}
+
+
+def context_options(profile):
+    """kwargs for browser.new_context()"""
+    return {
+        "viewport": profile["viewport"],
+        "device_scale_factor": profile["device_scale_factor"],
+        "ignore_https_errors": True,
+    }
+
+
+def persistent_options(profile):
+    """kwargs for chromium.launch_persistent_context() - launch + context options in one"""
+    return dict(launch_options(profile), **context_options(profile))
+
+
+def _is_analytics(url):
+    host = urlparse(url).hostname or ""
+    return any(host == blocked or host.endswith("." + blocked) for blocked in ANALYTICS_HOSTS)
+
+
+def _block_reason(request, profile):
+    if request.resource_type in profile["blocked_resource_types"]:
+        return request.resource_type
+    if profile["block_analytics"] and _is_analytics(request.url):
+        return "analytics"
+    return None
+
+
+def _blocks_anything(profile):
+    return bool(profile["blocked_resource_types"]) or profile["block_analytics"]
+
+
+def apply_routing(context, profile, stats=None):
+    """
+    Installs the profile's request blocking on a context. Returns a stats dict counting
+    blocked requests by reason (pass `stats` to accumulate across contexts), or None if
+    the profile blocks nothing. Unblocked requests go on with route.fallback(), so other
+    route handlers on the same context still see them.
+    """
+    if not _blocks_anything(profile):
+        return None
+    stats = stats if stats is not None else {}
+
+    def handle(route):
+        reason = _block_reason(route.request, profile)
+        if reason is None:
+            route.fallback()
+            return
+        stats[reason] = stats.get(reason, 0) + 1
+        route.abort()
+
+    context.route("**/*", handle)
+    return stats
+
+
+async def async_apply_routing(context, profile, stats=None):
+    """apply_routing for async browser contexts"""
+    if not _blocks_anything(profile):
+        return None
+    stats = stats if stats is not None else {}
+
+    async def handle(route):
+        reason = _block_reason(route.request, profile)
+        if reason is None:
+            await route.fallback()
+            return
+        stats[reason] = stats.get(reason, 0) + 1
+        await route.abort()
+
+    await context.route("**/*", handle)
+    return stats
+
+
+def format_route_stats(stats):
+    """'🚫 Blocked 42 requests (font 30, analytics 12)' or '' when nothing was blocked"""
+    if not stats:
+        return ""
+    detail = ", ".join(f"{reason} {count}" for reason, count in sorted(stats.items(), key=lambda item: -item[1]))
+    return f"🚫 Blocked {sum(stats.values())} requests ({detail})"
@@ -0,0 +1,91 @@
+"""
+Locator Race - Find the first candidate selector that is actually usable, all candidates at once
+Instead of page.click(selector, timeout=5000) per fallback (N bad selectors = N timeouts),
+every candidate is probed each poll round and we act on the first visible, enabled match.
+Worst case is one timeout, however many candidates there are.
+"""
+import asyncio
+import time
+from playwright.sync_api import Error as PlaywrightError
+from playwright.async_api import Error as AsyncPlaywrightError
+from config import LOCATOR_RACE_TIMEOUT_MS, LOCATOR_RACE_POLL_MS
+
+# Elements checked per candidate - a selector matching 40 hidden rows shouldn't eat the poll round
+MAX_MATCHES_PER_CANDIDATE = 5
+
+
+def _usable(locator):
+    """First visible + enabled element of `locator` (non-waiting checks), or None"""
+    for index in range(min(locator.count(), MAX_MATCHES_PER_CANDIDATE)):
+        element = locator.nth(index)
+        if element.is_visible() and element.is_enabled():
+            return element
+    return None
+
+
+def resolve_first_locator(page, candidates, timeout_ms=LOCATOR_RACE_TIMEOUT_MS,
+                          poll_ms=LOCATOR_RACE_POLL_MS, seen=None):
+    """
+    Polls all `candidates` (Playwright selectors, in priority order) until one resolves
+    to a visible, enabled element. Returns (selector, element locator) or (None, None) on timeout.
+    Candidates that matched anything at all along the way are added to `seen`.
+    """
+    deadline = time.perf_counter() + timeout_ms / 1000
+    live = list(candidates)
+
+    while live:
+        for selector in list(live):
+            try:
+                locator = page.locator(selector)
+                if locator.count() and seen is not None:
+                    seen.add(selector)
+                element = _usable(locator)
+            except PlaywrightError:
+                live.remove(selector)  # Not a valid selector - no point polling it again
+                continue
+            if element is not None:
+                return selector, element
+
+        if time.perf_counter() >= deadline:
+            break
+        page.wait_for_timeout(poll_ms)
+
+    return None, None
+
+
+async def _async_usable(locator):
+    for index in range(min(await locator.count(), MAX_MATCHES_PER_CANDIDATE)):
+        element = locator.nth(index)
+        if await element.is_visible() and await element.is_enabled():
+            return element
+    return None
+
+
+async def async_resolve_first_locator(page, candidates, timeout_ms=LOCATOR_RACE_TIMEOUT_MS,
+                                      poll_ms=LOCATOR_RACE_POLL_MS, seen=None):
+    """resolve_first_locator for async pages - each round probes every candidate concurrently"""
+    deadline = time.perf_counter() + timeout_ms / 1000
+    live = list(candidates)
+
+    async def probe(selector):
+        try:
+            locator = page.locator(selector)
+            if await locator.count() and seen is not None:
+                seen.add(selector)
+            return await _async_usable(locator)
+        except AsyncPlaywrightError:
+            live.remove(selector)
+            return None
+
+    while live:
+        round_candidates = list(live)
+        elements = await asyncio.gather(*(probe(selector) for selector in round_candidates))
+        for selector, element in zip(round_candidates, elements):
+            if element is not None:
+                return selector, element
+
+        if time.perf_counter() >= deadline:
+            break
+        await page.wait_for_timeout(poll_ms)
+
+    return None, None
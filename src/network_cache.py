@@ -0,0 +1,328 @@
+"""
+Network Cache - Opt-in routing layer between a browser context and the network
+- AssetCache: serves static assets (JS bundles, CSS, fonts, images) from a local
+  content-addressed store, bounded by LRU eviction; Cache-Control / Expires decide how long an
+  asset is served without asking, ETag / Last-Modified revalidate it after that;
+  API/XHR/documents always go to the network
+- HAR: record a workflow's traffic, or replay a whole workflow offline against the recording
+Attach it before launch_profiles.apply_routing() so request blocking still runs first.
+"""
+import hashlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from config import NETWORK_CACHE_DIR, NETWORK_CACHE_MAX_BYTES, NETWORK_CACHEABLE_TYPES, HAR_DIR
+from json_store import load_json, save_json_atomic
+
+# Describe the original transfer, not the decoded body we store - fulfilling with them breaks the response
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+# Upper bound for the Last-Modified heuristic when a response has no max-age / Expires
+HEURISTIC_FRESHNESS_MAX_S = 24 * 3600
+
+
+def freshness(headers, now=None):
+    """
+    Seconds-since-epoch a response stays fresh until, or None if it mustn't be stored.
+    max-age, then Expires, then 10% of the time since Last-Modified (capped) - RFC 9111's
+    order. no-cache stores it already stale, so every use is revalidated.
+    """
+    now = time.time() if now is None else now
+    directives = {}
+    for part in headers.get("cache-control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name] = value.strip('" ')
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+    try:
+        return now + max(0, int(directives["max-age"]))
+    except (KeyError, ValueError):
+        pass
+    if headers.get("expires"):
+        try:
+            return parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return now  # An invalid Expires means already expired
+    if headers.get("last-modified"):
+        try:
+            age = now - parsedate_to_datetime(headers["last-modified"]).timestamp()
+            return now + min(max(0, age) * 0.1, HEURISTIC_FRESHNESS_MAX_S)
+        except (TypeError, ValueError):
+            pass
+    return now
+
+
+class AssetCache:
+    def __init__(self, cache_dir=None, max_bytes=NETWORK_CACHE_MAX_BYTES, resource_types=NETWORK_CACHEABLE_TYPES):
+        self.cache_dir = Path(cache_dir or NETWORK_CACHE_DIR)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.resource_types = set(resource_types)
+        # url -> {"sha256", "status", "headers", "size", "last_used", "expires", "etag", "last_modified"},
+        # least recently used first (lookups move an entry to the end)
+        entries = load_json(self.index_path, {})
+        self.entries = dict(sorted(entries.items(), key=lambda item: item[1]["last_used"]))
+        # Identical bodies under different URLs share one blob: digest -> [URL count, size]
+        self._blobs = {}
+        for entry in self.entries.values():
+            self._blobs.setdefault(entry["sha256"], [0, entry["size"]])[0] += 1
+        self.total_bytes = sum(size for _, size in self._blobs.values())
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0, "bytes_served": 0}
+        self._dirty = False
+        # Sync route handlers run on each worker's Playwright thread
+        self._lock = threading.RLock()
+
+    def _blob_path(self, digest):
+        return self.blob_dir / digest[:2] / digest
+
+    def handles(self, request):
+        return request.method == "GET" and request.resource_type in self.resource_types
+
+    def lookup(self, url):
+        """
+        (entry, body, fresh) for a cached URL, or None. A stale entry is only returned when it
+        has a validator (ETag / Last-Modified) to revalidate with; otherwise it's dropped.
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            fresh = entry.get("expires", 0) > time.time()
+            if not fresh and not (entry.get("etag") or entry.get("last_modified")):
+                self._drop(url)
+                self.stats["misses"] += 1
+                return None
+            try:
+                body = self._blob_path(entry["sha256"]).read_bytes()
+            except OSError:
+                self._drop(url)  # Blob deleted by hand
+                self.stats["misses"] += 1
+                return None
+            entry["last_used"] = time.time()
+            self.entries[url] = self.entries.pop(url)  # Most recently used goes last
+            self._dirty = True
+            return dict(entry), body, fresh
+
+    def conditional_headers(self, request, entry):
+        """The request's headers plus If-None-Match / If-Modified-Since from a stale entry"""
+        headers = dict(request.headers)
+        if entry.get("etag"):
+            headers["if-none-match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["if-modified-since"] = entry["last_modified"]
+        return headers
+
+    def served(self, body, revalidated=False):
+        with self._lock:
+            self.stats["revalidated" if revalidated else "hits"] += 1
+            self.stats["bytes_served"] += len(body)
+
+    def refresh(self, url, headers):
+        """A 304 for a stale entry: fold in the new headers and restart its freshness"""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            merged = dict(entry["headers"])
+            merged.update({k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS})
+            expires = freshness({k.lower(): v for k, v in merged.items()})
+            if expires is None:
+                self._drop(url)
+            else:
+                entry.update(headers=merged, expires=expires, last_used=time.time())
+            self._dirty = True
+
+    def store(self, url, status, headers, body):
+        headers_lower = {k.lower(): v for k, v in headers.items()}
+        expires = freshness(headers_lower)
+        if expires is None or len(body) > self.max_bytes:
+            return
+        if expires <= time.time() and not (headers_lower.get("etag") or headers_lower.get("last-modified")):
+            return  # Stale on arrival with nothing to revalidate against - it could never be served
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            if url in self.entries:
+                self._drop(url)
+            blob = self._blob_path(digest)
+            if digest not in self._blobs:
+                if not blob.exists():
+                    blob.parent.mkdir(exist_ok=True)
+                    tmp_path = blob.with_name(blob.name + ".tmp")
+                    tmp_path.write_bytes(body)
+                    tmp_path.replace(blob)
+                self._blobs[digest] = [0, len(body)]
+                self.total_bytes += len(body)
+            self._blobs[digest][0] += 1
+            self.entries[url] = {
+                "sha256": digest,
+                "status": status,
+                "headers": {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+                "size": len(body),
+                "last_used": time.time(),
+                "expires": expires,
+                "etag": headers_lower.get("etag"),
+                "last_modified": headers_lower.get("last-modified"),
+            }
+            self.stats["stored"] += 1
+            self._dirty = True
+            self._evict()
+
+    def _drop(self, url):
+        """Removes one URL; its blob goes too once no other URL shares it"""
+        digest = self.entries.pop(url)["sha256"]
+        blob = self._blobs.get(digest)
+        if blob is not None:
+            blob[0] -= 1
+            if blob[0] <= 0:
+                del self._blobs[digest]
+                self.total_bytes -= blob[1]
+                self._blob_path(digest).unlink(missing_ok=True)
+        self._dirty = True
+
+    def _evict(self):
+        # Drop least-recently-used URLs (the front of self.entries) until the blobs fit in max_bytes
+        while self.total_bytes > self.max_bytes and self.entries:
+            self._drop(next(iter(self.entries)))
+            self.stats["evicted"] += 1
+
+    def save(self):
+        """Writes the index if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            save_json_atomic(self.index_path, self.entries)
+            self._dirty = False
+
+    def attach(self, context):
+        """
+        Serves fresh cached GETs from disk and revalidates stale ones (a 304 serves the cached body);
+        everything else falls through to the next route handler.
+        """
+        def handle(route):
+            request = route.request
+            if not self.handles(request):
+                route.fallback()
+                return
+            cached = self.lookup(request.url)
+            if cached is not None and cached[2]:
+                entry, body, _ = cached
+                self.served(body)
+                route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+                return
+            try:
+                if cached is not None:
+                    response = route.fetch(headers=self.conditional_headers(request, cached[0]))
+                else:
+                    response = route.fetch()
+            except Exception:
+                route.fallback()
+                return
+            if cached is not None and response.status == 304:
+                entry, body, _ = cached
+                self.refresh(request.url, response.headers)
+                self.served(body, revalidated=True)
+                route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+                return
+            body = response.body()
+            if response.status == 200:
+                self.store(request.url, response.status, response.headers, body)
+            route.fulfill(response=response, body=body)
+
+        context.route("**/*", handle)
+
+    async def async_attach(self, context):
+        """attach() for async browser contexts"""
+        async def handle(route):
+            request = route.request
+            if not self.handles(request):
+                await route.fallback()
+                return
+            cached = self.lookup(request.url)
+            if cached is not None and cached[2]:
+                entry, body, _ = cached
+                self.served(body)
+                await route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+                return
+            try:
+                if cached is not None:
+                    response = await route.fetch(headers=self.conditional_headers(request, cached[0]))
+                else:
+                    response = await route.fetch()
+            except Exception:
+                await route.fallback()
+                return
+            if cached is not None and response.status == 304:
+                entry, body, _ = cached
+                self.refresh(request.url, response.headers)
+                self.served(body, revalidated=True)
+                await route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+                return
+            body = await response.body()
+            if response.status == 200:
+                self.store(request.url, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+
+        await context.route("**/*", handle)
+
+    def summary(self):
+        served = self.stats["hits"] + self.stats["revalidated"]
+        lookups = served + self.stats["misses"]
+        rate = served / lookups if lookups else 0.0
+        return (f"📦 Asset cache: {served}/{lookups} hits ({rate:.0%}, {self.stats['revalidated']} revalidated), "
+                f"{self.stats['bytes_served'] / 1_000_000:.1f}MB served from disk, {self.stats['stored']} stored, "
+                f"{self.stats['evicted']} evicted")
+
+
+class NetworkLayer:
+    """
+    What sits between a context and the network - everything is opt-in.
+    har_mode="record" writes the context's traffic to `har_path` (saved when the context closes);
+    har_mode="replay" serves everything from `har_path` and aborts anything not in it (fully offline).
+    """
+    def __init__(self, asset_cache=None, har_mode=None, har_path=None):
+        if har_mode not in (None, "record", "replay"):
+            raise ValueError(f"Unknown har_mode '{har_mode}' (use 'record' or 'replay')")
+        self.asset_cache = asset_cache
+        self.har_mode = har_mode
+        self.har_path = Path(har_path or Path(HAR_DIR) / "workflow.har")
+
+    def for_run(self, name):
+        """Same layer with its HAR file named after one run, so parallel jobs don't share a recording"""
+        if not self.har_mode:
+            return self
+        return NetworkLayer(self.asset_cache, self.har_mode, self.har_path.parent / f"{name}.har")
+
+    def attach(self, context):
+        if self.har_mode == "replay":
+            print(f"📼 Replaying network offline from {self.har_path}")
+            context.route_from_har(str(self.har_path), not_found="abort")
+            return
+        if self.asset_cache is not None:
+            self.asset_cache.attach(context)
+        if self.har_mode == "record":
+            self.har_path.parent.mkdir(parents=True, exist_ok=True)
+            context.route_from_har(str(self.har_path), update=True)
+
+    async def async_attach(self, context):
+        if self.har_mode == "replay":
+            print(f"📼 Replaying network offline from {self.har_path}")
+            await context.route_from_har(str(self.har_path), not_found="abort")
+            return
+        if self.asset_cache is not None:
+            await self.asset_cache.async_attach(context)
+        if self.har_mode == "record":
+            self.har_path.parent.mkdir(parents=True, exist_ok=True)
+            await context.route_from_har(str(self.har_path), update=True)
+
+    def save(self):
+        if self.asset_cache is not None:
+            self.asset_cache.save()
+
+    def summary(self):
+        return self.asset_cache.summary() if self.asset_cache is not None else ""
@@ -0,0 +1,291 @@
+"""
+Parallel Runner - Execute a batch of workflows concurrently
+Each job runs in its own isolated browser context (own cookies jar, own pages, own output dir),
+with a shared login state cloned from data/user_data and bounded concurrency.
+
+run() uses worker threads on the sync API; run_async() drives every context
+from a single async Playwright instance on one event loop.
+"""
+import asyncio
+import queue
+import threading
+import time
+from pathlib import Path
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+from config import OUTPUT_DIR, PARALLEL_CONCURRENCY, PLAN_STREAMING, PIPELINED_VERIFICATION
+from adaptive_planner import AdaptivePlanner
+from adaptive_executor import AdaptiveExecutor
+from async_adaptive_planner import AsyncAdaptivePlanner
+from async_adaptive_executor import AsyncAdaptiveExecutor
+from auth_state import export_auth_state, async_export_auth_state
+from replay import compile_resolved_plan, save_resolved_plan
+from launch_profiles import resolve_profile, launch_options, context_options, apply_routing, async_apply_routing
+from tracing import trace_run
+from utils import generate_markdown_report
+
+# Batch runs have nobody watching - headless unless a profile says otherwise
+RUNNER_DEFAULT_PROFILE = "ci"
+
+
+def make_job(task, app, context, run_name):
+    """A batch job: what to do, on which app, with which *_CONTEXT dict, saved under which name"""
+    return {"task": task, "app": app, "context": context, "run_name": run_name}
+
+
+class ParallelWorkflowRunner:
+    def __init__(self, api_key, concurrency=PARALLEL_CONCURRENCY, output_root=OUTPUT_DIR,
+                 plan_cache=None, verdict_cache=None, selector_index=None, profile=None, network=None,
+                 backend=None, streaming=PLAN_STREAMING, pipelined_verification=PIPELINED_VERIFICATION):
+        """
+        `profile` forces one launch profile for every job; otherwise each job's context uses
+        its app's profile (APP_LAUNCH_PROFILES). Browser-level options (headless, slow_mo)
+        are shared by all jobs and come from the forced/default profile.
+        `network` (a network_cache.NetworkLayer) is attached to every job context, one HAR per job.
+        `backend` (planner_backends) is shared by every job's planner - pass a LocalBackend to
+        load-test the pipeline without model calls.
+        `streaming` starts each job's steps as the plan streams in (see plan_stream).
+        `pipelined_verification` vision-verifies every successful step in the background (see pipelined_verifier).
+        """
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.output_root = Path(output_root)
+        self.plan_cache = plan_cache
+        self.verdict_cache = verdict_cache
+        self.selector_index = selector_index
+        self.profile = profile
+        self.network = network
+        self.backend = backend
+        self.streaming = streaming
+        self.pipelined_verification = pipelined_verification
+
+    def run(self, jobs):
+        """
+        Runs all jobs, at most `concurrency` at a time, and returns one result dict per job
+        (in the same order as `jobs`).
+
+        Playwright's sync API is bound to the thread that started it, so each worker thread
+        owns one driver + one browser and opens a fresh context per job it pulls.
+        """
+        start = time.perf_counter()
+        auth_state = self._prepare_auth_state(jobs)
+
+        pending = queue.Queue()
+        for index, job in enumerate(jobs):
+            pending.put((index, job))
+
+        results = [None] * len(jobs)
+        launch_errors = []
+        workers = [
+            threading.Thread(target=self._worker, args=(worker_id, pending, results, auth_state, launch_errors), daemon=True)
+            for worker_id in range(min(self.concurrency, len(jobs)))
+        ]
+
+        print(f"\n🚦 Running {len(jobs)} workflows across {len(workers)} browser contexts\n")
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # Jobs no worker got to - every browser launch failed, or a worker died
+        error = f"Not run: {launch_errors[-1]}" if launch_errors else "Not run: worker stopped"
+        results = [result or self._failed_result(job, error) for job, result in zip(jobs, results)]
+
+        if self.network is not None:
+            self.network.save()
+        self._print_summary(results, time.perf_counter() - start)
+        return results
+
+    async def run_async(self, jobs):
+        """
+        Same contract as run(), but all contexts come from one async Playwright + one browser,
+        with an asyncio.Semaphore bounding how many run at once.
+        LLM latency in one workflow overlaps with browser work in the others.
+        """
+        start = time.perf_counter()
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async with async_playwright() as playwright:
+            auth_state = None
+            if any(job["context"].get("auth_required") for job in jobs):
+                auth_state = await async_export_auth_state(playwright)
+
+            try:
+                browser = await playwright.chromium.launch(**self._browser_options())
+            except Exception as e:
+                print(f"❌ Browser launch failed: {e}")
+                results = [self._failed_result(job, f"Not run: {e}") for job in jobs]
+            else:
+                try:
+                    print(f"\n🚦 Running {len(jobs)} workflows, {self.concurrency} contexts at a time\n")
+
+                    async def run_one(slot_job):
+                        index, job = slot_job
+                        async with slots:
+                            return await self._run_job_async(index, browser, job, auth_state)
+
+                    results = await asyncio.gather(*(run_one(item) for item in enumerate(jobs)))
+                finally:
+                    await browser.close()
+
+        if self.network is not None:
+            self.network.save()
+        self._print_summary(results, time.perf_counter() - start)
+        return list(results)
+
+    def _browser_options(self):
+        return launch_options(resolve_profile(self.profile, default=RUNNER_DEFAULT_PROFILE))
+
+    def _job_profile(self, job):
+        return resolve_profile(self.profile, job["app"], default=RUNNER_DEFAULT_PROFILE)
+
+    def _prepare_auth_state(self, jobs):
+        """Snapshot the persistent profile once if any job needs a logged-in app"""
+        if not any(job["context"].get("auth_required") for job in jobs):
+            return None
+        with sync_playwright() as playwright:
+            return export_auth_state(playwright)
+
+    def _worker(self, worker_id, pending, results, auth_state, launch_errors):
+        """Runs queued jobs until the queue is empty; a worker whose browser won't launch takes none"""
+        with sync_playwright() as playwright:
+            try:
+                browser = playwright.chromium.launch(**self._browser_options())
+            except Exception as e:
+                print(f"❌ [worker {worker_id}] Browser launch failed: {e}")
+                launch_errors.append(str(e))
+                return
+            try:
+                while True:
+                    try:
+                        index, job = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    results[index] = self._run_job(worker_id, browser, job, auth_state)
+            finally:
+                browser.close()
+
+    def _output_dir(self, job):
+        return self.output_root / f"{job['app'].lower()}_{job['run_name']}"
+
+    def _failed_result(self, job, error):
+        """Result for a job that never got a browser context"""
+        return {"job": job, "output_dir": str(self._output_dir(job)), "successful": 0, "total": 0,
+                "error": error, "duration_s": 0.0, "blocked_requests": 0}
+
+    def _run_job(self, worker_id, browser, job, auth_state):
+        output_dir = self._output_dir(job)
+        result = {"job": job, "output_dir": str(output_dir), "successful": 0, "total": 0, "error": None}
+        job_start = time.perf_counter()
+
+        storage_state = auth_state if job["context"].get("auth_required") else None
+        context = executor = route_stats = None
+        try:
+            profile = self._job_profile(job)
+            context = browser.new_context(storage_state=storage_state, **context_options(profile))
+            if self.network is not None:
+                self.network.for_run(output_dir.name).attach(context)
+            route_stats = apply_routing(context, profile)
+            with trace_run(output_dir, job["run_name"]):  # Covers planning, not just execution
+                print(f"🧵 [worker {worker_id}] {job['app']}: {job['task']}")
+                planner = AdaptivePlanner(api_key=self.api_key, plan_cache=self.plan_cache,
+                                          verdict_cache=self.verdict_cache, backend=self.backend)
+                executor = AdaptiveExecutor(context=context, selector_index=self.selector_index)
+                executor.pipelined_verification = self.pipelined_verification
+
+                if self.streaming:
+                    plan_stream = planner.stream_initial_workflow(job["task"], job["app"], job["context"])
+                    executor.prefetch(job["context"].get("base_url"))  # While the first chunks arrive
+                    history = executor.run_streaming_workflow(plan_stream, output_dir, planner, job["app"])
+                else:
+                    plan = executor.plan_while_prefetching(planner, job["task"], job["app"], job["context"])
+                    history = executor.run_adaptive_workflow(plan, output_dir, planner, job["app"])
+
+                generate_markdown_report(job["task"], history, output_dir)
+                save_resolved_plan(compile_resolved_plan(history, job["task"], job["app"]), output_dir)
+
+                result["history"] = history
+                result["successful"] = sum(1 for h in history if h.get('success', False))
+                result["total"] = len(history)
+                result["usage"] = planner.usage.workflows[-1]
+        except Exception as e:
+            print(f"❌ [worker {worker_id}] {job['run_name']} failed: {e}")
+            result["error"] = str(e)
+        finally:
+            if executor is not None:
+                executor.close()
+            if context is not None:
+                context.close()
+            result["duration_s"] = round(time.perf_counter() - job_start, 1)
+            result["blocked_requests"] = sum(route_stats.values()) if route_stats else 0
+
+        return result
+
+    async def _run_job_async(self, job_id, browser, job, auth_state):
+        output_dir = self._output_dir(job)
+        result = {"job": job, "output_dir": str(output_dir), "successful": 0, "total": 0, "error": None}
+        job_start = time.perf_counter()
+
+        storage_state = auth_state if job["context"].get("auth_required") else None
+        context = executor = route_stats = None
+        try:
+            profile = self._job_profile(job)
+            context = await browser.new_context(storage_state=storage_state, **context_options(profile))
+            if self.network is not None:
+                await self.network.for_run(output_dir.name).async_attach(context)
+            route_stats = await async_apply_routing(context, profile)
+            with trace_run(output_dir, job["run_name"]):  # Covers planning, not just execution
+                print(f"🧵 [job {job_id}] {job['app']}: {job['task']}")
+                planner = AsyncAdaptivePlanner(api_key=self.api_key, plan_cache=self.plan_cache,
+                                               verdict_cache=self.verdict_cache, backend=self.backend)
+                executor = await AsyncAdaptiveExecutor.from_context(context, selector_index=self.selector_index)
+                executor.pipelined_verification = self.pipelined_verification
+
+                if self.streaming:
+                    plan_stream = planner.stream_initial_workflow(job["task"], job["app"], job["context"])
+                    executor.prefetch(job["context"].get("base_url"))  # While the first chunks arrive
+                    history = await executor.run_streaming_workflow(plan_stream, output_dir, planner, job["app"])
+                else:
+                    plan = await executor.plan_while_prefetching(planner, job["task"], job["app"], job["context"])
+                    history = await executor.run_adaptive_workflow(plan, output_dir, planner, job["app"])
+
+                generate_markdown_report(job["task"], history, output_dir)
+                save_resolved_plan(compile_resolved_plan(history, job["task"], job["app"]), output_dir)
+
+                result["history"] = history
+                result["successful"] = sum(1 for h in history if h.get('success', False))
+                result["total"] = len(history)
+                result["usage"] = planner.usage.workflows[-1]
+        except Exception as e:
+            print(f"❌ [job {job_id}] {job['run_name']} failed: {e}")
+            result["error"] = str(e)
+        finally:
+            if executor is not None:
+                await executor.close()
+            if context is not None:
+                await context.close()
+            result["duration_s"] = round(time.perf_counter() - job_start, 1)
+            result["blocked_requests"] = sum(route_stats.values()) if route_stats else 0
+
+        return result
+
+    def _print_summary(self, results, wall_time):
+        print("\n" + "=" * 60)
+        print("📊 PARALLEL RUN SUMMARY")
+        print("=" * 60)
+        results = [r for r in results if r]  # Tolerate a job that never got a result
+        for result in results:
+            job = result["job"]
+            status = "❌" if result["error"] else "✅"
+            print(f"{status} {job['app']:<10} {job['run_name']:<22} "
+                  f"{result['successful']}/{result['total']} steps  {result['duration_s']}s")
+        sequential = sum(r["duration_s"] for r in results)
+        print(f"\n⏱️  Wall time {wall_time:.1f}s (sum of job times {sequential:.1f}s)")
+        usage = [r["usage"] for r in results if r.get("usage")]
+        if usage:
+            tokens = sum(u["prompt_tokens"] + u["completion_tokens"] for u in usage)
+            print(f"💰 Model usage: {tokens} tokens, {sum(u['latency_s'] for u in usage):.1f}s of model latency, "
+                  f"${sum(u['cost_usd'] for u in usage):.4f}")
+        if self.network is not None and self.network.summary():
+            print(self.network.summary())
+        if hasattr(self.backend, "summary"):
+            print(self.backend.summary())
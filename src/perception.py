@@ -1,5 +1,6 @@
-import hashlib
+import io
 from playwright.sync_api import Page
+from config import PERCEPTION_MODE
 
 # The JavaScript that draws the Red Boxes (Set-of-Marks)
 SOM_JS = """
@@ -71,23 +72,375 @@ SOM_JS = """
 })();
 """
 
+# Same element discovery as SOM_JS, but read-only: returns the boxes as data
+# so the overlay can be drawn in Python onto the clean screenshot (no DOM mutation)
+SOM_COLLECT_JS = """
+() => {
+    function getAllInteractiveElements(root) {
+        let elements = [];
+        let nodes = Array.from(root.querySelectorAll('*'));
+        
+        nodes.forEach(node => {
+            if (node.shadowRoot) {
+                elements.push(...getAllInteractiveElements(node.shadowRoot));
+            }
+            if (node.matches && node.matches('button, input, a, textarea, select, [role="button"], [role="menuitem"], [role="option"]')) {
+                elements.push(node);
+            }
+        });
+        return elements;
+    }
+
+    let marks = [];
+    getAllInteractiveElements(document).forEach((el) => {
+        let rect = el.getBoundingClientRect();
+        let style = window.getComputedStyle(el);
+        let isVisible = style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+        let isBigEnough = rect.width > 10 && rect.height > 10;
+        
+        if (isVisible && isBigEnough) {
+            marks.push({
+                id: marks.length,
+                x: Math.round(rect.left),
+                y: Math.round(rect.top),
+                width: Math.round(rect.width),
+                height: Math.round(rect.height),
+                tag: el.tagName.toLowerCase(),
+                text: (el.innerText || el.value || el.getAttribute('aria-label') || '').trim().slice(0, 80)
+            });
+        }
+    });
+    return {devicePixelRatio: window.devicePixelRatio || 1, marks: marks};
+}
+"""
+
+# Incremental variant of SOM_COLLECT_JS. The first call on a document installs a
+# MutationObserver and a registry (element -> id); later calls only rescan the subtrees
+# that changed since the last call. Ids are handed out once per element, so the same
+# button keeps its number across steps for as long as the document lives.
+# Computed style and text are cached per element: a class/style change drops the caches of the
+# subtree it happened in, a child or text change those of the registered elements around it.
+# Boxes are re-read when anything may have moved - any mutation (it can shift everything after
+# it), scroll, resize, a late image/font load, a finished transition - and reused otherwise.
+SOM_INCREMENTAL_JS = """
+() => {
+    const SELECTOR = 'button, input, a, textarea, select, [role="button"], [role="menuitem"], [role="option"]';
+    let reg = window.__aiSomRegistry;
+
+    if (!reg) {
+        reg = window.__aiSomRegistry = {
+            ids: new WeakMap(),          // element -> id (survives detach/re-attach)
+            elements: new Map(),         // id -> element, insertion ordered
+            visibility: new Map(),       // id -> cached computed-style visibility
+            texts: new Map(),            // id -> cached innerText
+            boxes: new Map(),            // id -> last mark (or null: hidden / too small)
+            observedRoots: new WeakSet(),
+            added: new Set(),            // nodes inserted since the last call - scanned for new elements
+            restyled: new Set(),         // attribute-mutation targets - re-matched, their subtree's caches dropped
+            retexted: new Set(),         // child/text-mutation targets - their own and their ancestors' are
+            moved: false,                // layout may have shifted without a mutation
+            fullScan: true,
+            nextId: 0
+        };
+        reg.handle = (records) => {
+            for (const record of records) {
+                if (record.type === 'childList') {
+                    record.addedNodes.forEach(node => reg.added.add(node));
+                    reg.retexted.add(record.target);
+                } else if (record.type === 'characterData') {
+                    if (record.target.parentNode) reg.retexted.add(record.target.parentNode);
+                } else {
+                    reg.restyled.add(record.target);
+                }
+            }
+        };
+        reg.observer = new MutationObserver(reg.handle);
+        reg.touch = () => { reg.moved = true; };
+        window.addEventListener('resize', reg.touch, {passive: true});
+        if (document.fonts) document.fonts.addEventListener('loadingdone', reg.touch);
+    }
+
+    // Pick up mutations from this same task that haven't been delivered to the callback yet
+    reg.handle(reg.observer.takeRecords());
+
+    const observe = (root) => {
+        if (reg.observedRoots.has(root)) return;
+        reg.observedRoots.add(root);
+        reg.observer.observe(root, {
+            subtree: true,
+            childList: true,
+            characterData: true,
+            attributes: true,
+            attributeFilter: ['class', 'style', 'hidden', 'disabled', 'open', 'aria-hidden', 'role']
+        });
+        // Non-bubbling and not composed, so listen in the capture phase on every root
+        for (const type of ['scroll', 'load', 'transitionend', 'animationend']) {
+            root.addEventListener(type, reg.touch, {capture: true, passive: true});
+        }
+    };
+
+    // Calls fn on root (if it's an element) and every element below it, shadow roots included
+    const walk = (root, fn) => {
+        const each = (node) => {
+            if (node.shadowRoot) walk(node.shadowRoot, fn);
+            fn(node);
+        };
+        if (root.nodeType === Node.ELEMENT_NODE) each(root);
+        if (root.querySelectorAll) root.querySelectorAll('*').forEach(each);
+    };
+
+    // Drops nodes that sit inside another node of the set - their subtree is walked anyway
+    const outermost = (nodes) => {
+        const live = [...nodes].filter(node => node.isConnected &&
+            (node.nodeType === Node.ELEMENT_NODE || node.nodeType === Node.DOCUMENT_FRAGMENT_NODE ||
+             node.nodeType === Node.DOCUMENT_NODE));
+        return live.filter(node => !live.some(other => other !== node && other.contains(node)));
+    };
+
+    const register = (el) => {
+        let id = reg.ids.get(el);
+        if (id === undefined) {
+            id = reg.nextId++;
+            reg.ids.set(el, id);
+        }
+        reg.elements.set(id, el);
+        reg.visibility.delete(id);
+        reg.texts.delete(id);
+    };
+
+    const visit = (node) => {
+        if (node.shadowRoot) observe(node.shadowRoot);
+        if (node.matches(SELECTOR)) register(node);
+    };
+
+    const unregister = (node) => {
+        const id = reg.ids.get(node);
+        if (id === undefined) return;
+        reg.elements.delete(id);
+        reg.visibility.delete(id);
+        reg.texts.delete(id);
+        reg.boxes.delete(id);
+    };
+
+    // A role change can make an element start or stop matching SELECTOR
+    const rematch = (node) => {
+        if (node.nodeType !== Node.ELEMENT_NODE || !node.isConnected) return;
+        if (node.matches(SELECTOR)) visit(node);
+        else unregister(node);
+    };
+
+    const forget = (node) => {
+        const id = reg.ids.get(node);
+        if (id !== undefined) {
+            reg.visibility.delete(id);
+            reg.texts.delete(id);
+        }
+    };
+
+    // Up through shadow hosts too: a button's label can live in its shadow tree
+    const forgetUp = (node) => {
+        for (let n = node; n; n = n.parentNode || n.host) forget(n);
+    };
+
+    let rescanned = 0;
+    const layoutMayHaveMoved = reg.fullScan || reg.moved || reg.restyled.size > 0 || reg.retexted.size > 0;
+    if (reg.fullScan) {
+        observe(document);
+        walk(document, visit);
+        reg.fullScan = false;
+        rescanned = -1;
+    } else {
+        const added = outermost(reg.added);
+        added.forEach(node => walk(node, visit));
+        rescanned = added.length;
+        reg.restyled.forEach(rematch);
+        // A class/style change can hide or reveal what's inside the node it happened on, nothing else
+        outermost(reg.restyled).forEach(node => walk(node, forget));
+        // New/removed children or edited text only change the text of the elements containing them
+        reg.retexted.forEach(forgetUp);
+    }
+    reg.added.clear();
+    reg.restyled.clear();
+    reg.retexted.clear();
+    reg.moved = false;
+    if (layoutMayHaveMoved) reg.boxes.clear();
+
+    const marks = [];
+    let restyled = 0;
+    for (const [id, el] of reg.elements) {
+        if (!el.isConnected) {
+            reg.elements.delete(id);
+            reg.visibility.delete(id);
+            reg.texts.delete(id);
+            reg.boxes.delete(id);
+            continue;
+        }
+        let isVisible = reg.visibility.get(id);
+        if (isVisible === undefined) {
+            const style = window.getComputedStyle(el);
+            isVisible = style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+            reg.visibility.set(id, isVisible);
+            reg.boxes.delete(id);
+            restyled++;
+        }
+        if (!isVisible) continue;
+
+        let inner = reg.texts.get(id);
+        if (inner === undefined) {
+            inner = el.innerText || '';
+            reg.texts.set(id, inner);
+            reg.boxes.delete(id);
+        }
+        // value isn't an attribute (typing doesn't mutate the DOM) and aria-label isn't observed - read both live
+        const text = (inner || el.value || el.getAttribute('aria-label') || '').trim().slice(0, 80);
+
+        let mark = reg.boxes.get(id);
+        if (mark === undefined) {
+            const rect = el.getBoundingClientRect();
+            mark = rect.width > 10 && rect.height > 10 ? {
+                id: id,
+                x: Math.round(rect.left),
+                y: Math.round(rect.top),
+                width: Math.round(rect.width),
+                height: Math.round(rect.height),
+                tag: el.tagName.toLowerCase(),
+                text: text
+            } : null;
+            reg.boxes.set(id, mark);
+        }
+        if (mark) marks.push(mark.text === text ? mark : Object.assign({}, mark, {text: text}));
+    }
+
+    return {
+        devicePixelRatio: window.devicePixelRatio || 1,
+        marks: marks,
+        registered: reg.elements.size,
+        rescanned: rescanned,   // -1 = full scan (fresh document), else number of inserted subtrees scanned
+        restyled: restyled      // elements whose style/text were recomputed (new or inside a mutated subtree)
+    };
+}
+"""
+
+# Structural digest of the UI state, computed in the page so only a short hash crosses CDP:
+# URL + visible interactive elements (with their state) + open dialogs/menus + focused element.
+# No body.innerText (forces layout of the whole page) and no full DOM serialization.
+FINGERPRINT_JS = """
+() => {
+    // cyrb53 - small, fast, well-distributed 53-bit string hash
+    let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+    const feed = (str) => {
+        for (let i = 0; i < str.length; i++) {
+            const ch = str.charCodeAt(i);
+            h1 = Math.imul(h1 ^ ch, 2654435761);
+            h2 = Math.imul(h2 ^ ch, 1597334677);
+        }
+        h1 = Math.imul(h1 ^ 10, 2654435761);  // separator between parts
+    };
+    const visible = (el) => el.checkVisibility
+        ? el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true})
+        : !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const label = (el) => (el.getAttribute('aria-label') || el.textContent || '').trim().slice(0, 40);
+
+    feed(location.href);
+
+    document.querySelectorAll('button, input, a, textarea, select, [role="button"], [role="menuitem"], [role="option"], [role="tab"], [contenteditable="true"]').forEach(el => {
+        if (!visible(el)) return;
+        feed(el.tagName + '|' + (el.getAttribute('role') || '') + '|' + label(el) + '|' +
+             (el.disabled ? 'd' : '') + (el.checked ? 'c' : '') +
+             (el.getAttribute('aria-expanded') || '') + (el.getAttribute('aria-selected') || ''));
+    });
+
+    document.querySelectorAll('dialog[open], [role="dialog"], [role="alertdialog"], [aria-modal="true"], [role="menu"], [role="listbox"]').forEach(el => {
+        if (!visible(el)) return;
+        feed('overlay|' + (el.getAttribute('role') || el.tagName) + '|' + (el.getAttribute('aria-label') || '') + '|' +
+             (el.textContent || '').trim().slice(0, 60));
+    });
+
+    const active = document.activeElement;
+    if (active && active !== document.body) {
+        feed('focus|' + active.tagName + '|' + (active.id || active.name || '') + '|' + ('value' in active ? String(active.value).length : ''));
+    }
+
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16).padStart(14, '0');
+}
+"""
+
 def get_page_hash(page: Page) -> str:
     """
     Creates a unique fingerprint of the current UI state.
-    If a Modal opens, the text content changes -> Hash changes -> We take screenshot.
+    If a Modal opens, the interactive elements/overlays change -> Hash changes -> We take screenshot.
     """
     try:
-        visible_text = page.evaluate("document.body.innerText")
-        html_len = len(page.content())
-        fingerprint = f"{page.url}-{len(visible_text)}-{html_len}"
-        return hashlib.md5(fingerprint.encode()).hexdigest()
+        return page.evaluate(FINGERPRINT_JS)
+    except Exception:
+        return "error-hash"
+
+def _collect_js(incremental):
+    if incremental is None:
+        incremental = PERCEPTION_MODE == "incremental"
+    return SOM_INCREMENTAL_JS if incremental else SOM_COLLECT_JS
+
+def inject_visual_marks(page: Page, draw=True, incremental=None):
+    """
+    Runs the SOM javascript to paint Red Boxes on the UI.
+    With draw=False nothing is painted: returns {"devicePixelRatio", "marks": [boxes]}
+    for draw_visual_marks() to render onto an existing screenshot.
+    `incremental` (default: config.PERCEPTION_MODE) answers from the page's
+    MutationObserver registry instead of re-walking the whole DOM, with stable ids.
+    """
+    try:
+        return page.evaluate(SOM_JS if draw else _collect_js(incremental))
+    except Exception as e:
+        print(f"⚠️ Perception Warning: Could not inject marks: {e}")
+        return 0 if draw else {"devicePixelRatio": 1, "marks": []}
+
+def draw_visual_marks(png_bytes, som_data):
+    """
+    Paints the Set-of-Marks labels onto screenshot bytes (same look as SOM_JS:
+    white number on a red tag at each element's top-left corner). Returns PNG bytes.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    
+    image = Image.open(io.BytesIO(png_bytes)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    scale = som_data.get("devicePixelRatio", 1)
+    try:
+        font = ImageFont.load_default(size=int(12 * scale))
+    except TypeError:
+        font = ImageFont.load_default()  # Pillow < 10.1 has a single fixed-size bitmap font
+    
+    for mark in som_data.get("marks", []):
+        x, y = mark["x"] * scale, mark["y"] * scale
+        label = str(mark["id"])
+        left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+        pad_x, pad_y = 4 * scale, 2 * scale
+        draw.rounded_rectangle(
+            [x, y, x + (right - left) + 2 * pad_x, y + (bottom - top) + 2 * pad_y],
+            radius=4 * scale,
+            fill="#ff0000"
+        )
+        draw.text((x + pad_x - left, y + pad_y - top), label, fill="white", font=font)
+    
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+# ---- async_api variants (same JS, awaited) ----
+
+async def async_get_page_hash(page) -> str:
+    """get_page_hash for playwright.async_api pages"""
+    try:
+        return await page.evaluate(FINGERPRINT_JS)
     except Exception:
         return "error-hash"
 
-def inject_visual_marks(page: Page):
-    """Runs the SOM javascript to paint Red Boxes on the UI"""
+async def async_inject_visual_marks(page, draw=True, incremental=None):
+    """inject_visual_marks for playwright.async_api pages"""
     try:
-        return page.evaluate(SOM_JS)
+        return await page.evaluate(SOM_JS if draw else _collect_js(incremental))
     except Exception as e:
         print(f"⚠️ Perception Warning: Could not inject marks: {e}")
-        return 0
\ No newline at end of file
+        return 0 if draw else {"devicePixelRatio": 1, "marks": []}
@@ -0,0 +1,257 @@
+"""
+Pipelined Verifier - Vision verification of successful steps, off the executor's critical path
+The executor submits each step that passed its DOM checks and moves straight on to the next one;
+steps go out in batches of VERIFY_BATCH_WINDOW - the text tier first, the ones it can't settle
+in one vision call (see tiered_verify) - and verdicts are collected as they land.
+A late verdict saying the step didn't actually work is the executor's cue to roll back and
+re-execute (see AdaptiveExecutor._run_pipelined).
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tracing import span
+from utils import same_page
+from config import PIPELINED_VERIFY_WORKERS, VERIFY_BATCH_WINDOW
+
+
+def is_late_failure(verdict):
+    """A success=True verification that came back negative (budget skips count as passes)"""
+    return verdict.get('success') is False and not verdict.get('budget_skipped')
+
+
+def step_with_verdict(step, verdict):
+    """
+    Copy of `step` for re-execution after a late failure: the verdict's alternative selector
+    goes first, the selector that "worked" becomes a fallback.
+    """
+    alternative = verdict.get('alternative_selector')
+    primary = step.get('primary_selector')
+    if not alternative or not primary or alternative == primary:
+        return step
+    return dict(step, primary_selector=alternative,
+                fallback_selectors=[primary] + [s for s in step.get('fallback_selectors', []) if s != alternative])
+
+
+class PipelineState:
+    """
+    The bookkeeping of the executor's _run_pipelined loop, minus the page I/O: the history,
+    the URL each step started from, the steps queued for re-execution after a rollback,
+    and which steps have already been rolled back once.
+    """
+
+    def __init__(self, verifier):
+        self.verifier = verifier
+        self.history, self.checkpoints, self.redo, self.rolled_back = [], [], [], set()
+        self.exhausted = False  # The plan has no more steps
+
+    def waiting(self):
+        """Nothing left to execute right now - only verdicts can make progress"""
+        return self.exhausted and not self.redo
+
+    def apply(self, verdicts):
+        """
+        Records finished (index, verdict) pairs. For the first late failure of a step that wasn't
+        rolled back yet, returns (checkpoint url, step, observation) to roll the page back to and
+        queues everything from the last navigation boundary for re-execution - the first step
+        that started on the same URL, since reloading it drops the in-page state (open modals,
+        typed text) the steps before the failed one built. The failed step gets the verdict's
+        alternative first; the steps around it, submits included, run again as they are.
+        """
+        history = self.history
+        for index, verdict in verdicts:
+            if not is_late_failure(verdict):
+                if not verdict.get('budget_skipped'):
+                    history[index]['verified_by'] = verdict['tier']
+                continue
+            observation = verdict.get('observation', 'step did not take effect')
+            if index in self.rolled_back:
+                print(f"   ⚠️  Step {history[index]['step']['step_number']} failed vision verification again: {observation}")
+                history[index].update(success=False, error=f"Vision verification: {observation}")
+                continue
+            self.rolled_back.add(index)
+            self.verifier.stats["rollbacks"] += 1
+            start = self.boundary(index)
+            self.redo = ([h['step'] for h in history[start:index]] + [step_with_verdict(history[index]['step'], verdict)]
+                         + [h['step'] for h in history[index + 1:]] + self.redo)
+            self.verifier.discard_from(start)
+            rollback = (self.checkpoints[index], history[index]['step'], observation)
+            del history[start:], self.checkpoints[start:]
+            return rollback  # The rest of this batch is about steps that will be re-executed
+        return None
+
+    def boundary(self, index):
+        """Index of the first step in the run of steps that started on the same page as step `index`"""
+        start = index
+        while start > 0 and same_page(self.checkpoints[start - 1], self.checkpoints[index]):
+            start -= 1
+        return start
+
+    def next_move(self):
+        """'redo' (pop self.redo), 'next' (pull the plan's next step), 'wait' (for verdicts) or 'done'"""
+        if self.redo:
+            return "redo"
+        if not self.exhausted:
+            return "next"
+        return "wait" if self.verifier.pending() else "done"
+
+    def record(self, url, entry):
+        """Adds a step's history entry; True if it still needs a background verdict"""
+        self.checkpoints.append(url)
+        self.history.append(entry)
+        return entry['success'] and entry.get('verified_by') != "dom"  # The page already answered
+
+
+class PipelinedVerifier:
+    """
+    Runs the verifications on worker threads; results are keyed by history index.
+    Steps are sent `window` at a time through planner.verify_batch() (one vision call per batch);
+    with a window of 1 each step gets its own verify_and_adapt(success=True).
+    """
+
+    def __init__(self, planner, workers=PIPELINED_VERIFY_WORKERS, window=VERIFY_BATCH_WINDOW):
+        self.planner = planner
+        self.window = max(1, window)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="step-verifier")
+        self._batch = []        # (index, entry) waiting for the window to fill
+        self._pending = {}      # index -> (future, position of its verdict in the batch result)
+        self.stats = {"verified": 0, "calls": 0, "late_failures": 0, "rollbacks": 0, "discarded": 0}
+
+    def submit(self, index, step, screenshot_path, screenshot_bytes, snapshot=None):
+        """`snapshot` (an accessibility snapshot) lets the text tier try before vision"""
+        self._batch.append((index, {"step": step, "screenshot_path": screenshot_path,
+                                    "screenshot_bytes": screenshot_bytes, "snapshot": snapshot}))
+        if len(self._batch) >= self.window:
+            self.flush()
+
+    def flush(self):
+        """Sends whatever is waiting for the window, e.g. at the end of the workflow"""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self.stats["calls"] += 1
+        # copy_context so the verification spans land in the workflow's trace
+        future = self._pool.submit(contextvars.copy_context().run, self._verify, [entry for _, entry in batch])
+        for position, (index, _) in enumerate(batch):
+            self._pending[index] = (future, position)
+
+    def _verify(self, entries):
+        """Text tier per step, then the steps it couldn't settle in one vision call; verdicts carry their tier"""
+        with span("background_verify", "planner", steps=[e["step"]["step_number"] for e in entries]):
+            verdicts = [self._verify_text(entry) for entry in entries]
+            rest = [i for i, verdict in enumerate(verdicts) if verdict is None]
+            if len(rest) > 1:
+                for i, verdict in zip(rest, self.planner.verify_batch([entries[i] for i in rest])):
+                    verdicts[i] = dict(verdict, tier="vision")
+            elif rest:
+                entry = entries[rest[0]]
+                verdicts[rest[0]] = dict(self.planner.verify_and_adapt(
+                    entry["step"], entry["screenshot_path"], success=True, screenshot_bytes=entry["screenshot_bytes"]
+                ), tier="vision")
+            return verdicts
+
+    def _verify_text(self, entry):
+        if not entry["snapshot"]:
+            return None
+        verdict = self.planner.verify_from_snapshot(
+            entry["step"], entry["snapshot"], success=True, screenshot_bytes=entry["screenshot_bytes"]
+        )
+        return None if verdict is None else dict(verdict, tier="text")
+
+    def pending(self):
+        return bool(self._pending or self._batch)
+
+    def completed(self, wait_for_one=False):
+        """(index, verdict) for every finished verification, lowest index first"""
+        if wait_for_one:
+            self.flush()
+            if self._pending:
+                wait({future for future, _ in self._pending.values()}, return_when=FIRST_COMPLETED)
+        return self._collect(index for index, (future, _) in self._pending.items() if future.done())
+
+    def _collect(self, done):
+        results = []
+        for index in sorted(done):
+            future, position = self._pending.pop(index)
+            try:
+                verdict = future.result()[position]
+            except Exception as e:
+                print(f"   ⚠️  Background verification failed: {e}")
+                continue
+            self.stats["verified"] += 1
+            self.stats["late_failures"] += is_late_failure(verdict)
+            results.append((index, verdict))
+        return results
+
+    def discard_from(self, index):
+        """Drops verifications of steps at or after `index` - they're about to be re-executed"""
+        kept = [(i, entry) for i, entry in self._batch if i < index]
+        self.stats["discarded"] += len(self._batch) - len(kept)
+        self._batch = kept
+        stale = {self._pending.pop(i)[0] for i in [i for i in self._pending if i >= index]}
+        self.stats["discarded"] += len(stale)
+        live = {future for future, _ in self._pending.values()}
+        for future in stale - live:
+            future.cancel()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        stats = self.stats
+        return (f"🔭 Pipelined verification: {stats['verified']} steps verified in the background "
+                f"({stats['calls']} calls), {stats['late_failures']} late failures, {stats['rollbacks']} rollbacks")
+
+
+class AsyncPipelinedVerifier(PipelinedVerifier):
+    """Same bookkeeping for AsyncAdaptivePlanner: one task per batch, at most `workers` in flight"""
+
+    def __init__(self, planner, workers=PIPELINED_VERIFY_WORKERS, window=VERIFY_BATCH_WINDOW):
+        self.planner = planner
+        self.window = max(1, window)
+        self._slots = asyncio.Semaphore(workers)
+        self._batch = []
+        self._pending = {}
+        self.stats = {"verified": 0, "calls": 0, "late_failures": 0, "rollbacks": 0, "discarded": 0}
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self.stats["calls"] += 1
+        task = asyncio.create_task(self._verify([entry for _, entry in batch]))
+        for position, (index, _) in enumerate(batch):
+            self._pending[index] = (task, position)
+
+    async def _verify(self, entries):
+        async with self._slots:
+            with span("background_verify", "planner", steps=[e["step"]["step_number"] for e in entries]):
+                verdicts = list(await asyncio.gather(*(self._verify_text(entry) for entry in entries)))
+                rest = [i for i, verdict in enumerate(verdicts) if verdict is None]
+                if len(rest) > 1:
+                    for i, verdict in zip(rest, await self.planner.verify_batch([entries[i] for i in rest])):
+                        verdicts[i] = dict(verdict, tier="vision")
+                elif rest:
+                    entry = entries[rest[0]]
+                    verdicts[rest[0]] = dict(await self.planner.verify_and_adapt(
+                        entry["step"], entry["screenshot_path"], success=True, screenshot_bytes=entry["screenshot_bytes"]
+                    ), tier="vision")
+                return verdicts
+
+    async def _verify_text(self, entry):
+        if not entry["snapshot"]:
+            return None
+        verdict = await self.planner.verify_from_snapshot(
+            entry["step"], entry["snapshot"], success=True, screenshot_bytes=entry["screenshot_bytes"]
+        )
+        return None if verdict is None else dict(verdict, tier="text")
+
+    async def completed(self, wait_for_one=False):
+        if wait_for_one:
+            self.flush()
+            if self._pending:
+                await asyncio.wait({task for task, _ in self._pending.values()}, return_when=asyncio.FIRST_COMPLETED)
+        return self._collect(index for index, (task, _) in self._pending.items() if task.done())
+
+    def close(self):
+        for task, _ in self._pending.values():
+            task.cancel()
@@ -0,0 +1,115 @@
+"""
+Plan Cache - Persistent on-disk cache of AdaptivePlanner plans
+Same task + same app + same context + same model = same plan, so warm runs skip the LLM
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from config import MODEL_NAME, PLAN_CACHE_DIR, PLAN_CACHE_TTL_SECONDS, PLAN_CACHE_MAX_ENTRIES
+from json_store import load_json, save_json_atomic
+
+
+def make_plan_key(task_query, app_name, app_context, model_name=MODEL_NAME):
+    """
+    Normalized hash of everything that shapes the plan.
+    Whitespace/case differences in the task don't create new entries,
+    but any edit to the *_CONTEXT dict or MODEL_NAME does.
+    """
+    payload = json.dumps({
+        "task": " ".join(task_query.lower().split()),
+        "app": (app_name or "").strip().lower(),
+        "context": app_context or {},
+        "model": model_name,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PlanCache:
+    def __init__(self, cache_dir=None, ttl_seconds=PLAN_CACHE_TTL_SECONDS, max_entries=PLAN_CACHE_MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir or PLAN_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "plans.json"
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = load_json(self.index_path, {})
+        self._dirty = False
+        # Parallel runs share one cache - serialize index updates
+        self._lock = threading.RLock()
+
+    def _save(self):
+        save_json_atomic(self.index_path, self.entries)
+        self._dirty = False
+
+    def save(self):
+        """Writes the LRU times, hit counts and TTL expiries that get() keeps in memory, if any changed"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get(self, key):
+        """Returns a copy of the cached plan, or None if missing/expired (no disk write - see save())"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds:
+                del self.entries[key]
+                self._dirty = True
+                return None
+
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._dirty = True
+            return copy.deepcopy(entry["plan"])
+
+    def put(self, key, plan, task_query=None, app_name=None):
+        now = time.time()
+        with self._lock:
+            self.entries[key] = {
+                "plan": copy.deepcopy(plan),
+                "task": task_query,
+                "app": app_name,
+                "created_at": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self._evict()
+            self._save()
+
+    def invalidate(self, key):
+        """Drops a single entry. Returns True if something was removed."""
+        with self._lock:
+            if self.entries.pop(key, None) is None:
+                return False
+            self._save()
+            return True
+
+    def invalidate_if_failed(self, key, history):
+        """
+        Drops the entry if any step in a run_adaptive_workflow history failed,
+        so the next run asks the LLM for a fresh plan instead of repeating the bad one.
+        """
+        if key and any(not h.get("success", False) for h in history):
+            return self.invalidate(key)
+        return False
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self._save()
+
+    def _evict(self):
+        # Least-recently-used entries go first once we're over the size bound
+        overflow = len(self.entries) - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = sorted(self.entries, key=lambda k: self.entries[k]["last_used"])
+        for key in oldest[:overflow]:
+            del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,125 @@
+"""
+Plan Stream - Steps handed to the executor while the model is still writing the plan
+StepStreamParser pulls each complete step object out of the partial '{"steps": [...' JSON
+as it streams in; PlanStream / AsyncPlanStream are the queues between the planner's
+streaming call and the executor's run_streaming_workflow(), so step 1 (usually a
+navigate) runs while the rest of the plan is being generated.
+"""
+import asyncio
+import json
+import queue
+import re
+from tracing import span
+
+_STEPS_ARRAY = re.compile(r'"steps"\s*:\s*\[')
+_DONE = object()
+
+
+class StepStreamParser:
+    def __init__(self):
+        self.text = ""
+        self._pos = None        # Scan position inside the steps array (None until it's found)
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._closed = False
+        self.count = 0
+
+    def feed(self, chunk):
+        """Appends a chunk of streamed text; returns the steps it completed"""
+        self.text += chunk
+        if self._pos is None:
+            match = _STEPS_ARRAY.search(self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        steps = []
+        text = self.text
+        while self._pos < len(text) and not self._closed:
+            char = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    step = json.loads(text[self._object_start:self._pos + 1])
+                    self.count += 1
+                    step.setdefault("step_number", self.count)
+                    steps.append(step)
+            elif char == "]" and self._depth == 0:
+                self._closed = True
+            self._pos += 1
+        return steps
+
+
+class PlanStream:
+    """
+    Iterating yields steps as the planner parses them (blocking until the next one arrives).
+    Once the stream is exhausted, `plan` holds the complete plan (with its cache_key).
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.plan = {"steps": []}
+        self.error = None
+
+    def put_step(self, step):
+        self._queue.put(step)
+
+    def finish(self, plan=None, error=None):
+        if plan is not None:
+            self.plan = plan
+        self.error = error
+        self._queue.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            with span("wait_for_plan", "planner"):
+                item = self._queue.get()
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+class AsyncPlanStream:
+    """PlanStream for the async planner/executor: `async for step in stream`"""
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+        self.plan = {"steps": []}
+        self.error = None
+        self.task = None
+
+    def put_step(self, step):
+        self._queue.put_nowait(step)
+
+    def finish(self, plan=None, error=None):
+        if plan is not None:
+            self.plan = plan
+        self.error = error
+        self._queue.put_nowait(_DONE)
+
+    async def __aiter__(self):
+        while True:
+            with span("wait_for_plan", "planner"):
+                item = await self._queue.get()
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
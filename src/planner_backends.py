@@ -0,0 +1,289 @@
+"""
+Planner Backends - What AdaptivePlanner / AsyncAdaptivePlanner talk to for model calls
+- OpenAIBackend: chat completions with JSON output (the default)
+- LocalBackend: deterministic stand-in that answers from fixtures or simple rules, with
+  simulated latency and failures, so the executor, caches and parallel runner can be
+  load-tested with hundreds of workflows and no API spend
+
+A backend exposes complete(call, messages, **context) and async acomplete(...), both returning
+{"content": <JSON string>, "usage": {"prompt_tokens", "completion_tokens"}, "model": <name>}.
+stream(...) / astream(...) yield {"delta": <text>} chunks as the model writes, then that same dict.
+`call` is "plan" | "discover" | "verify" | "verify_text" | "verify_batch" | "next_steps"; `context` carries the structured
+inputs the prompt was built from (task, app, app_context, step, success, ...).
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from openai import OpenAI, AsyncOpenAI
+from config import (
+    API_KEY, MODEL_NAME, PLANNER_BACKEND,
+    LOCAL_BACKEND_LATENCY_MS, LOCAL_BACKEND_FAILURE_RATE, LOCAL_BACKEND_SEED,
+)
+
+# Rough vision token cost per image, by detail level (a "high" screenshot is several 512px tiles)
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+# LocalBackend streaming: share of the simulated latency spent before the first chunk, and chunk size
+STREAM_FIRST_CHUNK_SHARE = 0.2
+STREAM_CHUNK_CHARS = 40
+
+# common_selectors keys are named like "search_box" / "new_issue_button"; these words say nothing about the task
+SELECTOR_NAME_NOISE = {"link", "button", "input", "box", "list", "options"}
+
+
+class SimulatedBackendError(RuntimeError):
+    """Raised by LocalBackend on a simulated API failure (timeout / 5xx)"""
+
+
+def make_backend(name=None, api_key=None):
+    """Backend by name ("openai" / "local"), defaulting to PLANNER_BACKEND"""
+    name = (name or PLANNER_BACKEND).lower()
+    if name == "openai":
+        return OpenAIBackend(api_key or API_KEY)
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown planner backend '{name}' (expected 'openai' or 'local')")
+
+
+def estimate_tokens(messages):
+    """~4 characters per token for text, a flat cost per image"""
+    tokens = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // 4
+            elif part["type"] == "image_url":
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), IMAGE_TOKENS["auto"])
+    return tokens
+
+
+class OpenAIBackend:
+    def __init__(self, api_key, model=MODEL_NAME):
+        self.model = model
+        self.client = OpenAI(api_key=api_key)
+        self._async_client = None
+        self._api_key = api_key
+
+    def _request(self, messages):
+        return {"model": self.model, "messages": messages, "response_format": {"type": "json_object"}}
+
+    def _result(self, content, usage):
+        return {
+            "content": content,
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens if usage else 0,
+                "completion_tokens": usage.completion_tokens if usage else 0,
+            },
+            "model": self.model,
+        }
+
+    def _async(self):
+        # Created on first use so the client binds to the event loop that awaits it
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self._api_key)
+        return self._async_client
+
+    def complete(self, call, messages, **context):
+        response = self.client.chat.completions.create(**self._request(messages))
+        return self._result(response.choices[0].message.content, response.usage)
+
+    async def acomplete(self, call, messages, **context):
+        response = await self._async().chat.completions.create(**self._request(messages))
+        return self._result(response.choices[0].message.content, response.usage)
+
+    def stream(self, call, messages, **context):
+        parts, usage = [], None
+        for chunk in self.client.chat.completions.create(
+                **self._request(messages), stream=True, stream_options={"include_usage": True}):
+            usage = chunk.usage or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield {"delta": parts[-1]}
+        yield self._result("".join(parts), usage)
+
+    async def astream(self, call, messages, **context):
+        parts, usage = [], None
+        async for chunk in await self._async().chat.completions.create(
+                **self._request(messages), stream=True, stream_options={"include_usage": True}):
+            usage = chunk.usage or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield {"delta": parts[-1]}
+        yield self._result("".join(parts), usage)
+
+
+class LocalBackend:
+    """
+    Deterministic stand-in for the model. Plans come from `fixtures["plans"]` (keyed by task,
+    then app name) or are generated from the app context; verdicts come from
+    `fixtures["verdicts"]` (keyed by step description) or from the step's own fallbacks.
+    `fixtures` is a dict or a path to a JSON file with that shape.
+    """
+
+    model = "local"
+
+    def __init__(self, fixtures=None, latency_ms=LOCAL_BACKEND_LATENCY_MS,
+                 failure_rate=LOCAL_BACKEND_FAILURE_RATE, seed=LOCAL_BACKEND_SEED):
+        if isinstance(fixtures, (str, Path)):
+            fixtures = json.loads(Path(fixtures).read_text())
+        fixtures = fixtures or {}
+        self.plans = {_normalize(key): plan for key, plan in fixtures.get("plans", {}).items()}
+        self.verdicts = {_normalize(key): verdict for key, verdict in fixtures.get("verdicts", {}).items()}
+        self.latency_ms = latency_ms if isinstance(latency_ms, (tuple, list)) else (latency_ms, latency_ms)
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        # Shared by every worker thread / job in a parallel run
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "simulated_latency_s": 0.0}
+
+    def _draw(self):
+        """(latency in seconds, should this call fail) - drawn under the lock so a seed replays exactly"""
+        with self._lock:
+            latency = self._random.uniform(*self.latency_ms) / 1000
+            failed = self._random.random() < self.failure_rate
+            self.stats["calls"] += 1
+            self.stats["failures"] += failed
+            self.stats["simulated_latency_s"] += latency
+        return latency, failed
+
+    def complete(self, call, messages, **context):
+        latency, failed = self._draw()
+        time.sleep(latency)
+        return self._respond(call, messages, failed, context)
+
+    async def acomplete(self, call, messages, **context):
+        latency, failed = self._draw()
+        await asyncio.sleep(latency)
+        return self._respond(call, messages, failed, context)
+
+    def _chunks(self, result):
+        content = result["content"]
+        return [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+
+    def stream(self, call, messages, **context):
+        """Same latency as complete(), spread out: a wait for the first chunk, then the rest evenly"""
+        latency, failed = self._draw()
+        time.sleep(latency * STREAM_FIRST_CHUNK_SHARE)
+        result = self._respond(call, messages, failed, context)
+        chunks = self._chunks(result)
+        for chunk in chunks:
+            yield {"delta": chunk}
+            time.sleep(latency * (1 - STREAM_FIRST_CHUNK_SHARE) / len(chunks))
+        yield result
+
+    async def astream(self, call, messages, **context):
+        latency, failed = self._draw()
+        await asyncio.sleep(latency * STREAM_FIRST_CHUNK_SHARE)
+        result = self._respond(call, messages, failed, context)
+        chunks = self._chunks(result)
+        for chunk in chunks:
+            yield {"delta": chunk}
+            await asyncio.sleep(latency * (1 - STREAM_FIRST_CHUNK_SHARE) / len(chunks))
+        yield result
+
+    def _respond(self, call, messages, failed, context):
+        if failed:
+            raise SimulatedBackendError(f"Simulated {call} failure")
+        handler = {
+            "plan": self._plan,
+            "discover": self._discover,
+            "verify": self._verify,
+            "verify_text": self._verify_text,
+            "verify_batch": self._verify_batch,
+            "next_steps": self._next_steps,
+        }[call]
+        content = json.dumps(handler(**context))
+        return {
+            "content": content,
+            "usage": {"prompt_tokens": estimate_tokens(messages), "completion_tokens": len(content) // 4},
+            "model": self.model,
+        }
+
+    def _plan(self, task=None, app=None, app_context=None, **_):
+        fixture = self.plans.get(_normalize(task)) or self.plans.get(_normalize(app))
+        if fixture is not None:
+            return json.loads(json.dumps(fixture))  # Callers annotate plans in place
+        return {"steps": generate_plan(task or "", app_context or {})}
+
+    def _discover(self, **_):
+        return {"discovered_selectors": {}, "confidence": 0, "workflow_hints": "local backend - no discovery"}
+
+    def _verify(self, step=None, success=True, error_message=None, **_):
+        step = step or {}
+        fixture = self.verdicts.get(_normalize(step.get("description")))
+        if fixture is not None:
+            return dict(fixture)
+        if success:
+            return {"success": True, "observation": "Step looks complete", "next_action": "continue",
+                    "confidence": 90}
+        if step.get("text_match"):
+            return {"success": False, "problem": error_message or "Selector not found",
+                    "alternative_approach": "click_text", "text_to_click": step["text_match"],
+                    "should_skip": False, "reasoning": "Click the visible text instead"}
+        if step.get("keyboard_shortcut"):
+            return {"success": False, "problem": error_message or "Selector not found",
+                    "alternative_approach": "keyboard_shortcut", "keyboard_shortcut": step["keyboard_shortcut"],
+                    "should_skip": False, "reasoning": "Use the keyboard shortcut instead"}
+        return {"success": False, "problem": error_message or "Selector not found",
+                "alternative_approach": "skip", "should_skip": True, "reasoning": "No alternative known"}
+
+    def _verify_text(self, **context):
+        return dict(self._verify(**context), can_tell=True)
+
+    def _verify_batch(self, steps=(), **_):
+        return {"verdicts": [dict(self._verify(step=step, success=True), screenshot=n)
+                             for n, step in enumerate(steps, 1)]}
+
+    def _next_steps(self, **_):
+        return {"steps": []}
+
+    def summary(self):
+        stats = self.stats
+        return (f"🧪 Local backend: {stats['calls']} calls, {stats['failures']} simulated failures, "
+                f"{stats['simulated_latency_s']:.1f}s simulated latency")
+
+
+def _normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def generate_plan(task, app_context):
+    """
+    Rule-based plan: open base_url, then act on every common_selectors entry the task mentions
+    (a quoted phrase in the task is typed into box/input/field selectors, everything else is clicked).
+    """
+    steps = []
+    if app_context.get("base_url"):
+        steps.append({"action": "navigate", "description": "Open the app", "url": app_context["base_url"]})
+
+    words = set(re.findall(r"[a-z]+", task.lower()))
+    quoted = re.search(r"['\"]([^'\"]+)['\"]", task)
+    for name, selector in app_context.get("common_selectors", {}).items():
+        name_words = set(name.lower().split("_")) - SELECTOR_NAME_NOISE
+        if not name_words or not name_words & words:
+            continue
+        candidates = [part.strip() for part in selector.split(",") if part.strip()]
+        step = {
+            "description": name.replace("_", " ").capitalize(),
+            "primary_selector": candidates[0],
+            "fallback_selectors": candidates[1:],
+        }
+        if quoted and any(word in name for word in ("box", "input", "field")):
+            step.update(action="type", input_value=quoted.group(1))
+            steps.append(step)
+            steps.append({"action": "press_enter", "description": "Submit"})
+        else:
+            step["action"] = "click"
+            steps.append(step)
+
+    for number, step in enumerate(steps, 1):
+        step["step_number"] = number
+    return steps
@@ -0,0 +1,47 @@
+"""
+Replay - Compile a successful run into a resolved plan and load it back
+A resolved plan pins the exact strategy/selector/attempt that worked for every step,
+so AdaptiveExecutor.run_resolved_workflow can rerun it at browser speed with no LLM calls.
+"""
+import json
+from pathlib import Path
+
+RESOLVED_PLAN_FILENAME = "resolved_plan.json"
+
+
+def compile_resolved_plan(history, task=None, app=None):
+    """
+    Turns a run_adaptive_workflow history into a resolved plan.
+    Steps that never succeeded keep resolution=None - replay diverges there
+    and hands the rest of the workflow back to adaptive mode.
+    """
+    steps = []
+    for item in history:
+        steps.append({
+            "step": item['step'],
+            "resolution": item.get('resolution') if item.get('success') else None
+        })
+
+    return {
+        "task": task,
+        "app": app,
+        "fully_resolved": all(s['resolution'] for s in steps),
+        "steps": steps
+    }
+
+
+def save_resolved_plan(resolved_plan, output_dir):
+    path = Path(output_dir) / RESOLVED_PLAN_FILENAME
+    with open(path, "w") as f:
+        json.dump(resolved_plan, f, indent=2)
+    print(f"💾 Resolved plan saved: {path}")
+    return path
+
+
+def load_resolved_plan(output_dir):
+    """Returns the resolved plan recorded in output_dir, or None if there isn't one"""
+    path = Path(output_dir) / RESOLVED_PLAN_FILENAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,75 @@
+"""
+Screenshot Writer - Gets screenshot disk writes off the executor's critical path
+page.screenshot() still returns an encoded PNG on the executor's thread; the executor hands
+those bytes over and a small worker pool writes the file (after any transform, e.g. the
+Set-of-Marks overlay) while the next action runs.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from config import SCREENSHOT_WRITER_WORKERS, SCREENSHOT_WRITER_MAX_PENDING
+
+
+class ScreenshotWriter:
+    def __init__(self, max_workers=SCREENSHOT_WRITER_WORKERS, max_pending=SCREENSHOT_WRITER_MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot-writer")
+        # Backpressure: submit() blocks once this many writes are queued, so a slow disk
+        # can't make us buffer an unbounded number of PNGs in memory
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, path, image_bytes, transform=None):
+        """
+        Queues `image_bytes` to be written to `path`.
+        `transform(bytes) -> bytes` runs on the worker first (e.g. drawing an overlay).
+        Writes to the same path are applied in submission order.
+        """
+        if self._closed:
+            raise RuntimeError("ScreenshotWriter is closed")
+
+        key = str(path)
+        self._slots.acquire()
+        with self._lock:
+            previous = self._pending.get(key)
+            future = self._pool.submit(self._write, key, image_bytes, transform, previous)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _write(self, path, image_bytes, transform, previous):
+        if previous is not None:
+            previous.exception()  # Wait for the earlier write to this path, whatever its outcome
+
+        if transform is not None:
+            image_bytes = transform(image_bytes)
+
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(image_bytes)
+        tmp_path.replace(path)
+        return str(path)
+
+    def _done(self, key, future):
+        self._slots.release()
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        if future.exception() is not None:
+            print(f"⚠️ Screenshot write failed for {key}: {future.exception()}")
+
+    def flush(self):
+        """Blocks until every queued write has finished"""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.exception()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._pool.shutdown(wait=True)
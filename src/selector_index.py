@@ -0,0 +1,130 @@
+"""
+Selector Index - Learned record of which selectors/strategies actually work, per origin
+Every click/fill attempt is logged against the page origin and the step's intent, so the
+next run tries the candidate that worked last time first and skips the ones that keep timing out.
+"""
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from config import SELECTOR_INDEX_DIR, SELECTOR_DEAD_AFTER_FAILURES, SELECTOR_INDEX_MAX_INTENTS
+from json_store import load_json, save_json_atomic
+
+# Words that don't change what a step is trying to do
+STOP_WORDS = {"the", "a", "an", "to", "on", "in", "of", "for", "and", "or", "into", "with", "at", "it", "this", "that"}
+
+
+def origin_key(url, app=None):
+    """scheme://host of the current page; falls back to the app name on about:blank etc."""
+    parsed = urlparse(url or "")
+    if parsed.scheme in ("http", "https") and parsed.netloc:
+        return f"{parsed.scheme}://{parsed.netloc.lower()}"
+    return (app or "unknown").strip().lower()
+
+
+def intent_key(step):
+    """
+    Action + the meaningful words of the description, order-independent.
+    "Click the 'New Issue' button" and "Click New issue button" land on the same intent.
+    """
+    words = re.findall(r"[a-z]+", step.get('description', '').lower())
+    keywords = sorted({w for w in words if w not in STOP_WORDS})
+    return f"{step.get('action', '')}:{' '.join(keywords)}"[:200]
+
+
+class SelectorIndex:
+    def __init__(self, index_dir=None, dead_after=SELECTOR_DEAD_AFTER_FAILURES, max_intents=SELECTOR_INDEX_MAX_INTENTS):
+        self.index_dir = Path(index_dir or SELECTOR_INDEX_DIR)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.index_dir / "selectors.json"
+        self.dead_after = dead_after
+        self.max_intents = max_intents
+        # origin -> intent -> candidate -> {"successes", "failures", "total_ms", "last_used", "last_success"}
+        self.entries = load_json(self.index_path, {})
+        self._dirty = False
+        # Parallel runs share one index - serialize updates
+        self._lock = threading.RLock()
+
+    def record(self, origin, step, candidate, success, elapsed_ms):
+        """Logs one attempt of `candidate` (a selector or "strategy:..." name) for this step"""
+        now = time.time()
+        with self._lock:
+            intents = self.entries.setdefault(origin, {})
+            candidates = intents.setdefault(intent_key(step), {})
+            stats = candidates.setdefault(candidate, {"successes": 0, "failures": 0, "total_ms": 0})
+            if success:
+                stats["successes"] += 1
+                stats["total_ms"] += round(elapsed_ms)
+                stats["last_success"] = now
+            else:
+                stats["failures"] += 1
+            stats["last_used"] = now
+            self._dirty = True
+
+    def stats(self, origin, step, candidate):
+        with self._lock:
+            stats = self.entries.get(origin, {}).get(intent_key(step), {}).get(candidate)
+            return dict(stats) if stats else None
+
+    def is_dead(self, origin, step, candidate):
+        """
+        Failed `dead_after` times and never worked for this intent.
+        One success (ever) keeps a selector alive - the page may just have been slow.
+        """
+        stats = self.stats(origin, step, candidate)
+        return bool(stats) and stats["successes"] == 0 and stats["failures"] >= self.dead_after
+
+    def rank(self, origin, step, candidates):
+        """
+        Orders `candidates` for this step: proven ones first (by success rate, then mean latency),
+        then untried ones in their original order, then ones with a poor record.
+        Known-dead candidates are dropped.
+        """
+        scored = []
+        for position, candidate in enumerate(candidates):
+            stats = self.stats(origin, step, candidate)
+            if stats is None:
+                scored.append(((1, 0, 0, position), candidate))
+                continue
+            if stats["successes"] == 0 and stats["failures"] >= self.dead_after:
+                continue
+            attempts = stats["successes"] + stats["failures"]
+            rate = stats["successes"] / attempts
+            mean_ms = stats["total_ms"] / stats["successes"] if stats["successes"] else float("inf")
+            tier = 0 if rate >= 0.5 else 2
+            scored.append(((tier, -rate, mean_ms, position), candidate))
+        return [candidate for _, candidate in sorted(scored, key=lambda item: item[0])]
+
+    def learned(self, origin, step):
+        """Selectors that have worked for this intent on this origin before, best first"""
+        with self._lock:
+            candidates = self.entries.get(origin, {}).get(intent_key(step), {})
+            names = [name for name, stats in candidates.items()
+                     if stats["successes"] and not name.startswith("strategy:")]
+        return self.rank(origin, step, names)
+
+    def save(self):
+        """Writes the index to disk if anything changed since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            save_json_atomic(self.index_path, self.entries)
+            self._dirty = False
+
+    def _evict(self):
+        # Bound the index per origin: drop the intents we haven't touched for longest
+        for origin, intents in self.entries.items():
+            overflow = len(intents) - self.max_intents
+            if overflow <= 0:
+                continue
+            last_used = {
+                intent: max((c.get("last_used", 0) for c in candidates.values()), default=0)
+                for intent, candidates in intents.items()
+            }
+            for intent in sorted(last_used, key=last_used.get)[:overflow]:
+                del intents[intent]
+
+    def __len__(self):
+        return sum(len(intents) for intents in self.entries.values())
@@ -0,0 +1,416 @@
+"""
+Session Pool - Keep Chromium warm across workflows instead of relaunching it per task
+Contexts are launched once, checked out by an executor for one workflow, then reset back to
+the storage they started with and handed to the next one: every tab is replaced, and on every
+origin the workflow touched the cookies, localStorage keys and IndexedDB databases it added are
+removed. Cache Storage, service workers and OPFS aren't tracked - max_uses bounds how long those
+can carry over. Unhealthy or worn-out contexts are replaced transparently.
+"""
+from pathlib import Path
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+from config import PROJECT_ROOT, SESSION_POOL_SIZE, SESSION_POOL_MAX_USES
+from auth_state import export_auth_state, async_export_auth_state
+from launch_profiles import (
+    resolve_profile,
+    launch_options,
+    context_options,
+    persistent_options,
+    apply_routing,
+    async_apply_routing,
+    format_route_stats,
+)
+
+# Runs on one origin: drops its sessionStorage plus any localStorage key / IndexedDB database that
+# wasn't there when the context was created (`keep`, from _storage_baseline)
+RESET_ORIGIN_JS = """
+async (keep) => {
+    try { sessionStorage.clear(); } catch (e) {}
+    try {
+        for (const key of Object.keys(localStorage)) {
+            if (!keep.localStorage.includes(key)) localStorage.removeItem(key);
+        }
+    } catch (e) {}
+    try {
+        const databases = await indexedDB.databases();
+        await Promise.all(databases.filter(db => !keep.indexedDB.includes(db.name)).map(db => new Promise(resolve => {
+            const request = indexedDB.deleteDatabase(db.name);
+            request.onsuccess = request.onerror = request.onblocked = () => resolve();
+        })));
+    } catch (e) {}
+}
+"""
+
+# Served locally on each origin being reset, so the reset never touches the network
+RESET_PATH = "/__session_pool_reset__"
+
+
+def _cookie_key(cookie):
+    return (cookie["name"], cookie["domain"], cookie["path"])
+
+
+def _storage_baseline(storage_state):
+    """
+    What a fresh context holds, from a context.storage_state(indexed_db=True) snapshot:
+    cookie identities, and per origin its localStorage keys and IndexedDB names.
+    """
+    return {
+        "cookies": [_cookie_key(cookie) for cookie in storage_state.get("cookies", [])],
+        "origins": {
+            origin["origin"]: {
+                "localStorage": [item["name"] for item in origin.get("localStorage", [])],
+                "indexedDB": [db["name"] for db in origin.get("indexedDB", [])],
+            }
+            for origin in storage_state.get("origins", [])
+        },
+    }
+
+
+def _storage_added(baseline, storage_state):
+    """
+    (cookies, origins) the workflow added since the baseline: the new cookies, and
+    origin -> what to keep for every origin with a new localStorage key or IndexedDB database.
+    Baseline cookies stay, with whatever value the site refreshed them to - that's where the logins live.
+    """
+    known = {tuple(key) for key in baseline["cookies"]}
+    cookies = [cookie for cookie in storage_state.get("cookies", []) if _cookie_key(cookie) not in known]
+    origins = {}
+    for origin in storage_state.get("origins", []):
+        if not origin["origin"].startswith("http"):
+            continue  # Nothing to navigate to (extension pages and the like)
+        keep = baseline["origins"].get(origin["origin"], {"localStorage": [], "indexedDB": []})
+        if (any(item["name"] not in keep["localStorage"] for item in origin.get("localStorage", []))
+                or any(db["name"] not in keep["indexedDB"] for db in origin.get("indexedDB", []))):
+            origins[origin["origin"]] = keep
+    return cookies, origins
+
+
+def _fulfill_blank(route):
+    route.fulfill(status=200, content_type="text/html", body="<!doctype html>")
+
+
+async def _async_fulfill_blank(route):
+    await route.fulfill(status=200, content_type="text/html", body="<!doctype html>")
+
+
+class SessionPool:
+    """
+    Warm browser contexts for the sync executor. Like the sync API itself, use it from one thread.
+    persistent=True keeps the data/user_data profile open (a single context with the real login);
+    otherwise `size` isolated contexts are cloned from the profile's exported login state.
+    `profile` is a launch profile name or dict (see launch_profiles) - without one, `app` picks it
+    from config.APP_LAUNCH_PROFILES; `network` is an optional
+    network_cache.NetworkLayer attached to every context the pool creates.
+    """
+    def __init__(self, size=SESSION_POOL_SIZE, persistent=False, user_data_dir=None,
+                 profile=None, max_uses=SESSION_POOL_MAX_USES, network=None, app=None):
+        self.size = 1 if persistent else size  # A profile can only be opened once
+        self.persistent = persistent
+        self.user_data_dir = user_data_dir or str(PROJECT_ROOT / "data" / "user_data")
+        self.profile = resolve_profile(profile, app)
+        self.network = network
+        self.max_uses = max_uses
+        self.stats = {"launched": 0, "checkouts": 0, "replaced": 0}
+        self.route_stats = {}
+        self._playwright = None
+        self._browser = None
+        self._auth_state = None
+        self._idle = []
+        self._in_use = {}
+
+    def start(self):
+        """Launches the browser and pre-warms `size` contexts (checkout() does this lazily)"""
+        if self._playwright is not None:
+            return self
+
+        self._playwright = sync_playwright().start()
+        if not self.persistent:
+            if Path(self.user_data_dir).exists():
+                self._auth_state = export_auth_state(self._playwright, self.user_data_dir)
+            self._browser = self._playwright.chromium.launch(**launch_options(self.profile))
+
+        for _ in range(self.size):
+            self._idle.append(self._new_session())
+        print(f"♨️  Session pool warmed: {self.size} context(s), {self.profile['name']} launch")
+        return self
+
+    def _new_session(self):
+        if self.persistent:
+            print(f"🔐 Using browser profile: {self.user_data_dir}")
+            context = self._playwright.chromium.launch_persistent_context(
+                user_data_dir=self.user_data_dir,
+                **persistent_options(self.profile)
+            )
+        else:
+            if not self._browser.is_connected():
+                self._browser = self._playwright.chromium.launch(**launch_options(self.profile))
+            context = self._browser.new_context(storage_state=self._auth_state, **context_options(self.profile))
+
+        self._attach_network(context)
+        apply_routing(context, self.profile, self.route_stats)
+        if not context.pages:
+            context.new_page()
+        self.stats["launched"] += 1
+        return {"context": context, "baseline": _storage_baseline(context.storage_state(indexed_db=True)), "uses": 0}
+
+    def _attach_network(self, context):
+        if self.network is None:
+            return
+        # One HAR per context - they are written when the context closes
+        layer = self.network if self.persistent else self.network.for_run(f"session_{self.stats['launched'] + 1}")
+        layer.attach(context)
+
+    def checkout(self):
+        """A healthy, reset context for one workflow. Give it back with checkin()."""
+        self.start()
+        while self._idle:
+            session = self._idle.pop()
+            if self._healthy(session):
+                break
+            self._discard(session)
+        else:
+            session = self._new_session()
+
+        session["uses"] += 1
+        self.stats["checkouts"] += 1
+        self._in_use[id(session["context"])] = session
+        return session["context"]
+
+    def checkin(self, context):
+        """Resets the context and keeps it warm for the next checkout"""
+        session = self._in_use.pop(id(context), None)
+        if session is None:
+            return
+
+        if session["uses"] >= self.max_uses or not self._reset(session):
+            self._discard(session)
+            session = self._new_session()
+        self._idle.append(session)
+
+    def _healthy(self, session):
+        try:
+            if not self.persistent and not self._browser.is_connected():
+                return False
+            context = session["context"]
+            page = context.pages[0] if context.pages else context.new_page()
+            return page.evaluate("() => document.readyState") is not None
+        except Exception:
+            return False
+
+    def _reset(self, session):
+        """Back to the session's baseline storage on every origin (see the module docstring)"""
+        context = session["context"]
+        try:
+            # A fresh tab - sessionStorage lives per tab, so closing the old ones drops all of it
+            page = context.new_page()
+            for old in context.pages:
+                if old is not page:
+                    old.close()
+            cookies, origins = _storage_added(session["baseline"], context.storage_state(indexed_db=True))
+            for cookie in cookies:
+                context.clear_cookies(name=cookie["name"], domain=cookie["domain"], path=cookie["path"])
+            for origin, keep in origins.items():
+                url = origin + RESET_PATH
+                page.route(url, _fulfill_blank)
+                try:
+                    page.goto(url)
+                    page.evaluate(RESET_ORIGIN_JS, keep)
+                finally:
+                    page.unroute(url, _fulfill_blank)
+            if origins:
+                page.goto("about:blank")
+            context.clear_permissions()
+            return True
+        except Exception as e:
+            print(f"⚠️ Session reset failed, replacing context: {e}")
+            return False
+
+    def _discard(self, session):
+        self.stats["replaced"] += 1
+        try:
+            session["context"].close()
+        except Exception:
+            pass
+
+    def close(self):
+        if self._playwright is None:
+            return
+        for session in self._idle + list(self._in_use.values()):
+            try:
+                session["context"].close()
+            except Exception:
+                pass
+        self._idle, self._in_use = [], {}
+        if self._browser is not None:
+            self._browser.close()
+        self._playwright.stop()
+        self._playwright = None
+        print(f"♨️  Session pool closed: {self.stats['checkouts']} checkouts served by "
+              f"{self.stats['launched']} launches ({self.stats['replaced']} replaced)")
+        if self.route_stats:
+            print(format_route_stats(self.route_stats))
+        if self.network is not None:
+            self.network.save()
+            if self.network.summary():
+                print(self.network.summary())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncSessionPool:
+    """SessionPool for async_playwright - share one across the tasks of a single event loop"""
+    def __init__(self, size=SESSION_POOL_SIZE, persistent=False, user_data_dir=None,
+                 profile=None, max_uses=SESSION_POOL_MAX_USES, network=None, app=None):
+        self.size = 1 if persistent else size
+        self.persistent = persistent
+        self.user_data_dir = user_data_dir or str(PROJECT_ROOT / "data" / "user_data")
+        self.profile = resolve_profile(profile, app)
+        self.network = network
+        self.max_uses = max_uses
+        self.stats = {"launched": 0, "checkouts": 0, "replaced": 0}
+        self.route_stats = {}
+        self._playwright = None
+        self._browser = None
+        self._auth_state = None
+        self._idle = []
+        self._in_use = {}
+
+    async def start(self):
+        if self._playwright is not None:
+            return self
+
+        self._playwright = await async_playwright().start()
+        if not self.persistent:
+            if Path(self.user_data_dir).exists():
+                self._auth_state = await async_export_auth_state(self._playwright, self.user_data_dir)
+            self._browser = await self._playwright.chromium.launch(**launch_options(self.profile))
+
+        for _ in range(self.size):
+            self._idle.append(await self._new_session())
+        print(f"♨️  Session pool warmed: {self.size} context(s), {self.profile['name']} launch")
+        return self
+
+    async def _new_session(self):
+        if self.persistent:
+            print(f"🔐 Using browser profile: {self.user_data_dir}")
+            context = await self._playwright.chromium.launch_persistent_context(
+                user_data_dir=self.user_data_dir,
+                **persistent_options(self.profile)
+            )
+        else:
+            if not self._browser.is_connected():
+                self._browser = await self._playwright.chromium.launch(**launch_options(self.profile))
+            context = await self._browser.new_context(storage_state=self._auth_state, **context_options(self.profile))
+
+        await self._attach_network(context)
+        await async_apply_routing(context, self.profile, self.route_stats)
+        if not context.pages:
+            await context.new_page()
+        self.stats["launched"] += 1
+        return {"context": context, "baseline": _storage_baseline(await context.storage_state(indexed_db=True)), "uses": 0}
+
+    async def _attach_network(self, context):
+        if self.network is None:
+            return
+        layer = self.network if self.persistent else self.network.for_run(f"session_{self.stats['launched'] + 1}")
+        await layer.async_attach(context)
+
+    async def checkout(self):
+        await self.start()
+        while self._idle:
+            session = self._idle.pop()
+            if await self._healthy(session):
+                break
+            await self._discard(session)
+        else:
+            session = await self._new_session()
+
+        session["uses"] += 1
+        self.stats["checkouts"] += 1
+        self._in_use[id(session["context"])] = session
+        return session["context"]
+
+    async def checkin(self, context):
+        session = self._in_use.pop(id(context), None)
+        if session is None:
+            return
+
+        if session["uses"] >= self.max_uses or not await self._reset(session):
+            await self._discard(session)
+            session = await self._new_session()
+        self._idle.append(session)
+
+    async def _healthy(self, session):
+        try:
+            if not self.persistent and not self._browser.is_connected():
+                return False
+            context = session["context"]
+            page = context.pages[0] if context.pages else await context.new_page()
+            return await page.evaluate("() => document.readyState") is not None
+        except Exception:
+            return False
+
+    async def _reset(self, session):
+        context = session["context"]
+        try:
+            page = await context.new_page()
+            for old in context.pages:
+                if old is not page:
+                    await old.close()
+            cookies, origins = _storage_added(session["baseline"], await context.storage_state(indexed_db=True))
+            for cookie in cookies:
+                await context.clear_cookies(name=cookie["name"], domain=cookie["domain"], path=cookie["path"])
+            for origin, keep in origins.items():
+                url = origin + RESET_PATH
+                await page.route(url, _async_fulfill_blank)
+                try:
+                    await page.goto(url)
+                    await page.evaluate(RESET_ORIGIN_JS, keep)
+                finally:
+                    await page.unroute(url, _async_fulfill_blank)
+            if origins:
+                await page.goto("about:blank")
+            await context.clear_permissions()
+            return True
+        except Exception as e:
+            print(f"⚠️ Session reset failed, replacing context: {e}")
+            return False
+
+    async def _discard(self, session):
+        self.stats["replaced"] += 1
+        try:
+            await session["context"].close()
+        except Exception:
+            pass
+
+    async def close(self):
+        if self._playwright is None:
+            return
+        for session in self._idle + list(self._in_use.values()):
+            try:
+                await session["context"].close()
+            except Exception:
+                pass
+        self._idle, self._in_use = [], {}
+        if self._browser is not None:
+            await self._browser.close()
+        await self._playwright.stop()
+        self._playwright = None
+        print(f"♨️  Session pool closed: {self.stats['checkouts']} checkouts served by "
+              f"{self.stats['launched']} launches ({self.stats['replaced']} replaced)")
+        if self.route_stats:
+            print(format_route_stats(self.route_stats))
+        if self.network is not None:
+            self.network.save()
+            if self.network.summary():
+                print(self.network.summary())
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,116 @@
+"""
+Settle Detection - Wait until the UI is actually stable instead of sleeping a fixed time
+A step is 'settled' when the DOM has been quiet for a short window (MutationObserver),
+optionally after network idle and after an expected element shows up - capped by a max bound.
+"""
+import time
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeout
+from config import SETTLE_QUIET_MS, SETTLE_MAX_MS
+
+# What _perform_action used to hard-sleep per action - the baseline for 'waiting saved'
+FIXED_WAIT_MS = {
+    "navigate": 1500,
+    "click": 1500,
+    "type": 500,
+    "scroll": 500,
+    "wait": 2000,
+}
+
+# Resolves once no DOM mutation / resource load has happened for quietMs (or maxMs passes).
+# Only state-ish attributes are watched so JS-driven style animations don't keep it busy forever.
+SETTLE_JS = """
+({quietMs, maxMs}) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const touch = () => { last = performance.now(); };
+
+    const observer = new MutationObserver(touch);
+    observer.observe(document.documentElement || document, {
+        subtree: true,
+        childList: true,
+        characterData: true,
+        attributes: true,
+        attributeFilter: ['class', 'hidden', 'open', 'disabled', 'value', 'aria-expanded', 'aria-hidden', 'aria-selected']
+    });
+
+    let resources = null;
+    try {
+        resources = new PerformanceObserver(touch);
+        resources.observe({type: 'resource'});
+    } catch (e) {}
+
+    const tick = () => {
+        const now = performance.now();
+        const quiet = now - last >= quietMs;
+        if (quiet || now - start >= maxMs) {
+            observer.disconnect();
+            if (resources) resources.disconnect();
+            resolve({quiet: quiet, waited: now - start});
+            return;
+        }
+        setTimeout(tick, Math.min(50, quietMs));
+    };
+    setTimeout(tick, Math.min(50, quietMs));
+})
+"""
+
+
+def wait_for_settle(page: Page, quiet_ms=SETTLE_QUIET_MS, max_ms=SETTLE_MAX_MS,
+                    expected_selector=None, network_idle=False):
+    """
+    Blocks until the page is stable or max_ms runs out.
+    Returns the milliseconds actually spent waiting.
+    """
+    start = time.perf_counter()
+
+    def remaining():
+        return max(0, max_ms - (time.perf_counter() - start) * 1000)
+
+    if network_idle:
+        try:
+            page.wait_for_load_state("networkidle", timeout=remaining())
+        except PlaywrightTimeout:
+            pass
+
+    if expected_selector and remaining() > 0:
+        try:
+            page.locator(expected_selector).first.wait_for(state="attached", timeout=remaining())
+        except Exception:
+            pass  # Verification will report it - settling just stops waiting
+
+    if remaining() > 0:
+        try:
+            page.evaluate(SETTLE_JS, {"quietMs": quiet_ms, "maxMs": remaining()})
+        except Exception:
+            pass  # Context destroyed by a navigation mid-wait - the new page is loading anyway
+
+    return (time.perf_counter() - start) * 1000
+
+
+async def async_wait_for_settle(page, quiet_ms=SETTLE_QUIET_MS, max_ms=SETTLE_MAX_MS,
+                                expected_selector=None, network_idle=False):
+    """wait_for_settle for playwright.async_api pages"""
+    start = time.perf_counter()
+
+    def remaining():
+        return max(0, max_ms - (time.perf_counter() - start) * 1000)
+
+    if network_idle:
+        try:
+            await page.wait_for_load_state("networkidle", timeout=remaining())
+        except PlaywrightTimeout:
+            pass
+
+    if expected_selector and remaining() > 0:
+        try:
+            await page.locator(expected_selector).first.wait_for(state="attached", timeout=remaining())
+        except Exception:
+            pass
+
+    if remaining() > 0:
+        try:
+            await page.evaluate(SETTLE_JS, {"quietMs": quiet_ms, "maxMs": remaining()})
+        except Exception:
+            pass
+
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,132 @@
+"""
+Tiered Verify - Answer "did this step work?" as cheaply as the page allows
+1. dom:    targeted in-page checks - the verification selector, the expected text by visible
+           text or accessible name, a newly opened dialog when the step is meant to open one
+2. text:   a text-only model call over a compact accessibility-tree snapshot (no image tokens)
+3. vision: the screenshot call (verify_and_adapt), only when the text tier can't tell
+The executor records the tier that settled each step as the history entry's 'verified_by'.
+"""
+import json
+import re
+from config import A11Y_SNAPSHOT_MAX_CHARS
+
+VERIFY_TIERS = ("dom", "text", "vision")
+
+DIALOG_SELECTOR = '[role="dialog"], [role="alertdialog"], dialog[open], [aria-modal="true"]'
+# Whole words only - "form" is left out, it's in "information", "platform", "perform"...
+DIALOG_WORDS = re.compile(r"\b(modal|dialog|popup|pop-up)s?\b")
+# Steps meant to close or submit something: an open dialog afterwards is their failure, not proof
+CLOSING_WORDS = re.compile(r"\b(close|closes|dismiss|cancel|submit|save|send|confirm|exit|hide|escape|esc)\b")
+
+
+def expects_dialog(step):
+    """Clicks / shortcuts whose description or expectation says a dialog should open"""
+    text = f"{step.get('description', '')} {step.get('verification_text', '')}".lower()
+    return (step['action'] in ('click', 'keyboard_shortcut')
+            and bool(DIALOG_WORDS.search(text)) and not CLOSING_WORDS.search(text))
+
+
+def dialog_open(page):
+    """Whether a dialog is showing - recorded before a dialog step so only a new one counts"""
+    try:
+        return _visible(page, DIALOG_SELECTOR).count() > 0
+    except Exception:
+        return True  # Unknown: don't let a dialog confirm the step
+
+
+def _visible(page, selector):
+    """Rendered matches only - hidden templates, closed menus and display:none nodes don't count"""
+    return page.locator(selector).filter(visible=True)
+
+
+def _text_locator(page, text):
+    """Visible elements whose text, or accessible name (aria-label / title / alt / placeholder), contains `text`"""
+    quoted = json.dumps(text)
+    return page.get_by_text(text).or_(page.locator(
+        f'[aria-label*={quoted} i], [title*={quoted} i], [alt*={quoted} i], [placeholder*={quoted} i]'
+    )).filter(visible=True)
+
+
+def check_in_page(page, step, dialog_before=True):
+    """
+    Tier 1 for a step whose action went through. Returns (passed, problem):
+    passed is True/False when the page settles it, None when nothing on it does.
+    Only visible elements count. A dialog confirms a dialog step only if none was open before the
+    action (`dialog_before`, from dialog_open()); a missing one proves nothing (it may have closed).
+    """
+    settled = False
+    if step.get('verification_text'):
+        try:
+            if _text_locator(page, step['verification_text']).count() == 0:
+                return False, f"Expected text '{step['verification_text']}' not found"
+            settled = True
+        except Exception:
+            pass
+
+    if step.get('verification_selector'):
+        try:
+            if _visible(page, step['verification_selector']).count() == 0:
+                return False, f"Expected element '{step['verification_selector']}' not found"
+            settled = True
+        except Exception:
+            pass
+
+    if expects_dialog(step) and not dialog_before:
+        try:
+            settled = settled or _visible(page, DIALOG_SELECTOR).count() > 0
+        except Exception:
+            pass
+    return (True if settled else None), None
+
+
+def accessibility_snapshot(page, max_chars=A11Y_SNAPSHOT_MAX_CHARS):
+    """Roles + accessible names of the page (Playwright's ARIA snapshot), cut to max_chars"""
+    try:
+        return page.locator("body").aria_snapshot(timeout=2000)[:max_chars]
+    except Exception:
+        return None
+
+
+# ---- async_api variants (same checks, awaited) ----
+
+async def async_dialog_open(page):
+    """dialog_open for playwright.async_api pages"""
+    try:
+        return await _visible(page, DIALOG_SELECTOR).count() > 0
+    except Exception:
+        return True
+
+
+async def async_check_in_page(page, step, dialog_before=True):
+    """check_in_page for playwright.async_api pages"""
+    settled = False
+    if step.get('verification_text'):
+        try:
+            if await _text_locator(page, step['verification_text']).count() == 0:
+                return False, f"Expected text '{step['verification_text']}' not found"
+            settled = True
+        except Exception:
+            pass
+
+    if step.get('verification_selector'):
+        try:
+            if await _visible(page, step['verification_selector']).count() == 0:
+                return False, f"Expected element '{step['verification_selector']}' not found"
+            settled = True
+        except Exception:
+            pass
+
+    if expects_dialog(step) and not dialog_before:
+        try:
+            settled = settled or await _visible(page, DIALOG_SELECTOR).count() > 0
+        except Exception:
+            pass
+    return (True if settled else None), None
+
+
+async def async_accessibility_snapshot(page, max_chars=A11Y_SNAPSHOT_MAX_CHARS):
+    """accessibility_snapshot for playwright.async_api pages"""
+    try:
+        return (await page.locator("body").aria_snapshot(timeout=2000))[:max_chars]
+    except Exception:
+        return None
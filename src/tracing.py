@@ -0,0 +1,142 @@
+"""
+Tracing - Where a workflow's time actually goes
+Spans cover each workflow phase, each retry attempt, each fallback strategy and each model
+call (with token counts). A run's spans are written next to its screenshots as
+trace.jsonl (one span per line) and trace.chrome.json (open in chrome://tracing or Perfetto),
+and a table of the top time sinks is printed at the end of the run.
+
+The active tracer lives in a ContextVar, so planner/executor code just calls span() -
+per worker thread and per asyncio task - and it's a no-op when nothing is being traced.
+"""
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from config import TRACE_ENABLED, TRACE_TOP_SINKS
+
+_active_tracer = ContextVar("active_tracer", default=None)
+_parent_span = ContextVar("parent_span", default=None)
+
+
+class Tracer:
+    def __init__(self, name="workflow"):
+        self.name = name
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._threads = {}
+        # Spans close on worker threads and on concurrently awaited tasks
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        token = _active_tracer.set(self)
+        try:
+            yield self
+        finally:
+            _active_tracer.reset(token)
+
+    @contextmanager
+    def span(self, name, category, **attrs):
+        """Times the block; yields its attrs dict so the block can add results (tokens, selector, ...)"""
+        record = {"id": next(self._ids), "parent": _parent_span.get(), "name": name, "cat": category,
+                  "thread": threading.current_thread().name, "attrs": attrs}
+        token = _parent_span.set(record["id"])
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            _parent_span.reset(token)
+            record["start_ms"] = round((start - self._origin) * 1000, 3)
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            with self._lock:
+                self.spans.append(record)
+
+    def _thread_id(self, thread_name):
+        return self._threads.setdefault(thread_name, len(self._threads) + 1)
+
+    def chrome_trace(self):
+        """Chrome trace-event format: one complete ('X') event per span"""
+        spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {"traceEvents": [{
+            "name": s["name"], "cat": s["cat"], "ph": "X", "pid": 1, "tid": self._thread_id(s["thread"]),
+            "ts": round(s["start_ms"] * 1000), "dur": round(s["duration_ms"] * 1000), "args": s["attrs"],
+        } for s in spans], "displayTimeUnit": "ms", "otherData": {"run": self.name}}
+
+    def save(self, output_dir):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        with open(output_dir / "trace.jsonl", "w") as f:
+            for record in spans:
+                f.write(json.dumps(record, default=str) + "\n")
+        (output_dir / "trace.chrome.json").write_text(json.dumps(self.chrome_trace(), default=str))
+        return output_dir / "trace.jsonl"
+
+    def top_sinks(self, limit=TRACE_TOP_SINKS):
+        """
+        Span names ranked by self time (duration minus direct children), so a 'step' span
+        doesn't also count the screenshot and vision call nested inside it.
+        """
+        child_ms = {}
+        for record in self.spans:
+            if record["parent"] is not None:
+                child_ms[record["parent"]] = child_ms.get(record["parent"], 0) + record["duration_ms"]
+        totals = {}
+        for record in self.spans:
+            entry = totals.setdefault(record["name"], {"name": record["name"], "count": 0, "self_ms": 0.0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["self_ms"] += max(0.0, record["duration_ms"] - child_ms.get(record["id"], 0))
+            entry["total_ms"] += record["duration_ms"]
+        return sorted(totals.values(), key=lambda e: e["self_ms"], reverse=True)[:limit]
+
+    def format_summary(self, limit=TRACE_TOP_SINKS):
+        sinks = self.top_sinks(limit)
+        if not sinks:
+            return ""
+        traced_ms = sum(e["self_ms"] for e in self.top_sinks(limit=None)) or 1
+        lines = [f"🔥 Top time sinks ({self.name}):",
+                 f"   {'span':<28}{'calls':>6}{'self':>10}{'share':>8}"]
+        for entry in sinks:
+            lines.append(f"   {entry['name']:<28}{entry['count']:>6}{entry['self_ms'] / 1000:>9.2f}s"
+                         f"{entry['self_ms'] / traced_ms:>8.0%}")
+        llm_calls = [s for s in self.spans if s["cat"] == "llm"]
+        if llm_calls:
+            prompt = sum(s["attrs"].get("prompt_tokens", 0) for s in llm_calls)
+            completion = sum(s["attrs"].get("completion_tokens", 0) for s in llm_calls)
+            lines.append(f"   {len(llm_calls)} model calls, {prompt} prompt + {completion} completion tokens")
+        return "\n".join(lines)
+
+
+def span(name, category="executor", **attrs):
+    """A span on the active tracer, or a do-nothing block (still yielding an attrs dict) if there is none"""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return nullcontext(attrs)
+    return tracer.span(name, category, **attrs)
+
+
+@contextmanager
+def trace_run(output_dir, name=None):
+    """
+    Traces one workflow run: joins the tracer already active (e.g. the runner's, which also
+    covers planning), otherwise starts one and saves it + prints the top sinks when the run ends.
+    """
+    tracer = _active_tracer.get()
+    if tracer is not None or not TRACE_ENABLED:
+        yield tracer
+        return
+    tracer = Tracer(name or Path(output_dir).name)
+    try:
+        with tracer.activate():
+            yield tracer
+    finally:
+        path = tracer.save(output_dir)
+        print(tracer.format_summary())
+        print(f"🧭 Trace saved to {path} (+ trace.chrome.json)\n")
@@ -0,0 +1,124 @@
+"""
+Usage Meter - Token, image and latency accounting for planner calls, with per-workflow budgets
+Every model call is recorded (prompt/completion tokens, estimated image tokens, latency, cost).
+Past a fraction of the workflow's token budget vision calls drop to detail="low"; past the
+whole budget, failure verification is skipped instead of calling the model.
+"""
+import math
+from config import (
+    MODEL_PRICING_PER_1M, VISION_IMAGE_DETAIL,
+    WORKFLOW_TOKEN_BUDGET, BUDGET_LOW_DETAIL_AT, BUDGET_SKIP_VERIFY_AT,
+)
+
+
+def vision_tokens(size, detail):
+    """
+    OpenAI's image token formula: 85 for detail="low"; otherwise the image is fit into
+    2048x2048, its short side scaled to 768, and each 512px tile costs 170 on top of the 85 base.
+    """
+    if detail == "low" or not size:
+        return 85
+    width, height = size
+    fit = min(1.0, 2048 / max(width, height))
+    width, height = width * fit, height * fit
+    shrink = min(1.0, 768 / min(width, height))
+    width, height = width * shrink, height * shrink
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class UsageMeter:
+    def __init__(self, token_budget=WORKFLOW_TOKEN_BUDGET, image_detail=VISION_IMAGE_DETAIL):
+        self.token_budget = token_budget
+        self.default_detail = image_detail
+        self.calls = []
+        self.workflows = []
+        self._workflow_start = 0
+        self._budget_skips = 0
+
+    def workflow_calls(self):
+        return self.calls[self._workflow_start:]
+
+    def workflow_tokens(self):
+        return sum(c["prompt_tokens"] + c["completion_tokens"] for c in self.workflow_calls())
+
+    def _budget_used(self):
+        if not self.token_budget:
+            return 0.0
+        return self.workflow_tokens() / self.token_budget
+
+    def image_detail(self):
+        """Vision detail for the next call - "low" once the workflow is past BUDGET_LOW_DETAIL_AT"""
+        if self.default_detail != "low" and self._budget_used() >= BUDGET_LOW_DETAIL_AT:
+            return "low"
+        return self.default_detail
+
+    def allow_verification(self):
+        if self._budget_used() < BUDGET_SKIP_VERIFY_AT:
+            return True
+        self._budget_skips += 1
+        return False
+
+    def record(self, call, response, latency_s, messages, image_size=None, step=None):
+        usage = response.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        image_tokens = sum(
+            vision_tokens(image_size, part["image_url"].get("detail", "auto"))
+            for message in messages if isinstance(message["content"], list)
+            for part in message["content"] if part["type"] == "image_url"
+        )
+        price = MODEL_PRICING_PER_1M.get(response.get("model"), {"input": 0.0, "output": 0.0})
+        entry = {
+            "call": call,
+            "step": step,
+            "model": response.get("model"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "image_tokens": image_tokens,   # Estimate; already included in prompt_tokens
+            "latency_s": round(latency_s, 3),
+            "cost_usd": (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000,
+        }
+        self.calls.append(entry)
+        return entry
+
+    def end_workflow(self, name=None):
+        """Closes the current workflow's books; returns its breakdown and starts a fresh budget"""
+        calls = self.workflow_calls()
+        by_call = {}
+        for c in calls:
+            row = by_call.setdefault(c["call"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                 "image_tokens": 0, "latency_s": 0.0, "cost_usd": 0.0})
+            row["calls"] += 1
+            for key in ("prompt_tokens", "completion_tokens", "image_tokens", "latency_s", "cost_usd"):
+                row[key] += c[key]
+        summary = {
+            "workflow": name,
+            "calls": len(calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "image_tokens": sum(c["image_tokens"] for c in calls),
+            "latency_s": round(sum(c["latency_s"] for c in calls), 2),
+            "cost_usd": round(sum(c["cost_usd"] for c in calls), 4),
+            "budget_skips": self._budget_skips,
+            "by_call": by_call,
+        }
+        self.workflows.append(summary)
+        self._workflow_start = len(self.calls)
+        self._budget_skips = 0
+        return summary
+
+
+def format_usage(summary):
+    """Per-call-type breakdown of one workflow's model usage"""
+    if not summary["calls"]:
+        return ""
+    lines = [f"💰 Model usage: {summary['calls']} calls, {summary['prompt_tokens']} in / "
+             f"{summary['completion_tokens']} out tokens (~{summary['image_tokens']} image), "
+             f"{summary['latency_s']:.1f}s, ${summary['cost_usd']:.4f}",
+             f"   {'call':<12}{'n':>4}{'in':>9}{'out':>8}{'image':>8}{'latency':>10}{'cost':>10}"]
+    for call, row in sorted(summary["by_call"].items(), key=lambda item: item[1]["cost_usd"], reverse=True):
+        lines.append(f"   {call:<12}{row['calls']:>4}{row['prompt_tokens']:>9}{row['completion_tokens']:>8}"
+                     f"{row['image_tokens']:>8}{row['latency_s']:>9.1f}s{row['cost_usd']:>10.4f}")
+    if summary["budget_skips"]:
+        lines.append(f"   ⚠️  Token budget exhausted - skipped {summary['budget_skips']} verification(s)")
+    return "\n".join(lines)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import urlparse
 import json
 
 def generate_markdown_report(task, history, output_dir):
@@ -16,4 +17,11 @@ def generate_markdown_report(task, history, output_dir):
     with open(Path(output_dir) / "README.md", "w") as f:
         f.write(md)
     
-    print(f"✅ Report Generated: {output_dir}/README.md")
\ No newline at end of file
+    print(f"✅ Report Generated: {output_dir}/README.md")
+
+
+def same_page(url_a, url_b):
+    """Same scheme/host/path/query, ignoring fragments and trailing slashes"""
+    a, b = urlparse(url_a or ""), urlparse(url_b or "")
+    return (a.scheme, a.netloc.lower(), a.path.rstrip("/"), a.query) == \
+           (b.scheme, b.netloc.lower(), b.path.rstrip("/"), b.query)
@@ -0,0 +1,126 @@
+"""
+Verdict Cache - Reuse vision verdicts from verify_and_adapt for failures we've already seen
+Keyed by the failure signature (step description, action, selector, normalized error)
+plus a perceptual hash of the screenshot, so a near-identical page reuses the old verdict.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from config import VERDICT_CACHE_DIR, VERDICT_CACHE_MAX_ENTRIES, VERDICT_CACHE_MAX_DISTANCE
+from json_store import load_json, save_json_atomic
+from image_prep import hash_distance
+
+
+def normalize_error(error_message):
+    """
+    Playwright errors embed timeouts, element counts and call logs that vary run to run.
+    Keep the first line, lowercased, with numbers masked.
+    """
+    if not error_message:
+        return ""
+    first_line = str(error_message).strip().splitlines()[0].lower()
+    return re.sub(r"\s+", " ", re.sub(r"\d+", "#", first_line))[:200]
+
+
+def failure_signature(step, success, error_message=None):
+    payload = json.dumps({
+        "description": " ".join(step.get('description', '').lower().split()),
+        "action": step.get('action'),
+        "selector": step.get('primary_selector') or step.get('selector'),
+        "success": bool(success),
+        "error": normalize_error(error_message),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class VerdictCache:
+    def __init__(self, cache_dir=None, max_entries=VERDICT_CACHE_MAX_ENTRIES, max_distance=VERDICT_CACHE_MAX_DISTANCE):
+        self.cache_dir = Path(cache_dir or VERDICT_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "verdicts.json"
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        data = load_json(self.index_path, {})
+        # signature -> [{"phash", "verdict", "created_at", "last_used", "hits"}]
+        self.entries = data.get("entries", {})
+        self.stats = data.get("stats", {"hits": 0, "misses": 0})
+        self.session_stats = {"hits": 0, "misses": 0}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _save(self):
+        save_json_atomic(self.index_path, {"entries": self.entries, "stats": self.stats})
+        self._dirty = False
+
+    def save(self):
+        """Writes the hit/miss counters and LRU times that get() keeps in memory, if any changed"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _count(self, outcome):
+        self.stats[outcome] = self.stats.get(outcome, 0) + 1
+        self.session_stats[outcome] += 1
+
+    def get(self, signature, phash):
+        """Closest cached verdict within max_distance bits of `phash`, or None (no disk write - see save())"""
+        with self._lock:
+            best, best_distance = None, None
+            for entry in self.entries.get(signature, []):
+                distance = hash_distance(entry["phash"], phash)
+                if distance <= self.max_distance and (best is None or distance < best_distance):
+                    best, best_distance = entry, distance
+
+            self._dirty = True
+            if best is None:
+                self._count("misses")
+                return None
+
+            best["last_used"] = time.time()
+            best["hits"] = best.get("hits", 0) + 1
+            self._count("hits")
+            return dict(best["verdict"])
+
+    def put(self, signature, phash, verdict):
+        now = time.time()
+        with self._lock:
+            bucket = [e for e in self.entries.get(signature, []) if e["phash"] != phash]
+            bucket.append({"phash": phash, "verdict": dict(verdict), "created_at": now, "last_used": now, "hits": 0})
+            self.entries[signature] = bucket
+            self._evict()
+            self._save()
+
+    def invalidate(self, signature, phash):
+        """Drops verdicts near `phash` (e.g. the suggested fix didn't work). Returns how many."""
+        with self._lock:
+            bucket = self.entries.get(signature, [])
+            kept = [e for e in bucket if hash_distance(e["phash"], phash) > self.max_distance]
+            removed = len(bucket) - len(kept)
+            if kept:
+                self.entries[signature] = kept
+            else:
+                self.entries.pop(signature, None)
+            if removed:
+                self._save()
+            return removed
+
+    def _evict(self):
+        # Least-recently-used verdicts go first once we're over the size bound
+        flat = [(entry["last_used"], signature, entry) for signature, bucket in self.entries.items() for entry in bucket]
+        overflow = len(flat) - self.max_entries
+        if overflow <= 0:
+            return
+        for _, signature, entry in sorted(flat, key=lambda item: item[0])[:overflow]:
+            self.entries[signature].remove(entry)
+            if not self.entries[signature]:
+                del self.entries[signature]
+
+    def hit_rate(self):
+        total = self.stats.get("hits", 0) + self.stats.get("misses", 0)
+        return self.stats.get("hits", 0) / total if total else 0.0
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.entries.values())
@@ -11,7 +11,11 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 import config
 from adaptive_planner import AdaptivePlanner
 from adaptive_executor import AdaptiveExecutor
+from plan_cache import PlanCache
+from verdict_cache import VerdictCache
+from selector_index import SelectorIndex
 from utils import generate_markdown_report
+from tracing import trace_run
 
 def main():
     print("=" * 60)
@@ -20,36 +24,35 @@ def main():
     print("=" * 60)
     
     # 1. Setup
-    planner = AdaptivePlanner(api_key=config.API_KEY)
-    executor = AdaptiveExecutor()
+    planner = AdaptivePlanner(api_key=config.API_KEY, plan_cache=PlanCache(), verdict_cache=VerdictCache())
 
     # 2. Define Task (You can change this!)
     task = "How do search for 'python automation' repositories on GitHub?"
     app = "GitHub"
+    executor = AdaptiveExecutor(selector_index=SelectorIndex(), app=app)
     context = config.GITHUB_CONTEXT
-    
+    timestamp = "adaptive_run_01"
+    save_path = f"../{config.OUTPUT_DIR}/{app.lower()}_{timestamp}"
     
     try:
-        # 3. Plan with adaptive AI
-        plan = planner.plan_initial_workflow(task, app, context)
-        
-        print(f"\n📋 Generated {len(plan['steps'])} steps")
-        print("\n" + "=" * 60 + "\n")
+        with trace_run(save_path):  # One trace for planning + execution
+            # 3. Plan with adaptive AI
+            plan = executor.plan_while_prefetching(planner, task, app, context)
         
-        # 4. Execute with self-healing
-        timestamp = "adaptive_run_01"
-        save_path = f"../{config.OUTPUT_DIR}/{app.lower()}_{timestamp}"
+            print(f"\n📋 Generated {len(plan['steps'])} steps")
+            print("\n" + "=" * 60 + "\n")
         
-        history = executor.run_adaptive_workflow(plan, save_path, planner, app)
+            # 4. Execute with self-healing
+            history = executor.run_adaptive_workflow(plan, save_path, planner, app)
         
-        # 5. Report
-        generate_markdown_report(task, history, save_path)
+            # 5. Report
+            generate_markdown_report(task, history, save_path)
         
-        # 6. Summary
-        print("\n" + "=" * 60)
-        print(f"📁 Results saved to: {save_path}/")
-        print(f"📖 View guide: {save_path}/README.md")
-        print("=" * 60)
+            # 6. Summary
+            print("\n" + "=" * 60)
+            print(f"📁 Results saved to: {save_path}/")
+            print(f"📖 View guide: {save_path}/README.md")
+            print("=" * 60)
         
     except Exception as e:
         print(f"\n❌ CRITICAL FAILURE: {e}")
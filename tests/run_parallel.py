@@ -0,0 +1,47 @@
+"""
+Parallel Regeneration - Runs the YouTube and Linear workflows as one concurrent batch
+Each workflow gets its own isolated browser context and dataset folder
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import config
+from parallel_runner import ParallelWorkflowRunner, make_job
+from plan_cache import PlanCache
+from verdict_cache import VerdictCache
+from selector_index import SelectorIndex
+from network_cache import AssetCache, NetworkLayer
+
+def main():
+    jobs = [
+        make_job("How do I search for 'Python tutorials' on YouTube?", "YouTube", config.YOUTUBE_CONTEXT, "search_python"),
+        make_job("How do I view my YouTube subscriptions page?", "YouTube", config.YOUTUBE_CONTEXT, "view_subscriptions"),
+        make_job("How do I create a new issue in Linear?", "Linear", config.LINEAR_CONTEXT, "create_issue"),
+        make_job("How do I navigate to Projects in Linear?", "Linear", config.LINEAR_CONTEXT, "view_projects"),
+        make_job("How do I view my assigned issues in Linear?", "Linear", config.LINEAR_CONTEXT, "view_my_issues"),
+    ]
+
+    print("\n" + "🚀 PARALLEL REGENERATION".center(60))
+    print("⚠️  Note: Linear jobs reuse the login saved in data/user_data\n")
+
+    # --asset-cache: serve JS/CSS/fonts/images from data/network_cache
+    # --record-har / --offline: record each job's traffic to data/har/, or replay it with no network
+    har_mode = "record" if "--record-har" in sys.argv else "replay" if "--offline" in sys.argv else None
+    asset_cache = AssetCache() if "--asset-cache" in sys.argv else None
+    network = NetworkLayer(asset_cache, har_mode) if asset_cache or har_mode else None
+
+    # --stream: start each job's steps while its plan is still streaming in
+    runner = ParallelWorkflowRunner(api_key=config.API_KEY, plan_cache=PlanCache(), verdict_cache=VerdictCache(),
+                                    selector_index=SelectorIndex(), network=network,
+                                    streaming="--stream" in sys.argv or config.PLAN_STREAMING)
+    if "--threads" in sys.argv:
+        runner.run(jobs)
+    else:
+        asyncio.run(runner.run_async(jobs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Test Batch Verdicts - split_batch_verdicts and verify_batch's fallback for steps the model skipped
+"""
+import io
+import json
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from adaptive_planner import AdaptivePlanner, split_batch_verdicts, describe_expectation
+from planner_backends import LocalBackend
+from verdict_cache import VerdictCache
+
+
+def test_verdicts_in_screenshot_order():
+    result = {"verdicts": [{"screenshot": 2, "success": False}, {"screenshot": 1, "success": True}]}
+    assert split_batch_verdicts(result, 2) == [{"success": True}, {"success": False}]
+
+
+def test_screenshot_numbers_are_normalized():
+    result = {"verdicts": [{"screenshot": "2", "success": False}, {"screenshot": 1.0, "success": True}]}
+    assert split_batch_verdicts(result, 2) == [{"success": True}, {"success": False}]
+
+
+def test_missing_verdict_is_unknown_not_a_pass():
+    result = {"verdicts": [{"screenshot": 1, "success": True}, {"screenshot": 3, "success": True}]}
+    assert split_batch_verdicts(result, 3)[1] is None
+
+
+def test_out_of_range_and_malformed_numbers_are_dropped():
+    result = {"verdicts": [{"screenshot": 0, "success": False}, {"screenshot": 4, "success": False},
+                           {"screenshot": "two", "success": False}, {"screenshot": None, "success": False},
+                           "not a verdict"]}
+    assert split_batch_verdicts(result, 3) == [None, None, None]
+
+
+def test_unnumbered_verdicts_use_their_position():
+    result = {"verdicts": [{"success": True}, {"success": False}]}
+    assert split_batch_verdicts(result, 3) == [{"success": True}, {"success": False}, None]
+
+
+def test_first_verdict_for_a_screenshot_wins():
+    result = {"verdicts": [{"screenshot": 1, "success": False}, {"screenshot": 1, "success": True}]}
+    assert split_batch_verdicts(result, 1) == [{"success": False}]
+
+
+def test_model_output_is_not_mutated():
+    result = {"verdicts": [{"screenshot": 1, "success": True}]}
+    split_batch_verdicts(result, 1)
+    assert result == {"verdicts": [{"screenshot": 1, "success": True}]}
+
+
+def test_empty_or_null_answer():
+    assert split_batch_verdicts({}, 2) == [None, None]
+    assert split_batch_verdicts({"verdicts": None}, 1) == [None]
+
+
+def test_expectation_comes_from_the_verification_fields():
+    assert describe_expectation({}) == "State change"
+    step = {"verification_text": "Saved", "verification_selector": "#toast"}
+    assert describe_expectation(step) == 'text "Saved" visible; element #toast present'
+
+
+class DroppingBackend(LocalBackend):
+    """Answers verify_batch without a verdict for screenshot 2"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def complete(self, call, messages, **context):
+        self.calls.append(call)
+        response = super().complete(call, messages, **context)
+        if call == "verify_batch":
+            result = json.loads(response["content"])
+            result["verdicts"] = [v for v in result["verdicts"] if v["screenshot"] != 2]
+            response = dict(response, content=json.dumps(result))
+        return response
+
+
+def _entries(tmp_path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 200), "white").save(buffer, "PNG")
+    path = tmp_path / "step.png"
+    path.write_bytes(buffer.getvalue())
+    return [{"step": {"step_number": n, "description": f"Step {n}", "action": "click"},
+             "screenshot_path": str(path), "screenshot_bytes": buffer.getvalue()} for n in (1, 2, 3)]
+
+
+def test_verify_batch_checks_a_skipped_step_on_its_own(tmp_path):
+    backend = DroppingBackend(latency_ms=0, failure_rate=0)
+    cache = VerdictCache(tmp_path / "verdicts")
+    planner = AdaptivePlanner(backend=backend, verdict_cache=cache)
+    verdicts = planner.verify_batch(_entries(tmp_path))
+    assert all(verdict is not None and verdict.get("success") for verdict in verdicts)
+    assert backend.calls == ["verify_batch", "verify"]
+    # Only real verdicts are cached - the skipped step's came from its own call
+    cached = [entry["verdict"] for bucket in cache.entries.values() for entry in bucket]
+    assert len(cached) == 3 and all(verdict.get("confidence") != 0 for verdict in cached)
@@ -0,0 +1,133 @@
+"""
+Test Caches - VerdictCache and PlanCache lookups, LRU eviction, TTL and deferred saves
+"""
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import plan_cache
+import verdict_cache
+from plan_cache import PlanCache, make_plan_key
+from verdict_cache import VerdictCache, failure_signature, normalize_error
+
+STEP = {"step_number": 2, "description": "Click the  New button", "action": "click", "primary_selector": "#new"}
+PHASH = "ffff0000ffff0000"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() that moves one second per call, so LRU order never ties"""
+    ticks = itertools.count(1_000_000)
+    now = lambda: float(next(ticks))
+    monkeypatch.setattr(verdict_cache.time, "time", now)
+    return now
+
+
+def _flip(phash, bits):
+    """`phash` with its lowest `bits` bits flipped"""
+    return f"{int(phash, 16) ^ ((1 << bits) - 1):0{len(phash)}x}"
+
+
+def test_failure_signature_ignores_noise_in_errors():
+    first = failure_signature(STEP, False, "Timeout 30000ms exceeded.\n  waiting for locator('#new')")
+    second = failure_signature(dict(STEP, description="click the new button"), False, "Timeout 5000ms exceeded.")
+    assert first == second
+    assert failure_signature(STEP, True) != failure_signature(STEP, False)
+    assert normalize_error("Element 3 of 12 not visible\ncall log") == "element # of # not visible"
+
+
+def test_verdict_reused_for_a_near_identical_screenshot(tmp_path, clock):
+    cache = VerdictCache(tmp_path, max_distance=6)
+    signature = failure_signature(STEP, False, "not found")
+    cache.put(signature, PHASH, {"success": False, "alternative_selector": "#create"})
+    assert cache.get(signature, _flip(PHASH, 6))["alternative_selector"] == "#create"
+    assert cache.get(signature, _flip(PHASH, 7)) is None
+    assert cache.session_stats == {"hits": 1, "misses": 1}
+
+
+def test_closest_verdict_wins(tmp_path, clock):
+    cache = VerdictCache(tmp_path, max_distance=6)
+    cache.put("sig", PHASH, {"observation": "exact"})
+    cache.put("sig", _flip(PHASH, 4), {"observation": "near"})
+    assert cache.get("sig", _flip(PHASH, 3))["observation"] == "near"
+
+
+def test_verdict_cache_evicts_least_recently_used(tmp_path, clock):
+    cache = VerdictCache(tmp_path, max_entries=2, max_distance=0)
+    cache.put("a", PHASH, {"observation": "a"})
+    cache.put("b", PHASH, {"observation": "b"})
+    cache.get("a", PHASH)  # "b" is now the least recently used
+    cache.put("c", PHASH, {"observation": "c"})
+    assert len(cache) == 2
+    assert cache.get("b", PHASH) is None
+    assert cache.get("a", PHASH) and cache.get("c", PHASH)
+
+
+def test_verdict_invalidate_drops_only_nearby_verdicts(tmp_path, clock):
+    cache = VerdictCache(tmp_path, max_distance=2)
+    cache.put("sig", PHASH, {"observation": "near"})
+    cache.put("sig", _flip(PHASH, 16), {"observation": "far"})
+    assert cache.invalidate("sig", _flip(PHASH, 1)) == 1
+    assert len(cache) == 1
+
+
+def test_verdict_get_defers_the_write_until_save(tmp_path, clock):
+    cache = VerdictCache(tmp_path)
+    cache.put("sig", PHASH, {"observation": "x"})
+    written = cache.index_path.stat().st_mtime_ns
+    cache.get("sig", PHASH)
+    assert cache.index_path.stat().st_mtime_ns == written
+    cache.save()
+    assert VerdictCache(tmp_path).entries["sig"][0]["hits"] == 1
+
+
+@pytest.fixture
+def plan_clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(plan_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_plan_key_normalizes_the_task():
+    assert make_plan_key("Create  a Project", "Linear ", {"a": 1}) == make_plan_key("create a project", "linear", {"a": 1})
+    assert make_plan_key("create a project", "Linear", {"a": 1}) != make_plan_key("create a project", "Linear", {"a": 2})
+
+
+def test_plan_cache_returns_copies(tmp_path, plan_clock):
+    cache = PlanCache(tmp_path)
+    cache.put("k", {"steps": [{"action": "navigate"}]})
+    cache.get("k")["steps"].clear()
+    assert cache.get("k") == {"steps": [{"action": "navigate"}]}
+
+
+def test_plan_cache_evicts_least_recently_used(tmp_path, plan_clock):
+    cache = PlanCache(tmp_path, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, {"steps": [key]})
+        plan_clock[0] += 1
+    cache.get("a")
+    plan_clock[0] += 1
+    cache.put("c", {"steps": ["c"]})
+    assert sorted(cache.entries) == ["a", "c"]
+
+
+def test_plan_cache_expires_after_ttl(tmp_path, plan_clock):
+    cache = PlanCache(tmp_path, ttl_seconds=60)
+    cache.put("k", {"steps": []})
+    plan_clock[0] += 61
+    assert cache.get("k") is None
+    cache.save()
+    assert "k" not in PlanCache(tmp_path).entries
+
+
+def test_plan_cache_invalidate_if_failed(tmp_path, plan_clock):
+    cache = PlanCache(tmp_path)
+    cache.put("k", {"steps": []})
+    assert not cache.invalidate_if_failed("k", [{"success": True}])
+    assert cache.invalidate_if_failed("k", [{"success": True}, {"success": False}])
+    assert cache.get("k") is None
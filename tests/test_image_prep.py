@@ -0,0 +1,94 @@
+"""
+Test Image Prep - Downscaling, re-encoding, focus crops and perceptual hashes
+"""
+import io
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from image_prep import prepare_image, perceptual_hash, hash_distance, to_data_url, _crop_region
+
+
+def _png(width=1280, height=800, color="white", mode="RGB", draw=None):
+    image = Image.new(mode, (width, height), color)
+    if draw:
+        draw(ImageDraw.Draw(image))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _size(image_bytes):
+    return Image.open(io.BytesIO(image_bytes)).size
+
+
+def test_downscales_to_max_width_keeping_aspect_ratio():
+    prepared, mime, info = prepare_image(_png(1280, 800), max_width=640, image_format="JPEG")
+    assert mime == "image/jpeg"
+    assert _size(prepared) == (640, 400)
+    assert info["original_size"] == (1280, 800) and info["prepared_size"] == (640, 400)
+    assert info["prepared_bytes"] == len(prepared) and not info["cropped"]
+
+
+def test_small_images_are_not_upscaled():
+    prepared, _, _ = prepare_image(_png(300, 200), max_width=640, image_format="PNG")
+    assert _size(prepared) == (300, 200)
+
+
+def test_jpeg_drops_alpha_and_webp_keeps_its_format():
+    rgba = _png(200, 100, color=(255, 0, 0, 128), mode="RGBA")
+    jpeg, mime, _ = prepare_image(rgba, image_format="jpeg")
+    assert mime == "image/jpeg" and Image.open(io.BytesIO(jpeg)).mode == "RGB"
+    webp, mime, info = prepare_image(rgba, image_format="WEBP")
+    assert mime == "image/webp" and info["format"] == "WEBP"
+    assert Image.open(io.BytesIO(webp)).format == "WEBP"
+
+
+def test_focus_crop_is_scaled_by_device_pixel_ratio():
+    box = {"x": 100, "y": 100, "width": 200, "height": 100}
+    prepared, _, info = prepare_image(_png(2560, 1600), max_width=None, image_format="PNG",
+                                      focus_box=box, scale=2, margin=0, min_size=(0, 0))
+    assert info["cropped"]
+    assert _size(prepared) == (400, 200)
+
+
+def test_crop_grows_to_min_size_and_stays_inside_the_image():
+    # A 10x10 box in the top-left corner, grown to 300x200, shifted back inside instead of clipped
+    assert _crop_region((1280, 800), {"x": 0, "y": 0, "width": 10, "height": 10}, 1, 0, (300, 200)) == (0, 0, 300, 200)
+    # Same near the bottom-right corner
+    left, top, right, bottom = _crop_region((1280, 800), {"x": 1270, "y": 790, "width": 10, "height": 10}, 1, 20, (300, 200))
+    assert (right, bottom) == (1280, 800) and (right - left, bottom - top) == (300, 200)
+
+
+def test_crop_larger_than_the_image_is_the_whole_image():
+    assert _crop_region((400, 300), {"x": 50, "y": 50, "width": 100, "height": 100}, 1, 0, (1000, 1000)) == (0, 0, 400, 300)
+
+
+def test_data_url():
+    assert to_data_url(b"\x00\x01", "image/png") == "data:image/png;base64,AAE="
+
+
+def test_perceptual_hash_is_stable_and_tolerates_small_changes():
+    def page(draw):
+        draw.rectangle((100, 100, 600, 300), fill="navy")
+        draw.rectangle((700, 400, 1100, 700), fill="darkgreen")
+
+    base = perceptual_hash(_png(draw=page))
+    assert len(base) == 16
+    assert perceptual_hash(_png(draw=page)) == base
+    # A blinking cursor
+    cursor = perceptual_hash(_png(draw=lambda d: (page(d), d.rectangle((20, 20, 21, 36), fill="black"))))
+    assert hash_distance(base, cursor) <= 2
+    # A different layout
+    other = perceptual_hash(_png(draw=lambda d: d.rectangle((0, 500, 1280, 800), fill="maroon")))
+    assert hash_distance(base, other) > 6
+
+
+def test_hash_distance_counts_differing_bits():
+    assert hash_distance("00", "00") == 0
+    assert hash_distance("0f", "00") == 4
+    assert hash_distance("ffffffffffffffff", "0000000000000000") == 64
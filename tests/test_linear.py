@@ -12,36 +12,54 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 import config
 from adaptive_planner import AdaptivePlanner
 from adaptive_executor import AdaptiveExecutor
+from plan_cache import PlanCache
+from verdict_cache import VerdictCache
+from selector_index import SelectorIndex
+from session_pool import SessionPool
+from replay import compile_resolved_plan, save_resolved_plan, load_resolved_plan
 from utils import generate_markdown_report
+from tracing import trace_run
 
-def test_linear_task(task_description, run_name):
-    """Run a single Linear task"""
+def test_linear_task(task_description, run_name, replay=False, pool=None):
+    """Run a single Linear task (replaying the recorded resolved plan when asked and available)"""
     print("\n" + "="*60)
     print(f"🎯 LINEAR TEST: {task_description}")
     print("="*60 + "\n")
     
-    planner = AdaptivePlanner(api_key=config.API_KEY)
-    executor = AdaptiveExecutor()
+    planner = AdaptivePlanner(api_key=config.API_KEY, plan_cache=PlanCache(), verdict_cache=VerdictCache())
+    executor = AdaptiveExecutor(selector_index=SelectorIndex(), pool=pool)
+    
+    save_path = f"{config.OUTPUT_DIR}/linear_{run_name}"
     
     try:
-        # Plan the task dynamically
-        plan = planner.plan_initial_workflow(
-            task_query=task_description,
-            app_name="Linear",
-            app_context=config.LINEAR_CONTEXT
-        )
+        with trace_run(save_path):  # One trace for planning + execution
+            resolved = load_resolved_plan(save_path) if replay else None
+            if resolved:
+                history = executor.run_resolved_workflow(resolved, save_path, planner, "Linear")
+                save_resolved_plan(compile_resolved_plan(history, task_description, "Linear"), save_path)
+                generate_markdown_report(task_description, history, save_path)
+                successful = sum(1 for h in history if h.get('success', False))
+                return successful, len(history)
+        
+            # Plan the task dynamically
+            plan = executor.plan_while_prefetching(
+                planner,
+                task_query=task_description,
+                app_name="Linear",
+                app_context=config.LINEAR_CONTEXT
+            )
         
-        print(f"\n📋 AI Generated {len(plan['steps'])} steps\n")
+            print(f"\n📋 AI Generated {len(plan['steps'])} steps\n")
         
-        # Execute with self-correction
-        save_path = f"{config.OUTPUT_DIR}/linear_{run_name}"
-        history = executor.run_adaptive_workflow(plan, save_path, planner, "Linear")
+            # Execute with self-correction
+            history = executor.run_adaptive_workflow(plan, save_path, planner, "Linear")
+            save_resolved_plan(compile_resolved_plan(history, task_description, "Linear"), save_path)
         
-        # Generate report
-        generate_markdown_report(task_description, history, save_path)
+            # Generate report
+            generate_markdown_report(task_description, history, save_path)
         
-        successful = sum(1 for h in history if h.get('success', False))
-        return successful, len(history)
+            successful = sum(1 for h in history if h.get('success', False))
+            return successful, len(history)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -80,28 +98,34 @@ def main():
         print(f"  {i}. {task}{note}")
     
     choice = input("\nSelect test (1-3) or 'all': ").strip()
+    replay = input("Replay recorded runs when available? (y/N): ").strip().lower() == 'y'
     
     results = []
+    # One warm browser for the whole suite instead of a relaunch per task
+    pool = SessionPool(persistent=True, app="Linear")
     
-    if choice.lower() == 'all':
-        for task, run_name in tasks:
-            success, total = test_linear_task(task, run_name)
-            results.append((task, success, total))
-            if task != tasks[-1][0]:
-                input("\nPress Enter to continue to next test...")
-    else:
-        try:
-            idx = int(choice) - 1
-            if 0 <= idx < len(tasks):
-                task, run_name = tasks[idx]
-                success, total = test_linear_task(task, run_name)
+    try:
+        if choice.lower() == 'all':
+            for task, run_name in tasks:
+                success, total = test_linear_task(task, run_name, replay, pool)
                 results.append((task, success, total))
-            else:
-                print("Invalid selection!")
+                if task != tasks[-1][0]:
+                    input("\nPress Enter to continue to next test...")
+        else:
+            try:
+                idx = int(choice) - 1
+                if 0 <= idx < len(tasks):
+                    task, run_name = tasks[idx]
+                    success, total = test_linear_task(task, run_name, replay, pool)
+                    results.append((task, success, total))
+                else:
+                    print("Invalid selection!")
+                    return
+            except ValueError:
+                print("Invalid input!")
                 return
-        except ValueError:
-            print("Invalid input!")
-            return
+    finally:
+        pool.close()
     
     # Final summary
     if results:
@@ -0,0 +1,60 @@
+"""
+Test Pipeline State - What a late vision failure rolls back and re-executes
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from pipelined_verifier import PipelineState
+
+FAILED = {"success": False, "tier": "vision", "observation": "no modal", "alternative_selector": "#create"}
+
+
+class FakeVerifier:
+    def __init__(self):
+        self.stats = {"rollbacks": 0}
+        self.discarded_from = None
+
+    def discard_from(self, index):
+        self.discarded_from = index
+
+    def pending(self):
+        return False
+
+
+def _state(urls):
+    state = PipelineState(FakeVerifier())
+    for number, url in enumerate(urls, 1):
+        step = {"step_number": number, "action": "click", "primary_selector": f"#s{number}"}
+        state.record(url, {"step": step, "success": True})
+    return state
+
+
+def test_redo_starts_at_the_last_navigation_boundary():
+    state = _state(["about:blank", "https://app/issues", "https://app/issues#new", "https://app/issues"])
+    url, step, observation = state.apply([(3, FAILED)])
+    assert (url, step["step_number"], observation) == ("https://app/issues", 4, "no modal")
+    # Steps 2 and 3 built the page state step 4 ran on - they run again before it
+    assert [s["step_number"] for s in state.redo] == [2, 3, 4]
+    assert state.redo[-1]["primary_selector"] == "#create"
+    assert state.verifier.discarded_from == 1
+    assert len(state.history) == len(state.checkpoints) == 1
+
+
+def test_first_step_on_a_new_page_redoes_only_itself_and_later_steps():
+    state = _state(["about:blank", "https://app/a", "https://app/b", "https://app/b"])
+    state.apply([(2, FAILED)])
+    assert [s["step_number"] for s in state.redo] == [3, 4]
+    assert state.redo[0]["primary_selector"] == "#create"
+
+
+def test_a_step_is_rolled_back_once():
+    state = _state(["about:blank", "https://app/a"])
+    assert state.apply([(1, FAILED)])
+    for step in state.redo:
+        state.record("https://app/a", {"step": step, "success": True})
+    state.redo = []
+    assert state.apply([(1, FAILED)]) is None
+    assert state.history[1]["success"] is False
@@ -0,0 +1,78 @@
+"""
+Test Plan Stream - StepStreamParser on plans cut into arbitrary chunks
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from plan_stream import StepStreamParser
+
+PLAN = {
+    "task": "Create a project",
+    "steps": [
+        {"step_number": 1, "action": "navigate", "description": "Open {the} app", "url": "https://ex.com/?q={x}"},
+        {"action": "click", "description": "Click \"New [project]\" }", "primary_selector": "button:has-text(\"}\")"},
+        {"step_number": 3, "action": "type", "description": "Name it", "input_value": "a \\\" } ] { b",
+         "fallback_selectors": ["#name", "input[name=\"title\"]"], "extra": {"nested": {"deep": [1, 2]}}},
+    ],
+    "trailing": "} ] {",
+}
+
+
+def _parse(chunks):
+    parser = StepStreamParser()
+    return [step for chunk in chunks for step in parser.feed(chunk)], parser
+
+
+def test_whole_plan_in_one_chunk():
+    steps, _ = _parse([json.dumps(PLAN)])
+    assert [s["action"] for s in steps] == ["navigate", "click", "type"]
+    assert steps[2]["extra"] == {"nested": {"deep": [1, 2]}}
+
+
+def test_every_split_point_gives_the_same_steps():
+    text = json.dumps(PLAN)
+    expected, _ = _parse([text])
+    for cut in range(1, len(text)):
+        steps, _ = _parse([text[:cut], text[cut:]])
+        assert steps == expected, f"split at {cut}"
+
+
+def test_one_character_chunks():
+    text = json.dumps(PLAN)
+    steps, parser = _parse(list(text))
+    assert [s["description"] for s in steps] == [s["description"] for s in PLAN["steps"]]
+    assert parser.count == 3
+
+
+def test_braces_and_quotes_inside_strings_are_not_structure():
+    steps, _ = _parse([json.dumps(PLAN)])
+    assert steps[1]["description"] == 'Click "New [project]" }'
+    assert steps[1]["primary_selector"] == 'button:has-text("}")'
+    assert steps[2]["input_value"] == 'a \\" } ] { b'
+
+
+def test_missing_step_numbers_are_filled_in_order():
+    steps, _ = _parse([json.dumps(PLAN)])
+    assert [s["step_number"] for s in steps] == [1, 2, 3]
+
+
+def test_steps_emitted_as_soon_as_they_close():
+    text = json.dumps(PLAN)
+    first_end = text.index('"url": "https://ex.com/?q={x}"}') + len('"url": "https://ex.com/?q={x}"}')
+    parser = StepStreamParser()
+    assert [s["action"] for s in parser.feed(text[:first_end])] == ["navigate"]
+    assert parser.feed(text[first_end:first_end + 5]) == []
+
+
+def test_nothing_after_the_steps_array_is_parsed():
+    steps, _ = _parse([json.dumps(PLAN) + ' {"action": "ghost"}'])
+    assert len(steps) == 3
+
+
+def test_text_before_the_steps_array_is_ignored():
+    steps, _ = _parse(['Here is the plan: {"note": "{not a step}", ', '"steps": [{"action": "navigate"}]}'])
+    assert steps == [{"action": "navigate", "step_number": 1}]
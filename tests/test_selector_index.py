@@ -0,0 +1,95 @@
+"""
+Test Selector Index - Candidate ranking, dead selectors and per-origin eviction
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from selector_index import SelectorIndex, intent_key, origin_key
+
+ORIGIN = "https://app.example.com"
+STEP = {"action": "click", "description": "Click the 'New Issue' button"}
+
+
+def _index(tmp_path, **kwargs):
+    return SelectorIndex(tmp_path, dead_after=3, **kwargs)
+
+
+def _record(index, candidate, successes=0, failures=0, ms=100, step=STEP):
+    for _ in range(successes):
+        index.record(ORIGIN, step, candidate, True, ms)
+    for _ in range(failures):
+        index.record(ORIGIN, step, candidate, False, ms)
+
+
+def test_untried_candidates_keep_their_order(tmp_path):
+    assert _index(tmp_path).rank(ORIGIN, STEP, ["#a", "#b", "#c"]) == ["#a", "#b", "#c"]
+
+
+def test_proven_then_untried_then_poor(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#poor", successes=1, failures=3)
+    _record(index, "#proven", successes=2)
+    assert index.rank(ORIGIN, STEP, ["#poor", "#untried", "#proven"]) == ["#proven", "#untried", "#poor"]
+
+
+def test_higher_success_rate_first_then_faster(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#flaky", successes=2, failures=1, ms=10)
+    _record(index, "#slow", successes=3, ms=500)
+    _record(index, "#fast", successes=3, ms=50)
+    assert index.rank(ORIGIN, STEP, ["#flaky", "#slow", "#fast"]) == ["#fast", "#slow", "#flaky"]
+
+
+def test_dead_candidates_are_dropped(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#dead", failures=3)
+    _record(index, "#struggling", failures=2)
+    assert index.is_dead(ORIGIN, STEP, "#dead")
+    assert index.rank(ORIGIN, STEP, ["#dead", "#struggling", "#b"]) == ["#b", "#struggling"]
+
+
+def test_one_success_keeps_a_candidate_alive(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#slow-page", successes=1, failures=10)
+    assert not index.is_dead(ORIGIN, STEP, "#slow-page")
+    assert index.rank(ORIGIN, STEP, ["#slow-page"]) == ["#slow-page"]
+
+
+def test_records_are_per_origin_and_intent(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#a", failures=3)
+    other_step = {"action": "click", "description": "Click the save button"}
+    assert index.rank("https://other.example.com", STEP, ["#a"]) == ["#a"]
+    assert index.rank(ORIGIN, other_step, ["#a"]) == ["#a"]
+
+
+def test_equivalent_descriptions_share_an_intent():
+    assert intent_key(STEP) == intent_key({"action": "click", "description": "click New issue button"})
+    assert intent_key(STEP) != intent_key({"action": "type", "description": "New issue button"})
+
+
+def test_origin_key_falls_back_to_app():
+    assert origin_key("https://App.Example.com/issues?id=1") == "https://app.example.com"
+    assert origin_key("about:blank", "Linear") == "linear"
+
+
+def test_learned_skips_strategies_and_failures(tmp_path):
+    index = _index(tmp_path)
+    _record(index, "#worked", successes=1)
+    _record(index, "strategy:keyboard", successes=1)
+    _record(index, "#never", failures=1)
+    assert index.learned(ORIGIN, STEP) == ["#worked"]
+
+
+def test_save_round_trips_and_evicts_oldest_intents(tmp_path):
+    index = _index(tmp_path, max_intents=2)
+    for word in ("first", "second", "third"):
+        _record(index, "#x", successes=1, step={"action": "click", "description": word})
+    index.save()
+    reloaded = _index(tmp_path, max_intents=2)
+    assert len(reloaded) == 2
+    assert reloaded.stats(ORIGIN, {"action": "click", "description": "first"}, "#x") is None
+    assert reloaded.stats(ORIGIN, {"action": "click", "description": "third"}, "#x")["successes"] == 1
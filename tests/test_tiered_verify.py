@@ -0,0 +1,61 @@
+"""
+Test Tiered Verify - When the dom tier may take an open dialog as proof a step worked
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from tiered_verify import expects_dialog, dialog_open, check_in_page, DIALOG_SELECTOR
+
+
+class FakeLocator:
+    def __init__(self, count):
+        self._count = count
+
+    def filter(self, **_):
+        return self
+
+    def count(self):
+        return self._count
+
+
+class FakePage:
+    def __init__(self, dialog=False):
+        self.dialog = dialog
+
+    def locator(self, selector):
+        return FakeLocator(int(self.dialog) if selector == DIALOG_SELECTOR else 0)
+
+
+def _click(description):
+    return {"action": "click", "description": description}
+
+
+def test_dialog_words_match_whole_words_only():
+    assert expects_dialog(_click("Click New issue to open the modal"))
+    assert expects_dialog({"action": "keyboard_shortcut", "description": "Press c to open the create dialog"})
+    assert not expects_dialog(_click("Click More information"))
+    assert not expects_dialog(_click("Open the platform settings form"))
+    assert not expects_dialog({"action": "type", "description": "Type into the dialog"})
+
+
+def test_closing_and_submitting_steps_never_expect_a_dialog():
+    assert not expects_dialog(_click("Close the modal"))
+    assert not expects_dialog(_click("Click Save in the dialog"))
+    assert not expects_dialog(_click("Submit the popup"))
+
+
+def test_only_a_newly_opened_dialog_confirms_the_step():
+    step = _click("Click New issue to open the modal")
+    page = FakePage(dialog=True)
+    assert check_in_page(page, step, dialog_before=False) == (True, None)
+    assert check_in_page(page, step, dialog_before=True) == (None, None)
+    assert check_in_page(page, step) == (None, None)  # Unknown before-state proves nothing
+    assert check_in_page(FakePage(), step, dialog_before=False) == (None, None)
+
+
+def test_dialog_open():
+    assert dialog_open(FakePage(dialog=True))
+    assert not dialog_open(FakePage())
@@ -6,7 +6,11 @@ Simple, reliable, no auth required
 import config
 from adaptive_planner import AdaptivePlanner
 from adaptive_executor import AdaptiveExecutor
+from plan_cache import PlanCache
+from verdict_cache import VerdictCache
+from selector_index import SelectorIndex
 from utils import generate_markdown_report
+from tracing import trace_run
 
 def test_wikipedia_task(task_description, run_name):
     """Run a single Wikipedia task"""
@@ -14,28 +18,31 @@ def test_wikipedia_task(task_description, run_name):
     print(f"🎯 WIKIPEDIA TEST: {task_description}")
     print("="*60 + "\n")
     
-    planner = AdaptivePlanner(api_key=config.API_KEY)
-    executor = AdaptiveExecutor()
+    planner = AdaptivePlanner(api_key=config.API_KEY, plan_cache=PlanCache(), verdict_cache=VerdictCache())
+    executor = AdaptiveExecutor(selector_index=SelectorIndex(), app="Wikipedia")
+    
+    save_path = f"{config.OUTPUT_DIR}/wikipedia_{run_name}"
     
     try:
-        # Plan the task dynamically (not hardcoded!)
-        plan = planner.plan_initial_workflow(
-            task_query=task_description,
-            app_name="Wikipedia",
-            app_context=config.WIKIPEDIA_CONTEXT
-        )
+        with trace_run(save_path):  # One trace for planning + execution
+            # Plan the task dynamically (not hardcoded!)
+            plan = executor.plan_while_prefetching(
+                planner,
+                task_query=task_description,
+                app_name="Wikipedia",
+                app_context=config.WIKIPEDIA_CONTEXT
+            )
         
-        print(f"\n📋 AI Generated {len(plan['steps'])} steps\n")
+            print(f"\n📋 AI Generated {len(plan['steps'])} steps\n")
         
-        # Execute with self-correction
-        save_path = f"{config.OUTPUT_DIR}/wikipedia_{run_name}"
-        history = executor.run_adaptive_workflow(plan, save_path, planner, "Wikipedia")
+            # Execute with self-correction
+            history = executor.run_adaptive_workflow(plan, save_path, planner, "Wikipedia")
         
-        # Generate report
-        generate_markdown_report(task_description, history, save_path)
+            # Generate report
+            generate_markdown_report(task_description, history, save_path)
         
-        successful = sum(1 for h in history if h.get('success', False))
-        return successful, len(history)
+            successful = sum(1 for h in history if h.get('success', False))
+            return successful, len(history)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")